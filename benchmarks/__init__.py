@@ -0,0 +1,6 @@
+"""
+Benchmarks for Dalite XBlock hot paths.
+
+Benchmarks run offline against a fake runtime and modulestore (see `benchmarks.fakes`), so they need neither
+edx-platform nor the workbench. Run them with ``python -m benchmarks.run_benchmarks``.
+"""
@@ -0,0 +1,190 @@
+"""
+Local stand-in for a dalite-ng LTI provider, used by load tests.
+
+`FakeDaliteProvider` serves ``POST /lti/``: it checks OAuth signature of the launch against the secret of the
+launching LTI key, and rejects launches with invalid signatures with 401. For accepted graded launches it posts a
+``replaceResultRequest`` back to ``lis_outcome_service_url`` from a pool of passback threads, as dalite-ng does when a
+student answers the question, and records latency and outcome of the passback.
+"""
+import random
+import re
+import threading
+import time
+import urllib
+import urlparse
+from Queue import Queue
+from xml.sax.saxutils import escape
+
+from lti_consumer.oauth import SignedRequest
+from oauthlib.oauth1.rfc5849 import signature
+
+from dalite_xblock.http_pool import PoolManager
+from tests.utils import LocalHTTPServer, make_body_signed_request
+
+LAUNCH_PATH = "/lti/"
+LAUNCH_RESPONSE = "<html><body>Dalite question</body></html>"
+
+REPLACE_RESULT_TEMPLATE = u"""<?xml version="1.0" encoding="UTF-8"?>
+<imsx_POXEnvelopeRequest xmlns="http://www.imsglobal.org/services/ltiv1p1/xsd/imsoms_v1p0">
+  <imsx_POXHeader>
+    <imsx_POXRequestHeaderInfo>
+      <imsx_version>V1.0</imsx_version>
+      <imsx_messageIdentifier>{message_id}</imsx_messageIdentifier>
+    </imsx_POXRequestHeaderInfo>
+  </imsx_POXHeader>
+  <imsx_POXBody>
+    <replaceResultRequest>
+      <resultRecord>
+        <sourcedGUID><sourcedId>{sourced_id}</sourcedId></sourcedGUID>
+        <result><resultScore><language>en-us</language><textString>{score}</textString></resultScore></result>
+      </resultRecord>
+    </replaceResultRequest>
+  </imsx_POXBody>
+</imsx_POXEnvelopeRequest>
+"""
+
+_CODE_MAJOR = re.compile(r"<imsx_codeMajor>\s*(\w+)\s*</imsx_codeMajor>")
+
+
+def verify_launch(uri, body, secrets):
+    """
+    Verify OAuth signature of an LTI launch.
+
+    :param unicode uri: Launch URL
+    :param str body: Form encoded launch parameters
+    :param dict[unicode, unicode] secrets: LTI secrets by LTI key
+    :returns: Launch parameters, or None if signature is invalid
+    :rtype: dict|None
+    """
+    all_params = [
+        (name.decode('utf-8'), value.decode('utf-8'))
+        for name, value in urlparse.parse_qsl(body, keep_blank_values=True)
+    ]
+    launch_params = dict(all_params)
+    secret = secrets.get(launch_params.get(u"oauth_consumer_key"))
+    if secret is None or u"oauth_signature" not in launch_params:
+        return None
+    signed_request = SignedRequest(
+        uri=uri, http_method=u"POST",
+        params=signature.collect_parameters(uri_query=urlparse.urlsplit(uri).query, body=all_params),
+        signature=launch_params[u"oauth_signature"]
+    )
+    return launch_params if signature.verify_hmac_sha1(signed_request, secret) else None
+
+
+class FakeDaliteProvider(object):
+    """
+    dalite-ng stand-in checking launch signatures and posting grades back to the LMS.
+
+    Use as a context manager; `url` is the dalite root URL passports should point at.
+    """
+
+    def __init__(self, secrets, report, passback_threads=4, pool_manager=None):
+        """
+        Initialize FakeDaliteProvider.
+
+        :param dict[unicode, unicode] secrets: LTI secrets by LTI key
+        :param benchmarks.load_test.LoadReport report: Report launches and passbacks are recorded in
+        :param int passback_threads: Number of threads posting grades back
+        :param PoolManager|None pool_manager: Connections used to post grades back
+        """
+        self.secrets = secrets
+        self.report = report
+        self.pool_manager = pool_manager or PoolManager(max_size=passback_threads)
+        self.rejected_launches = 0
+        self._server = LocalHTTPServer(self.handle)
+        self._passbacks = Queue()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._passback_worker) for __ in range(passback_threads)]
+        for thread in self._threads:
+            thread.daemon = True
+
+    @property
+    def url(self):
+        """Return dalite root URL."""
+        return self._server.url
+
+    def __enter__(self):
+        self._server.__enter__()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for __ in self._threads:
+            self._passbacks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.pool_manager.close()
+        self._server.__exit__(exc_type, exc_val, exc_tb)
+
+    def handle(self, handler):
+        """Handle request received by the local server."""
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        if handler.command != "POST" or urlparse.urlsplit(handler.path).path != LAUNCH_PATH:
+            return 404, {}, "Not found"
+
+        launch_params = verify_launch((self.url + handler.path).decode('utf-8'), body, self.secrets)
+        if launch_params is None:
+            with self._lock:
+                self.rejected_launches += 1
+            return 401, {}, "Invalid OAuth signature"
+
+        outcome_url = launch_params.get(u"lis_outcome_service_url")
+        sourced_id = launch_params.get(u"lis_result_sourcedid")
+        if outcome_url and sourced_id:
+            self._passbacks.put((outcome_url, sourced_id, launch_params[u"oauth_consumer_key"]))
+        return 200, {"Content-Type": "text/html"}, LAUNCH_RESPONSE
+
+    def join(self):
+        """Wait until all queued grades are posted back."""
+        self._passbacks.join()
+
+    def post_grade(self, outcome_url, sourced_id, key, score):
+        """
+        Post score of a student back to the LMS.
+
+        :param unicode outcome_url: LMS outcome service URL
+        :param unicode sourced_id: LIS result sourcedid of the launch
+        :param unicode key: LTI key of the launch
+        :param float score: Score, between 0 and 1
+        :returns: Whether the LMS accepted the grade
+        :rtype: bool
+        """
+        body = REPLACE_RESULT_TEMPLATE.format(
+            message_id=random.getrandbits(64), sourced_id=escape(sourced_id), score=score
+        ).encode('utf-8')
+        request = make_body_signed_request(outcome_url, body, key, self.secrets[key])
+        headers = {name: request.headers[name] for name in ("Authorization", "Content-Type")}
+        with self.pool_manager.request("POST", outcome_url.encode('utf-8'), headers=headers, body=body) as response:
+            response_body = response.read()
+        match = _CODE_MAJOR.search(response_body)
+        return response.status == 200 and match is not None and match.group(1) == "success"
+
+    def _passback_worker(self):
+        """Post queued grades back to the LMS."""
+        while True:
+            item = self._passbacks.get()
+            try:
+                if item is None:
+                    return
+                outcome_url, sourced_id, key = item
+                started = time.time()
+                try:
+                    accepted = self.post_grade(outcome_url, sourced_id, key, round(random.random(), 2))
+                    error = None if accepted else "Grade rejected"
+                except Exception as exc:  # pylint: disable=broad-except
+                    error = "{}: {}".format(exc.__class__.__name__, exc)
+                self.report.record("grade_passback", time.time() - started, error)
+            finally:
+                self._passbacks.task_done()
+
+
+def launch_body(params):
+    """
+    Return form encoded launch parameters.
+
+    :param dict[unicode, unicode] params: Launch parameters
+    :rtype: str
+    """
+    return urllib.urlencode([(name.encode('utf-8'), value.encode('utf-8')) for name, value in params.items()])
@@ -0,0 +1,237 @@
+"""
+Fake runtime and modulestore used by benchmarks.
+
+These provide just enough of the LMS/Studio runtime API for DaliteXBlock views and handlers to run outside of
+edx-platform.
+"""
+import itertools
+
+from xblock.field_data import DictFieldData
+from xblock.fields import ScopeIds
+
+from dalite_xblock.dalite_xblock import DaliteXBlock
+from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+
+
+class FakeCourse(object):
+    """Course stand-in exposing the attributes DaliteXBlock and LtiConsumerXBlock read."""
+
+    def __init__(self, course_id, lti_passports):
+        """
+        Initialize FakeCourse.
+
+        :param str course_id: Course ID
+        :param list[str] lti_passports: Course LTI passports
+        """
+        self.id = course_id
+        self.lti_passports = lti_passports
+        self.display_name_with_default = u"Course {}".format(course_id)
+        self.display_org_with_default = u"DaliteX"
+
+
+class FakeModulestore(object):
+    """Modulestore stand-in holding courses in a dictionary and counting course loads."""
+
+    def __init__(self, courses):
+        """
+        Initialize FakeModulestore.
+
+        :param Iterable[FakeCourse] courses: Courses to store
+        """
+        self.courses = {course.id: course for course in courses}
+        self.get_course_calls = 0
+
+    def get_course(self, course_id, depth=0):  # pylint: disable=unused-argument
+        """Return course by ID."""
+        self.get_course_calls += 1
+        return self.courses.get(course_id)
+
+
+class FakeI18nService(object):
+    """No-op i18n service."""
+
+    @staticmethod
+    def ugettext(text):
+        """Return text unchanged."""
+        return text
+
+    @staticmethod
+    def ungettext(singular, plural, count):
+        """Return singular or plural text unchanged."""
+        return singular if count == 1 else plural
+
+
+class FakeLocation(object):
+    """Usage key stand-in."""
+
+    def __init__(self, block_id):
+        """Initialize FakeLocation."""
+        self.block_id = block_id
+
+    def html_id(self):
+        """Return HTML-friendly block ID."""
+        return self.block_id
+
+    def __unicode__(self):
+        """Return string form of the usage key."""
+        return u"block-v1:DaliteX+Bench+run+type@xblock-dalite+block@{}".format(self.block_id)
+
+    __str__ = __unicode__
+
+
+class FakeRuntime(object):
+    """
+    Runtime stand-in.
+
+    A new runtime is meant to be created for every simulated request, as LMS does.
+    """
+
+    hostname = "lms.example.com"
+    debug = False
+
+    def __init__(self, modulestore, course_id, user_role="student", anonymous_student_id="student-1"):
+        """
+        Initialize FakeRuntime.
+
+        :param FakeModulestore modulestore: Modulestore
+        :param str course_id: ID of the course being served
+        :param str user_role: Role of the current user
+        :param str anonymous_student_id: Anonymous ID of the current user
+        """
+        self.modulestore = modulestore
+        self.course_id = course_id
+        self.user_role = user_role
+        self.anonymous_student_id = anonymous_student_id
+        self.published = []
+        self._services = {'i18n': FakeI18nService()}
+
+    def service(self, block, service_name):  # pylint: disable=unused-argument
+        """Return service by name, or None if not available."""
+        return self._services.get(service_name)
+
+    # pylint: disable=unused-argument
+    def handler_url(self, block, handler_name, suffix='', query='', thirdparty=False):
+        """Return URL of a block handler."""
+        scheme = "https://{}".format(self.hostname) if thirdparty else ""
+        return u"{}/courses/{}/xblock/{}/handler/{}/{}".format(
+            scheme, self.course_id, block.location.html_id(), handler_name, suffix
+        )
+
+    def local_resource_url(self, block, uri):  # pylint: disable=unused-argument
+        """Return URL of a static resource."""
+        return u"/static/{}".format(uri)
+
+    def get_user_role(self):
+        """Return role of the current user."""
+        return self.user_role
+
+    def get_real_user(self, anonymous_student_id):  # pylint: disable=unused-argument
+        """Return real user - not available in benchmarks."""
+        return None
+
+    def rebind_noauth_module_to_user(self, block, user):
+        """Bind block to a user - no-op in benchmarks."""
+        pass
+
+    def publish(self, block, event_type, event_data):
+        """Record published event."""
+        self.published.append((block, event_type, event_data))
+
+
+class FakeLmsMixin(object):
+    """Attributes XModuleMixin provides to blocks in edx-platform."""
+
+    due = None
+    graceperiod = None
+    category = "xblock-dalite"
+
+    @property
+    def location(self):
+        """Return usage key of this block."""
+        return FakeLocation(self.scope_ids.usage_id)
+
+
+class BenchmarkDaliteXBlock(FakeLmsMixin, DaliteXBlock):
+    """DaliteXBlock with LMS mixins applied, as edx-platform runtime does."""
+
+    pass
+
+
+def make_passports(course_index, dalite_passports, other_passports, dalite_url=None):
+    """
+    Generate course LTI passports.
+
+    :param int course_index: Index of the course, used to make passports unique across courses
+    :param int dalite_passports: Number of Dalite passports
+    :param int other_passports: Number of non-Dalite LTI passports
+    :param str|None dalite_url: dalite-ng URL of all Dalite passports, by default every passport has its own
+    :rtype: list[str]
+    """
+    passports = [
+        "other-lti-{}-{}:key{}:secret{}".format(course_index, index, index, index)
+        for index in range(other_passports)
+    ]
+    passports.extend(
+        prepare_passport(DaliteLtiPassport(
+            lti_id="dalite-{}".format(index),
+            dalite_root_url=dalite_url or "https://dalite-{}.example.com".format(index),
+            lti_key="key-{}-{}".format(course_index, index),
+            lti_secret="secret-{}-{}".format(course_index, index),
+        ))
+        for index in range(dalite_passports)
+    )
+    return passports
+
+
+class BenchmarkFixture(object):
+    """A set of courses with Dalite passports and blocks configured in them."""
+
+    def __init__(self, courses=5, dalite_passports=5, other_passports=20, blocks=40, dalite_url=None):
+        """
+        Initialize BenchmarkFixture.
+
+        :param int courses: Number of courses
+        :param int dalite_passports: Number of Dalite passports per course
+        :param int other_passports: Number of non-Dalite LTI passports per course
+        :param int blocks: Number of Dalite blocks per course (i.e. per unit page)
+        :param str|None dalite_url: dalite-ng URL of all Dalite passports, i.e. of a local stand-in
+        """
+        self.course_ids = [u"course-v1:DaliteX+Bench{}+run".format(index) for index in range(courses)]
+        self.modulestore = FakeModulestore(
+            FakeCourse(course_id, make_passports(index, dalite_passports, other_passports, dalite_url))
+            for index, course_id in enumerate(self.course_ids)
+        )
+        self.dalite_passports = dalite_passports
+        self.blocks = blocks
+        self._course_cycle = itertools.cycle(self.course_ids)
+
+    def next_course_id(self):
+        """Return next course ID, cycling over all courses."""
+        return next(self._course_cycle)
+
+    def make_runtime(self, course_id=None, **kwargs):
+        """Create runtime serving a single request."""
+        return FakeRuntime(self.modulestore, course_id or self.next_course_id(), **kwargs)
+
+    def block_fields(self, block_index):
+        """Return field values of n-th block in a course."""
+        assignment_id, question_id = "assignment-{}".format(block_index // 10), str(block_index)
+        return {
+            'display_name': u"Dalite question {}".format(block_index),
+            'lti_id': "dalite-{}".format(block_index % max(self.dalite_passports, 1)),
+            'assignment_id': assignment_id,
+            'question_id': question_id,
+            'launch_target': 'iframe',
+            'has_score': True,
+            'custom_parameters': ["assignment_id=" + assignment_id, "question_id=" + question_id],
+        }
+
+    def make_block(self, runtime, block_index=0):
+        """Create n-th Dalite block of a course bound to `runtime`."""
+        block_id = "dalite{}".format(block_index)
+        scope_ids = ScopeIds(runtime.anonymous_student_id, "xblock-dalite", block_id, block_id)
+        return BenchmarkDaliteXBlock(runtime, DictFieldData(self.block_fields(block_index)), scope_ids=scope_ids)
+
+    def make_page(self, runtime):
+        """Create all Dalite blocks of a unit page bound to `runtime`."""
+        return [self.make_block(runtime, block_index) for block_index in range(self.blocks)]
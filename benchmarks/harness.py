@@ -0,0 +1,178 @@
+"""
+Timing, statistics and baseline handling for benchmarks.
+
+Latencies are measured with a wall clock around every single call. Allocations are measured in a separate pass
+(with garbage collection disabled) as the number of gc-tracked objects created per call and not freed by reference
+counting, since Python 2 has no allocation tracing facility.
+"""
+import gc
+import json
+import resource
+import time
+from collections import namedtuple
+
+BenchmarkResult = namedtuple(
+    "BenchmarkResult", ["name", "iterations", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms", "ops_per_sec",
+                        "objects_per_op", "max_rss_kb"]
+)
+
+DEFAULT_TOLERANCE = 0.5
+
+
+def percentile(sorted_samples, fraction):
+    """
+    Return percentile of already sorted samples, using nearest-rank method.
+
+    :param list[float] sorted_samples: Samples sorted in ascending order
+    :param float fraction: Percentile as a fraction, i.e. 0.99
+    :rtype: float
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = int(round(fraction * len(sorted_samples) + 0.5)) - 1
+    return sorted_samples[max(0, min(rank, len(sorted_samples) - 1))]
+
+
+def measure_allocations(func, iterations):
+    """
+    Return number of gc-tracked objects retained per call of `func`.
+
+    :param () -> Any func: Benchmarked callable
+    :param int iterations: Number of calls
+    :rtype: float
+    """
+    results = []
+    gc.collect()
+    gc.disable()
+    try:
+        before = len(gc.get_objects())
+        for __ in xrange(iterations):
+            results.append(func())
+        after = len(gc.get_objects())
+    finally:
+        gc.enable()
+    # results (and everything they reference) are kept alive on purpose, so per-call allocations are visible
+    return float(after - before - 1) / iterations
+
+
+def run_benchmark(name, func, iterations=1000, warmup=50, allocation_iterations=50):
+    """
+    Run benchmark and return its statistics.
+
+    :param str name: Benchmark name
+    :param () -> Any func: Benchmarked callable, creating its own fixtures for every call if needed
+    :param int iterations: Number of timed calls
+    :param int warmup: Number of calls before measurement starts
+    :param int allocation_iterations: Number of calls in allocation measuring pass
+    :rtype: BenchmarkResult
+    """
+    for __ in xrange(warmup):
+        func()
+
+    timer = time.time
+    samples = []
+    started = timer()
+    for __ in xrange(iterations):
+        call_started = timer()
+        func()
+        samples.append(timer() - call_started)
+    total = timer() - started
+
+    samples.sort()
+    to_ms = 1000.0
+    return BenchmarkResult(
+        name=name,
+        iterations=iterations,
+        mean_ms=sum(samples) / len(samples) * to_ms,
+        p50_ms=percentile(samples, 0.5) * to_ms,
+        p90_ms=percentile(samples, 0.9) * to_ms,
+        p99_ms=percentile(samples, 0.99) * to_ms,
+        max_ms=samples[-1] * to_ms,
+        ops_per_sec=iterations / total if total else float('inf'),
+        objects_per_op=measure_allocations(func, allocation_iterations),
+        max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
+
+
+def format_results(results):
+    """
+    Format results as a text table.
+
+    :param list[BenchmarkResult] results: Benchmark results
+    :rtype: str
+    """
+    header = "{:<32} {:>7} {:>9} {:>9} {:>9} {:>9} {:>11} {:>9}".format(
+        "benchmark", "iters", "mean ms", "p50 ms", "p90 ms", "p99 ms", "ops/sec", "objs/op"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append("{:<32} {:>7} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>11.1f} {:>9.1f}".format(
+            result.name, result.iterations, result.mean_ms, result.p50_ms, result.p90_ms, result.p99_ms,
+            result.ops_per_sec, result.objects_per_op
+        ))
+    return "\n".join(lines)
+
+
+def load_baselines(path):
+    """
+    Load stored baselines.
+
+    :param str path: Path to baselines JSON file
+    :rtype: dict[str, dict[str, float]]
+    """
+    try:
+        with open(path) as baselines_file:
+            return json.load(baselines_file)
+    except IOError:
+        return {}
+
+
+def save_baselines(path, results, baselines=None):
+    """
+    Store results as baselines, keeping baselines of benchmarks that were not run.
+
+    :param str path: Path to baselines JSON file
+    :param list[BenchmarkResult] results: Benchmark results
+    :param dict|None baselines: Existing baselines
+    """
+    baselines = dict(baselines or {})
+    for result in results:
+        baselines[result.name] = {
+            "p50_ms": round(result.p50_ms, 4),
+            "p99_ms": round(result.p99_ms, 4),
+            "objects_per_op": round(result.objects_per_op, 1),
+        }
+    with open(path, "w") as baselines_file:
+        json.dump(baselines, baselines_file, indent=2, sort_keys=True, separators=(",", ": "))
+        baselines_file.write("\n")
+
+
+def find_regressions(results, baselines, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with baselines.
+
+    Median latency regresses if it is slower than baseline by more than `tolerance` (as a fraction of baseline);
+    allocations regress if they grow by more than `tolerance` and at least by one object per call.
+
+    :param list[BenchmarkResult] results: Benchmark results
+    :param dict[str, dict[str, float]] baselines: Stored baselines
+    :param float tolerance: Allowed relative slowdown
+    :returns: Human readable regression descriptions
+    :rtype: list[str]
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result.name)
+        if baseline is None:
+            continue
+        if result.p50_ms > baseline["p50_ms"] * (1 + tolerance):
+            regressions.append("{}: p50 {:.3f} ms, baseline {:.3f} ms".format(
+                result.name, result.p50_ms, baseline["p50_ms"]
+            ))
+        baseline_objects = baseline.get("objects_per_op")
+        if baseline_objects is not None and result.objects_per_op > max(
+                baseline_objects * (1 + tolerance), baseline_objects + 1):
+            regressions.append("{}: {:.1f} objects per call, baseline {:.1f}".format(
+                result.name, result.objects_per_op, baseline_objects
+            ))
+    return regressions
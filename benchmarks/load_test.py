@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+"""
+End-to-end load test of Dalite XBlock launches and grade passback.
+
+Runs many concurrent simulated students through the whole LTI round trip:
+
+1. `student_view` of a Dalite block;
+2. `lti_launch_handler`, rendering the signed launch form;
+3. submitting the launch form to a local stand-in dalite-ng (see `benchmarks.fake_dalite`), which checks the OAuth
+   signature;
+4. dalite-ng posting the grade back to a local LMS stand-in, which passes it to `outcome_service_handler` of the block.
+
+XBlock views and handlers run against the fake runtime and modulestore of `benchmarks.fakes`, so neither edx-platform
+nor the workbench is needed. The report lists requests per second, latency percentiles and error rates of every step.
+
+    $ python -m benchmarks.load_test --students 200 --concurrency 20 --launches 5
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from HTMLParser import HTMLParser
+from multiprocessing.pool import ThreadPool
+
+from benchmarks.harness import percentile
+from benchmarks.run_benchmarks import setup_django
+
+STAGES = ("student_view", "lti_launch_handler", "dalite_launch", "outcome_service_handler", "grade_passback")
+MAX_ERROR_MESSAGES = 5
+
+_OUTCOME_PATH = re.compile(r"^/courses/(?P<course_id>[^/]+)/xblock/(?P<block_id>[^/]+)/handler/outcome_service_handler")
+
+
+class LoadReport(object):
+    """Latencies and errors of load test steps; safe to update from many threads."""
+
+    def __init__(self, clock=time.time):
+        """
+        Initialize LoadReport.
+
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.clock = clock
+        self.started = self.finished = None
+        self._latencies = OrderedDict((stage, []) for stage in STAGES)
+        self._errors = OrderedDict((stage, Counter()) for stage in STAGES)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Mark start of the load test."""
+        self.started = self.clock()
+
+    def finish(self):
+        """Mark end of the load test."""
+        self.finished = self.clock()
+
+    def record(self, stage, latency, error=None):
+        """
+        Record a single request.
+
+        :param str stage: Load test step
+        :param float latency: Request latency, in seconds
+        :param str|None error: Error message, if request failed
+        """
+        with self._lock:
+            self._latencies.setdefault(stage, []).append(latency)
+            if error is not None:
+                self._errors.setdefault(stage, Counter())[error] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        """
+        Record latency of the wrapped code, and an error if it raises.
+
+        :param str stage: Load test step
+        """
+        started = self.clock()
+        try:
+            yield
+        except Exception as exc:
+            self.record(stage, self.clock() - started, "{}: {}".format(exc.__class__.__name__, exc))
+            raise
+        self.record(stage, self.clock() - started)
+
+    def as_dict(self):
+        """
+        Return report as a JSON-serializable dictionary.
+
+        :rtype: dict
+        """
+        finished = self.clock() if self.finished is None else self.finished
+        duration = finished - (finished if self.started is None else self.started)
+        stages = OrderedDict()
+        with self._lock:
+            for stage, latencies in self._latencies.iteritems():
+                if not latencies:
+                    continue
+                samples = sorted(latencies)
+                errors = self._errors[stage]
+                failed = sum(errors.itervalues())
+                stages[stage] = {
+                    "requests": len(samples),
+                    "errors": failed,
+                    "error_rate": float(failed) / len(samples),
+                    "requests_per_sec": len(samples) / duration if duration else 0.0,
+                    "p50_ms": percentile(samples, 0.5) * 1000.0,
+                    "p90_ms": percentile(samples, 0.9) * 1000.0,
+                    "p99_ms": percentile(samples, 0.99) * 1000.0,
+                    "max_ms": samples[-1] * 1000.0,
+                    "error_messages": dict(errors.most_common(MAX_ERROR_MESSAGES)),
+                }
+        return {"duration_sec": duration, "stages": stages}
+
+
+def format_report(report):
+    """
+    Format load test report as a text table.
+
+    :param dict report: Result of `LoadReport.as_dict`
+    :rtype: str
+    """
+    header = "{:<26} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+        "step", "requests", "req/sec", "p50 ms", "p90 ms", "p99 ms", "max ms", "errors"
+    )
+    lines = [header, "-" * len(header)]
+    for stage, stats in report["stages"].iteritems():
+        lines.append("{:<26} {:>8} {:>9.1f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>7.2f}%".format(
+            stage, stats["requests"], stats["requests_per_sec"], stats["p50_ms"], stats["p90_ms"], stats["p99_ms"],
+            stats["max_ms"], stats["error_rate"] * 100
+        ))
+    lines.append("duration: {:.2f} s".format(report["duration_sec"]))
+    for stage, stats in report["stages"].iteritems():
+        for message, count in sorted(stats["error_messages"].items()):
+            lines.append("{} error ({}x): {}".format(stage, count, message))
+    return "\n".join(lines)
+
+
+class LaunchFormParser(HTMLParser):
+    """Extracts action URL and input values of the LTI launch form rendered by `lti_launch_handler`."""
+
+    def __init__(self):
+        """Initialize LaunchFormParser."""
+        HTMLParser.__init__(self)
+        self.action = None
+        self.params = OrderedDict()
+
+    def handle_starttag(self, tag, attrs):
+        """Collect form action and named inputs."""
+        attributes = dict(attrs)
+        if tag == "form":
+            self.action = attributes.get("action")
+        elif tag == "input" and attributes.get("name"):
+            self.params[attributes["name"]] = attributes.get("value") or u""
+
+
+def parse_launch_form(html):
+    """
+    Return action URL and parameters of LTI launch form.
+
+    :param unicode html: Response of `lti_launch_handler`
+    :rtype: (unicode, OrderedDict)
+    """
+    parser = LaunchFormParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.action:
+        raise ValueError("Launch form not found")
+    return parser.action, parser.params
+
+
+def make_load_test_fixture(lms_url, dalite_url, **kwargs):
+    """
+    Create benchmark fixture whose passports point at dalite-ng stand-in and whose outcome URLs point at LMS stand-in.
+
+    :param str lms_url: Root URL of LMS stand-in
+    :param str dalite_url: Root URL of dalite-ng stand-in
+    :rtype: benchmarks.fakes.BenchmarkFixture
+    """
+    from benchmarks.fakes import BenchmarkFixture, FakeRuntime
+
+    class FakeUser(object):
+        """Django user stand-in."""
+
+        def __init__(self, user_id):
+            self.id = user_id  # pylint: disable=invalid-name
+
+    class LoadTestRuntime(FakeRuntime):
+        """Runtime whose third party handler URLs point at LMS stand-in, and which knows every student."""
+
+        def handler_url(self, block, handler_name, suffix='', query='', thirdparty=False):
+            """Return URL of a block handler."""
+            url = super(LoadTestRuntime, self).handler_url(block, handler_name, suffix, query)
+            return lms_url + url if thirdparty else url
+
+        def get_real_user(self, anonymous_student_id):
+            """Return user stand-in."""
+            return FakeUser(anonymous_student_id)
+
+    class LoadTestFixture(BenchmarkFixture):
+        """Benchmark fixture creating `LoadTestRuntime` runtimes."""
+
+        def make_runtime(self, course_id=None, **runtime_kwargs):
+            """Create runtime serving a single request."""
+            return LoadTestRuntime(self.modulestore, course_id or self.next_course_id(), **runtime_kwargs)
+
+    return LoadTestFixture(dalite_url=dalite_url, **kwargs)
+
+
+def passport_secrets(fixture):
+    """
+    Return LTI secrets of all Dalite passports of the fixture, by LTI key.
+
+    :param benchmarks.fakes.BenchmarkFixture fixture: Load test fixture
+    :rtype: dict[unicode, unicode]
+    """
+    from dalite_xblock.passport_utils import filter_and_parse_passports
+
+    return {
+        passport.lti_key.decode('utf-8'): passport.lti_secret.decode('utf-8')
+        for course in fixture.modulestore.courses.itervalues()
+        for passport in filter_and_parse_passports(course.lti_passports)
+    }
+
+
+class FakeLms(object):
+    """LMS stand-in passing grades posted back by dalite-ng to `outcome_service_handler` of blocks."""
+
+    def __init__(self, report):
+        """
+        Initialize FakeLms.
+
+        :param LoadReport report: Report outcome service requests are recorded in
+        """
+        from tests.utils import LocalHTTPServer
+
+        self.report = report
+        self.fixture = None
+        self.grades_published = 0
+        self._lock = threading.Lock()
+        self._server = LocalHTTPServer(self.handle)
+
+    @property
+    def url(self):
+        """Return LMS root URL."""
+        return self._server.url
+
+    def __enter__(self):
+        self._server.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.__exit__(exc_type, exc_val, exc_tb)
+
+    def handle(self, handler):
+        """Handle request received by the local server."""
+        from webob import Request
+
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        match = _OUTCOME_PATH.match(handler.path)
+        if handler.command != "POST" or match is None:
+            return 404, {}, "Not found"
+
+        # Every request gets its own runtime and block, as in LMS
+        runtime = self.fixture.make_runtime(course_id=match.group("course_id").decode('utf-8'))
+        block = self.fixture.make_block(runtime, int(match.group("block_id")[len("dalite"):]))
+        request = Request.blank(handler.path, method="POST", body=body, headers={
+            name: handler.headers[name] for name in ("Authorization", "Content-Type") if name in handler.headers
+        })
+        try:
+            with self.report.measure("outcome_service_handler"):
+                response = block.outcome_service_handler(request)
+        except Exception:  # pylint: disable=broad-except
+            return 500, {}, "Internal server error"
+        with self._lock:
+            self.grades_published += sum(1 for __, event_type, __ in runtime.published if event_type == "grade")
+        return response.status_code, {"Content-Type": response.content_type}, response.body
+
+
+def simulate_student(fixture, report, pool_manager, student_index, launches):
+    """
+    Run a simulated student through views, launches and grade passback of random blocks of a course.
+
+    :param benchmarks.fakes.BenchmarkFixture fixture: Load test fixture
+    :param LoadReport report: Report requests are recorded in
+    :param dalite_xblock.http_pool.PoolManager pool_manager: Connections used to launch dalite-ng
+    :param int student_index: Index of the student
+    :param int launches: Number of blocks the student launches
+    """
+    from webob import Request
+
+    from benchmarks.fake_dalite import launch_body
+    from dalite_xblock.oauth import FORM_URLENCODED_HEADERS
+
+    course_id = fixture.course_ids[student_index % len(fixture.course_ids)]
+    student_id = "student-{}".format(student_index)
+    for __ in xrange(launches):
+        block_index = random.randrange(fixture.blocks)
+        try:
+            # Every request gets its own runtime and block, as in LMS
+            with report.measure("student_view"):
+                runtime = fixture.make_runtime(course_id, anonymous_student_id=student_id)
+                fixture.make_block(runtime, block_index).student_view({})
+            with report.measure("lti_launch_handler"):
+                runtime = fixture.make_runtime(course_id, anonymous_student_id=student_id)
+                response = fixture.make_block(runtime, block_index).lti_launch_handler(Request.blank("/"), u"")
+            action, params = parse_launch_form(response.body.decode('utf-8'))
+            with report.measure("dalite_launch"):
+                with pool_manager.request(
+                    "POST", action.encode('utf-8'), headers=FORM_URLENCODED_HEADERS, body=launch_body(params)
+                ) as dalite_response:
+                    dalite_response.read()
+                if dalite_response.status != 200:
+                    raise ValueError("dalite-ng responded with {}".format(dalite_response.status))
+        except Exception:  # pylint: disable=broad-except
+            # Error is already recorded for the failed step; the student moves on to the next block
+            continue
+
+
+def run_load_test(students=100, concurrency=10, launches=5, passback_threads=4, **fixture_kwargs):
+    """
+    Run load test and return its report.
+
+    :param int students: Number of simulated students
+    :param int concurrency: Number of students active at the same time
+    :param int launches: Number of blocks every student launches
+    :param int passback_threads: Number of dalite-ng threads posting grades back
+    :param fixture_kwargs: Fixture size, see `benchmarks.fakes.BenchmarkFixture`
+    :rtype: dict
+    """
+    from benchmarks.fake_dalite import FakeDaliteProvider
+    from dalite_xblock.http_pool import PoolManager
+
+    report = LoadReport()
+    secrets = {}
+    pool_manager = PoolManager(max_size=concurrency)
+    with FakeLms(report) as lms, FakeDaliteProvider(secrets, report, passback_threads=passback_threads) as dalite:
+        fixture = make_load_test_fixture(lms.url, dalite.url, **fixture_kwargs)
+        secrets.update(passport_secrets(fixture))
+        lms.fixture = fixture
+        # XBlock builds `fields` of a block class lazily and without locking, so concurrent first uses of the class
+        # might see it unset; build it up front, as loading XBlock classes at LMS startup does
+        fixture.make_block(fixture.make_runtime()).get_field_values(())
+
+        students_pool = ThreadPool(concurrency)
+        report.start()
+        try:
+            students_pool.map(
+                lambda index: simulate_student(fixture, report, pool_manager, index, launches), xrange(students)
+            )
+            dalite.join()
+        finally:
+            report.finish()
+            students_pool.close()
+            students_pool.join()
+            pool_manager.close()
+
+    result = report.as_dict()
+    result.update({
+        "students": students,
+        "concurrency": concurrency,
+        "rejected_launches": dalite.rejected_launches,
+        "grades_published": lms.grades_published,
+    })
+    return result
+
+
+def parse_args(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Load test Dalite XBlock launches and grade passback")
+    parser.add_argument("--students", type=int, default=100, help="Number of simulated students")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of students active at the same time")
+    parser.add_argument("--launches", type=int, default=5, help="Blocks launched by every student")
+    parser.add_argument("--passback-threads", type=int, default=4, help="dalite-ng threads posting grades back")
+    parser.add_argument("--courses", type=int, default=5, help="Number of courses in the fake modulestore")
+    parser.add_argument("--dalite-passports", type=int, default=5, help="Dalite passports per course")
+    parser.add_argument("--other-passports", type=int, default=20, help="Non-Dalite LTI passports per course")
+    parser.add_argument("--blocks", type=int, default=40, help="Dalite blocks per course")
+    parser.add_argument("--json", action="store_true", help="Print report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show log messages emitted by tested code")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entrypoint for this script."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    setup_django()
+
+    report = run_load_test(
+        students=args.students, concurrency=args.concurrency, launches=args.launches,
+        passback_threads=args.passback_threads, courses=args.courses, dalite_passports=args.dalite_passports,
+        other_passports=args.other_passports, blocks=args.blocks
+    )
+    if args.json:
+        print json.dumps(report, indent=2)
+    else:
+        print format_report(report)
+        print "students: {}, concurrency: {}, rejected launches: {}, grades published: {}".format(
+            report["students"], report["concurrency"], report["rejected_launches"], report["grades_published"]
+        )
+    failed = sum(stats["errors"] for stats in report["stages"].itervalues()) + report["rejected_launches"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Run Dalite XBlock benchmarks.
+
+Times views and handlers of DaliteXBlock and passport parsing against a fake runtime and modulestore, prints latency
+percentiles, throughput and allocations, and optionally compares them with (or stores them as) baselines.
+
+    $ python -m benchmarks.run_benchmarks --compare
+    $ python -m benchmarks.run_benchmarks --save-baseline student_view lti_launch_handler
+"""
+import argparse
+import logging
+import os
+import sys
+
+from benchmarks.harness import (
+    DEFAULT_TOLERANCE, find_regressions, format_results, load_baselines, run_benchmark, save_baselines
+)
+
+# Threads and signatures per call in concurrent signing benchmarks
+SIGNING_THREADS = 8
+SIGNING_BATCH = 32
+
+DEFAULT_BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def setup_django():
+    """Configure Django (used for template rendering) unless settings module is provided via environment."""
+    import django
+    from django.conf import settings
+
+    if not settings.configured and "DJANGO_SETTINGS_MODULE" not in os.environ:
+        settings.configure(
+            TEMPLATES=[{"BACKEND": "django.template.backends.django.DjangoTemplates", "APP_DIRS": False}],
+        )
+    django.setup()
+
+
+def make_benchmarks(fixture):
+    """
+    Create benchmarked callables.
+
+    Every call simulates a separate request: new runtime and new block instances are created, as in LMS.
+
+    :param benchmarks.fakes.BenchmarkFixture fixture: Courses and blocks to benchmark against
+    :rtype: list[(str, () -> Any)]
+    """
+    from multiprocessing.pool import ThreadPool
+
+    from lti_consumer.oauth import get_oauth_request_signature
+    from webob import Request
+
+    from dalite_xblock import fragment_cache
+    from dalite_xblock.fragment_cache import FragmentCache, LocalFragmentCacheBackend
+    from dalite_xblock.oauth import FORM_URLENCODED_HEADERS, SIGNER_REGISTRY
+    from dalite_xblock.passport_utils import filter_and_parse_passports, parse_passport
+
+    course_passports = fixture.modulestore.courses[fixture.course_ids[0]].lti_passports
+    dalite_passport = course_passports[-1]
+
+    def student_view():
+        """Render a single block for a student."""
+        block = fixture.make_block(fixture.make_runtime())
+        return block.student_view({})
+
+    def student_view_page():
+        """Render all Dalite blocks of a unit page for a student."""
+        runtime = fixture.make_runtime()
+        return [block.student_view({}) for block in fixture.make_page(runtime)]
+
+    page_fragment_cache = FragmentCache(LocalFragmentCacheBackend())
+
+    def student_view_page_cached():
+        """Render all Dalite blocks of a unit page for a student, with fragment cache enabled."""
+        previous_cache = fragment_cache.get_fragment_cache()
+        fragment_cache.configure(page_fragment_cache)
+        try:
+            return student_view_page()
+        finally:
+            fragment_cache.configure(previous_cache)
+
+    def author_view():
+        """Render a single block in Studio unit page."""
+        block = fixture.make_block(fixture.make_runtime(user_role="staff"))
+        return block.author_view({})
+
+    def studio_view():
+        """Render Studio editor of a single block."""
+        block = fixture.make_block(fixture.make_runtime(user_role="staff"))
+        return block.studio_view({})
+
+    def lti_launch_handler():
+        """Launch LTI tool for a student."""
+        block = fixture.make_block(fixture.make_runtime())
+        return block.lti_launch_handler(Request.blank("/"), u"")
+
+    def lti_launch_handler_admin():
+        """Launch dalite-ng admin from Studio."""
+        block = fixture.make_block(fixture.make_runtime(user_role="staff"))
+        return block.lti_launch_handler(Request.blank("/"), u"admin")
+
+    # Concurrent signing: every call signs a batch of launches in a pool of threads, as LMS worker threads do under
+    # load.
+    signing_pool = ThreadPool(SIGNING_THREADS)
+    launch_url = u"https://dalite.example.com/lti/"
+    launch_parameters = {u"user_id": u"student", u"resource_link_id": u"block", u"custom_action": u"launch"}
+
+    def run_concurrently(func):
+        """Call `func` SIGNING_BATCH times in the thread pool."""
+        return signing_pool.map(lambda __: func(), xrange(SIGNING_BATCH))
+
+    def sign_launches_lti_consumer():
+        """Sign launches the way LtiConsumer does, building OAuth client and HMAC key every time."""
+        return run_concurrently(lambda: get_oauth_request_signature(
+            u"KEY", u"SECRET", launch_url, FORM_URLENCODED_HEADERS, launch_parameters
+        ))
+
+    def sign_launches_shared_signer():
+        """Sign launches with the passport signer shared by all threads."""
+        return run_concurrently(
+            lambda: SIGNER_REGISTRY.get_signer(u"KEY", u"SECRET").sign_launch(launch_url, launch_parameters)
+        )
+
+    return [
+        ("parse_passport", lambda: parse_passport(dalite_passport)),
+        ("filter_and_parse_passports", lambda: filter_and_parse_passports(course_passports)),
+        ("student_view", student_view),
+        ("student_view_page", student_view_page),
+        ("student_view_page_cached", student_view_page_cached),
+        ("author_view", author_view),
+        ("studio_view", studio_view),
+        ("lti_launch_handler", lti_launch_handler),
+        ("lti_launch_handler_admin", lti_launch_handler_admin),
+        ("sign_launches_lti_consumer", sign_launches_lti_consumer),
+        ("sign_launches_shared_signer", sign_launches_shared_signer),
+    ]
+
+
+def parse_args(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run Dalite XBlock benchmarks")
+    parser.add_argument("benchmarks", nargs="*", help="Names of benchmarks to run (default: all)")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per benchmark")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed calls before measurement")
+    parser.add_argument("--courses", type=int, default=5, help="Number of courses in the fake modulestore")
+    parser.add_argument("--dalite-passports", type=int, default=5, help="Dalite passports per course")
+    parser.add_argument("--other-passports", type=int, default=20, help="Non-Dalite LTI passports per course")
+    parser.add_argument("--blocks", type=int, default=40, help="Dalite blocks per unit page")
+    parser.add_argument("--verbose", action="store_true", help="Show log messages emitted by benchmarked code")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES_PATH, help="Baselines JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as new baselines")
+    parser.add_argument("--compare", action="store_true", help="Fail if results regress against baselines")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown when comparing"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entrypoint for this script."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    setup_django()
+
+    from benchmarks.fakes import BenchmarkFixture
+
+    fixture = BenchmarkFixture(
+        courses=args.courses, dalite_passports=args.dalite_passports, other_passports=args.other_passports,
+        blocks=args.blocks
+    )
+    benchmarks = make_benchmarks(fixture)
+    if args.benchmarks:
+        unknown = set(args.benchmarks) - set(name for name, __ in benchmarks)
+        if unknown:
+            sys.exit("Unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+        benchmarks = [(name, func) for name, func in benchmarks if name in args.benchmarks]
+
+    results = []
+    for name, func in benchmarks:
+        # Whole pages are much slower than single calls, keep total runtime reasonable
+        iterations = max(args.iterations // args.blocks, 10) if name.endswith("_page") else args.iterations
+        results.append(run_benchmark(name, func, iterations=iterations, warmup=args.warmup))
+    print format_results(results)
+    print "course loads: {}, max RSS: {} kB".format(fixture.modulestore.get_course_calls, results[-1].max_rss_kb)
+
+    baselines = load_baselines(args.baselines)
+    if args.save_baseline:
+        save_baselines(args.baselines, results, baselines)
+        print "Baselines saved to {}".format(args.baselines)
+    elif args.compare:
+        regressions = find_regressions(results, baselines, args.tolerance)
+        if regressions:
+            print "Regressions against {}:".format(args.baselines)
+            for regression in regressions:
+                print "  " + regression
+            return 1
+        print "No regressions against {}".format(args.baselines)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
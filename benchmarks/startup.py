@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Startup benchmark of the Dalite XBlock entry point.
+
+XBlock discovery in every LMS and Studio process, management commands included, loads the ``xblock.v1`` entry point
+`dalite_xblock.dalite_xblock:DaliteXBlock`. This benchmark loads it in fresh interpreters, after importing what those
+processes have already imported (Django and XBlock), and reports what loading it costs: wall time, number of imported
+modules and growth of resident memory. The same is measured for `lti_consumer`, whose `LtiConsumerXBlock` is the base
+class of DaliteXBlock and so is always imported with it; the difference is the cost of this package.
+
+Modules that are only needed to render or launch blocks must not be imported by the entry point; the benchmark fails
+if any of `LAZY_MODULES` is.
+
+    $ python -m benchmarks.startup --repeat 10
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+from benchmarks.harness import percentile
+from benchmarks.run_benchmarks import setup_django
+
+ENTRY_POINT = "dalite_xblock.dalite_xblock:DaliteXBlock"
+BASE_CLASS = "lti_consumer.lti_consumer:LtiConsumerXBlock"
+PRELOADED_MODULES = ("xblock.core", "xblock.fields", "webob", "web_fragments.fragment")
+LAZY_MODULES = (
+    "dalite_xblock.health", "dalite_xblock.lti", "dalite_xblock.oauth", "dalite_xblock.outcomes",
+    "dalite_xblock.grade_buffer", "dalite_xblock.nonce_store", "multiprocessing.pool", "uuid",
+)
+METRICS = ("import_ms", "modules", "rss_kb")
+
+
+def rss_kb():
+    """
+    Return resident memory of this process, in kB.
+
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+    except IOError:
+        # No procfs (i.e. on macOS) - peak memory is the closest approximation, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def measure_import(entry_point):
+    """
+    Load an entry point in this process and measure what it costs.
+
+    :param str entry_point: Entry point, ``module:attribute``
+    :returns: Import time in milliseconds, number of imported modules, resident memory growth in kB, and which of
+        `LAZY_MODULES` got imported
+    :rtype: dict
+    """
+    setup_django()
+    for module_name in PRELOADED_MODULES:
+        importlib.import_module(module_name)
+
+    module_name, attribute = entry_point.split(":")
+    modules_before = set(name for name, module in sys.modules.items() if module is not None)
+    rss_before = rss_kb()
+    started = time.time()
+    getattr(importlib.import_module(module_name), attribute)
+    import_ms = (time.time() - started) * 1000
+    modules = set(name for name, module in sys.modules.items() if module is not None) - modules_before
+    return {
+        "import_ms": import_ms,
+        "modules": len(modules),
+        "rss_kb": rss_kb() - rss_before,
+        "lazy_modules": sorted(modules.intersection(LAZY_MODULES)),
+    }
+
+
+def measure_in_subprocess(entry_point):
+    """
+    Measure loading an entry point in a fresh interpreter.
+
+    :param str entry_point: Entry point, ``module:attribute``
+    :rtype: dict
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.startup", "--child", entry_point],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return json.loads(output)
+
+
+def summarize(samples):
+    """
+    Return median and maximum of every metric of repeated measurements.
+
+    :param list[dict] samples: Results of `measure_import`
+    :rtype: dict
+    """
+    summary = OrderedDict()
+    for metric in METRICS:
+        values = sorted(sample[metric] for sample in samples)
+        summary[metric] = {"p50": percentile(values, 0.5), "max": values[-1]}
+    summary["lazy_modules"] = sorted(set(name for sample in samples for name in sample["lazy_modules"]))
+    return summary
+
+
+def run_startup_benchmark(repeat=5, entry_point=ENTRY_POINT, base_class=BASE_CLASS):
+    """
+    Measure loading the entry point, and its base class, `repeat` times each.
+
+    :param int repeat: Number of fresh interpreters per entry point
+    :param str entry_point: Benchmarked entry point
+    :param str base_class: Entry point of the base class
+    :rtype: dict
+    """
+    entry_point_samples, base_class_samples = [], []
+    for __ in range(repeat):
+        entry_point_samples.append(measure_in_subprocess(entry_point))
+        base_class_samples.append(measure_in_subprocess(base_class))
+    return OrderedDict([
+        ("repeat", repeat),
+        (entry_point, summarize(entry_point_samples)),
+        (base_class, summarize(base_class_samples)),
+    ])
+
+
+def format_report(report):
+    """
+    Format startup benchmark report as a table.
+
+    :param dict report: Result of `run_startup_benchmark`
+    :rtype: str
+    """
+    header = "{:<45} {:>10} {:>10} {:>9} {:>9} {:>9}".format(
+        "entry point", "p50 ms", "max ms", "modules", "p50 kB", "max kB"
+    )
+    lines = [header, "-" * len(header)]
+    summaries = [(name, summary) for name, summary in report.items() if isinstance(summary, dict)]
+    for name, summary in summaries:
+        lines.append("{:<45} {:>10.1f} {:>10.1f} {:>9} {:>9} {:>9}".format(
+            name, summary["import_ms"]["p50"], summary["import_ms"]["max"], summary["modules"]["p50"],
+            summary["rss_kb"]["p50"], summary["rss_kb"]["max"]
+        ))
+    if len(summaries) == 2:
+        (__, own), (__, base) = summaries
+        lines.append("{:<45} {:>10.1f} {:>10} {:>9} {:>9}".format(
+            "difference", own["import_ms"]["p50"] - base["import_ms"]["p50"], "",
+            own["modules"]["p50"] - base["modules"]["p50"], own["rss_kb"]["p50"] - base["rss_kb"]["p50"]
+        ))
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Measure import time and memory of the Dalite XBlock entry point")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters per entry point")
+    parser.add_argument("--entry-point", default=ENTRY_POINT, help="Benchmarked entry point, module:attribute")
+    parser.add_argument("--json", action="store_true", help="Print report as JSON")
+    parser.add_argument("--child", metavar="ENTRY_POINT", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entrypoint for this script."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.child:
+        print json.dumps(measure_import(args.child))
+        return 0
+
+    report = run_startup_benchmark(repeat=args.repeat, entry_point=args.entry_point)
+    print json.dumps(report, indent=2) if args.json else format_report(report)
+    lazy_modules = report[args.entry_point]["lazy_modules"]
+    if lazy_modules:
+        print >> sys.stderr, "Entry point imports modules that should be loaded on first use: {}".format(
+            ", ".join(lazy_modules)
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
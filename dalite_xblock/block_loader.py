@@ -0,0 +1,132 @@
+"""
+Loading Dalite blocks outside of the request that reported their grades.
+
+Grades published after the grade callback has returned (see `grade_buffer`) or pulled from dalite-ng in bulk (see
+`grade_sync`) can't use the block and runtime of a request: by then the runtime has already saved the block, and is
+not safe to use from another thread. Such grades are published to a fresh block, loaded the way LMS loads blocks for
+``handle_xblock_callback_noauth`` (which the outcome service handler is called through), and the block is saved
+right after. Publishing a score binds the block to the student, so publishing scores of many students to one block
+binds it back to an anonymous user before every score (see `bind_blocks_from_lms`) - loading it only once.
+
+Loading blocks by usage id relies on edx-platform LMS internals; elsewhere `BlockLoaderConfigurationError` is raised
+as soon as such loading is configured.
+"""
+import contextlib
+import logging
+
+import six
+
+try:
+    from courseware.model_data import FieldDataCache
+    from courseware.module_render import get_module_by_usage_id, get_module_for_descriptor
+    from django.contrib.auth.models import AnonymousUser
+    from django.test.client import RequestFactory
+    from opaque_keys.edx.keys import UsageKey
+    from xmodule.modulestore.django import modulestore
+except ImportError as _lms_import_error:
+    # Outside of edx-platform blocks have to be loaded by a loader passed explicitly
+    get_module_by_usage_id = None
+    LMS_IMPORT_ERROR = six.text_type(_lms_import_error)
+else:
+    LMS_IMPORT_ERROR = None
+
+logger = logging.getLogger(__name__)
+
+
+class BlockLoaderConfigurationError(RuntimeError):
+    """Blocks can't be loaded by usage id, because this process is not edx-platform LMS."""
+
+
+def check_lms_block_loading():
+    """
+    Check that blocks can be loaded by usage id with `load_block_from_lms` or `bind_blocks_from_lms`.
+
+    :raises BlockLoaderConfigurationError: outside of edx-platform LMS
+    """
+    if get_module_by_usage_id is None:
+        raise BlockLoaderConfigurationError(
+            "Blocks can only be loaded by usage id in edx-platform LMS ({}); pass a block loader explicitly, or "
+            "disable grade buffering".format(LMS_IMPORT_ERROR)
+        )
+
+
+def load_block_from_lms(usage_id):
+    """
+    Load a block with a fresh LMS runtime, bound to an anonymous user as in grade callbacks.
+
+    As in ``handle_xblock_callback_noauth``, the block is loaded in a bulk operation of its course, with the course
+    passed to the runtime.
+
+    :param unicode usage_id: Usage id of the block
+    :rtype: DaliteXBlock
+    :raises BlockLoaderConfigurationError: outside of edx-platform LMS
+    """
+    check_lms_block_loading()
+    usage_key = UsageKey.from_string(six.text_type(usage_id))
+    course_key = usage_key.course_key
+    store = modulestore()
+    with store.bulk_operations(course_key):
+        course = store.get_course(course_key, depth=0)
+        block, __ = get_module_by_usage_id(
+            _anonymous_request(), six.text_type(course_key), six.text_type(usage_key), course=course
+        )
+    return block
+
+
+@contextlib.contextmanager
+def bind_blocks_from_lms(usage_id):
+    """
+    Load a block once, and bind it to an anonymous user with a fresh LMS runtime as often as needed.
+
+    Binding the loaded block needs no modulestore access, and user state of anonymous users is not read. The block is
+    loaded, and bound, in a bulk operation of its course.
+
+    :param unicode usage_id: Usage id of the block
+    :returns: Context manager returning a callable that binds the block and returns it
+    :raises BlockLoaderConfigurationError: outside of edx-platform LMS
+    """
+    check_lms_block_loading()
+    usage_key = UsageKey.from_string(six.text_type(usage_id))
+    course_key = usage_key.course_key
+    request = _anonymous_request()
+    store = modulestore()
+    with store.bulk_operations(course_key):
+        course = store.get_course(course_key, depth=0)
+        descriptor = store.get_item(usage_key)
+
+        def bind_block():
+            """Bind the block to an anonymous user, as `load_block_from_lms` does."""
+            field_data_cache = FieldDataCache([descriptor], course_key, request.user)
+            return get_module_for_descriptor(
+                request.user, request, descriptor, field_data_cache, course_key, course=course
+            )
+
+        yield bind_block
+
+
+def _anonymous_request():
+    """Return request of an unknown anonymous user, as grade callbacks are handled for."""
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+    request.user.known = False
+    return request
+
+
+def publish_user_score(block, user_id, score, max_score=None):
+    """
+    Publish score of a user to a freshly loaded or bound block, and save the block.
+
+    :param DaliteXBlock block: Block bound to an anonymous user, with a fresh runtime
+    :param unicode user_id: Anonymous id of the user, as sent in LTI launches
+    :param float score: Score, between 0 and 1
+    :param float|None max_score: Maximum score of the block, read from the block by default
+    :returns: False if the user is not known to the runtime
+    :rtype: bool
+    """
+    real_user = block.runtime.get_real_user(user_id)
+    if real_user is None:
+        logger.warning("Unknown user %s in grades of %s", user_id, block.scope_ids.usage_id)
+        return False
+    block.set_user_module_score(real_user, score, block.max_score() if max_score is None else max_score)
+    block.save()
+    return True
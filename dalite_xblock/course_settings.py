@@ -0,0 +1,132 @@
+"""
+Course settings providers.
+
+DaliteXBlock only needs `lti_passports` advanced setting of a course, so instead of loading the whole course it asks
+a course settings provider for it. Runtimes can plug in a lighter implementation by providing a service named
+`COURSE_SETTINGS_SERVICE` (i.e. one that reads advanced settings from a cache); otherwise passports are read from the
+course loaded from the modulestore, and memoized for the duration of the current request.
+"""
+import weakref
+
+from .instrumentation import timed
+
+try:
+    # edx-platform request cache is cleared at the end of every request
+    from request_cache import get_cache as get_request_cache
+except ImportError:
+    get_request_cache = None
+
+COURSE_SETTINGS_SERVICE = 'dalite-course-settings'
+
+_REQUEST_CACHE_NAME = __name__
+_RUNTIME_MEMOS = weakref.WeakKeyDictionary()
+
+
+class CourseSettingsProvider(object):
+    """
+    Base class for course settings providers.
+
+    Values are memoized by provider instance, so providers should not outlive a single request.
+    """
+
+    def __init__(self):
+        """Initialize CourseSettingsProvider."""
+        self._lti_passports = {}
+
+    def get_lti_passports(self, course_id):
+        """
+        Return LTI passports configured in the course advanced settings.
+
+        :param str course_id: Course ID
+        :rtype: tuple[str]
+        """
+        try:
+            return self._lti_passports[course_id]
+        except KeyError:
+            passports = self._lti_passports[course_id] = tuple(self.fetch_lti_passports(course_id))
+            return passports
+
+    def fetch_lti_passports(self, course_id):
+        """
+        Fetch LTI passports from the underlying storage.
+
+        :param str course_id: Course ID
+        :rtype: Iterable[str]
+        """
+        raise NotImplementedError()
+
+
+class ModulestoreCourseSettingsProvider(CourseSettingsProvider):
+    """Course settings provider reading settings from the course loaded from the modulestore."""
+
+    def __init__(self, modulestore):
+        """
+        Initialize ModulestoreCourseSettingsProvider.
+
+        :param modulestore: Modulestore to load courses from
+        """
+        super(ModulestoreCourseSettingsProvider, self).__init__()
+        self._modulestore = modulestore
+
+    def fetch_lti_passports(self, course_id):
+        """Load course (without any descendants) and return its LTI passports."""
+        with timed("course_settings.fetch", {"course_id": course_id}):
+            course = self._modulestore.get_course(course_id, depth=0)
+        return getattr(course, 'lti_passports', None) or ()
+
+
+class InMemoryCourseSettingsProvider(CourseSettingsProvider):
+    """Course settings provider backed by a dictionary - for workbench and tests."""
+
+    def __init__(self, lti_passports_by_course=None):
+        """
+        Initialize InMemoryCourseSettingsProvider.
+
+        :param dict[str, list[str]] lti_passports_by_course: LTI passports keyed by course ID
+        """
+        super(InMemoryCourseSettingsProvider, self).__init__()
+        self.lti_passports_by_course = lti_passports_by_course or {}
+
+    def fetch_lti_passports(self, course_id):
+        """Return LTI passports stored for given course."""
+        return self.lti_passports_by_course.get(course_id, ())
+
+
+def _get_request_memo(runtime):
+    """
+    Return dictionary living for the duration of current request.
+
+    Falls back to a dictionary bound to the runtime lifetime outside of edx-platform (e.g. in workbench, which
+    creates runtime per request).
+    """
+    if get_request_cache is not None:
+        return get_request_cache(_REQUEST_CACHE_NAME)
+    try:
+        return _RUNTIME_MEMOS[runtime]
+    except KeyError:
+        memo = _RUNTIME_MEMOS[runtime] = {}
+        return memo
+
+
+def get_course_settings_provider(block):
+    """
+    Return course settings provider for a block.
+
+    :param XBlock block: XBlock requesting course settings
+    :rtype: CourseSettingsProvider
+    """
+    runtime = block.runtime
+    service = runtime.service(block, COURSE_SETTINGS_SERVICE)
+    if service is not None:
+        return service
+
+    memo = _get_request_memo(runtime)
+    provider = memo.get(COURSE_SETTINGS_SERVICE)
+    if provider is None:
+        modulestore = getattr(runtime, 'modulestore', None)
+        if modulestore is None:
+            provider = InMemoryCourseSettingsProvider()
+        else:
+            provider = ModulestoreCourseSettingsProvider(modulestore)
+        memo[COURSE_SETTINGS_SERVICE] = provider
+    return provider
@@ -1,22 +1,67 @@
 """Dalite XBlock - convenient wrapper for LTIConsumer block tuned to work with dalite-ng."""
 import contextlib
 import logging
+import threading
 
 from lazy.lazy import lazy
 from lti_consumer import LtiConsumerXBlock
+from web_fragments.fragment import Fragment
+from webob import Response
 from xblock.core import XBlock
+from xblock.exceptions import JsonHandlerError
 from xblock.fields import String, Scope
-from xblockutils.resources import ResourceLoader
 
-from .mixins import CourseAwareXBlockMixin
-from .utils import _, FieldValuesContextManager
-from .passport_utils import filter_and_parse_passports
+from .course_settings import COURSE_SETTINGS_SERVICE, get_course_settings_provider
+from .fragment_cache import fragment_fingerprint, get_fragment_cache
+from .instrumentation import increment, timed
+from .mixins import CourseAwareXBlockMixin, StudioFieldValuesProviderMixin
+from .utils import _, env_flag
+from .passport_cache import PASSPORT_CACHE
+from .passport_utils import select_root_url
+from .resources import CachedResourceLoader
+
+try:
+    from opaque_keys import InvalidKeyError
+    from opaque_keys.edx.keys import UsageKey
+except ImportError:
+    # Outside of edx-platform (i.e. in workbench) usage ids are plain strings
+    InvalidKeyError, UsageKey = ValueError, None
+
+# `health`, `lti`, `oauth` and `outcomes` modules are imported where they are used: XBlock discovery imports this
+# module in every LMS and Studio process, i.e. in management commands, which never render or launch a block - and
+# `health` and `outcomes` start background threads and register exit handlers. See `benchmarks.startup`.
 
 logger = logging.getLogger(__name__)
-loader = ResourceLoader(__name__)
+loader = CachedResourceLoader(__name__)
+lti_consumer_loader = CachedResourceLoader(LtiConsumerXBlock.__module__)
 
+# Holds per-thread custom LTI parameters added for the duration of a single launch, keyed by block id
+_launch_overlay = threading.local()
 
-class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
+# Holds ids of blocks current thread renders student view of with deferred inline launch
+_deferred_launch_renders = threading.local()
+
+# `health.healthy_root_urls`, imported on first use - importing it on every read of `launch_url` would take the global
+# import lock every time
+_health_root_urls = None
+
+
+def healthy_root_urls(urls):
+    """
+    Return dalite-ng nodes that are in rotation, see `dalite_xblock.health.healthy_root_urls`.
+
+    :param Iterable[str] urls: dalite-ng root URLs
+    :rtype: tuple[str]
+    """
+    global _health_root_urls  # pylint: disable=global-statement
+    if _health_root_urls is None:
+        from .health import healthy_root_urls as health_root_urls
+        _health_root_urls = health_root_urls
+    return _health_root_urls(urls)
+
+
+@XBlock.wants(COURSE_SETTINGS_SERVICE)
+class DaliteXBlock(StudioFieldValuesProviderMixin, LtiConsumerXBlock, CourseAwareXBlockMixin):
     """
     This XBlock provides an LTI consumer interface for integrating Dalite-NG tools using the LTI specification.
 
@@ -65,12 +110,19 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         # 'ask_to_send_email' - dalite-ng defined
     ]
 
+    field_values_providers = {
+        "lti_id": "lti_id_values_provider",
+    }
+
     NO_LTI_PASSPORTS_OPTION = {"display_name": _("No Dalite-ng LTI Passports configured"), "value": ""}
 
     ADMIN_URL_SUFFIX = u"admin"
     EDIT_QUESTION_SUFFIX = u"edit-question"
 
     LMS_ERROR_MESSAGE = _("This question is not configured yet.  Please tell your instructor if you see this error.")
+    DALITE_UNAVAILABLE_MESSAGE = _(
+        "This question is temporarily unavailable.  Please try again in a few minutes."
+    )
     CMS_NO_PASSPORT_ERROR = _(
         'No valid LTI passport set. Please click Edit and select LTI passport.  '
         'If you see: "No Dalite-ng LTI Passports configured" message, then '
@@ -84,28 +136,62 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         "No question selected. Please click \"Edit\" and enter the assignment ID and question ID."
     )
 
+    # Student view fragment is rendered from values of fields in these scopes (score and comment are user state)
+    FRAGMENT_FIELD_SCOPES = (Scope.content, Scope.settings, Scope.user_state)
+
+    # If true, admin overlay iframes are created (and dalite-ng admin launched) only when their overlay is opened
+    lazy_admin_iframes = env_flag("DALITE_XBLOCK_LAZY_ADMIN_IFRAMES", default=True)
+
+    # If true, inline iframes are launched only when they near the viewport, rather than when the page loads
+    defer_inline_launch = env_flag("DALITE_XBLOCK_DEFER_INLINE_LAUNCH", default=False)
+
+    # Maximum number of blocks `block_status` handler reports on in a single request
+    MAX_STATUS_BLOCK_IDS = 100
+
     # Note used by some bowels of XBlock machinery, if absent after edit will use student_view in studio.
     has_author_view = True
 
-    @property
+    @lazy
     def course(self):
         """
         Return course by course id.
 
+        Prefer `course_settings` if only course settings are needed - this loads the whole course.
+
         :returns: Course XBlock for current course
         :rtype: XBlock
         """
-        return self.runtime.modulestore.get_course(self.course_id)
+        with timed("course.load", self.metric_tags):
+            return self.runtime.modulestore.get_course(self.course_id)
+
+    @lazy
+    def course_settings(self):
+        """
+        Return provider of course settings.
+
+        :rtype: CourseSettingsProvider
+        """
+        return get_course_settings_provider(self)
+
+    def metric_tags(self):
+        """
+        Return tags attached to instrumentation metrics of this block.
+
+        :rtype: dict[str, str]
+        """
+        return {"course_id": self.course_id, "lti_id": self.lti_id}
 
     @lazy
     def dalite_xblock_lti_passports(self):
         """
         Return all xblock-dalite LTI passports.
 
-        :returns: list of all Dalite-xblock LTI Passports
-        :rtype: list[DaliteLtiPassport]
+        Parsed passports are shared between all blocks in a course via process-wide passport cache.
+
+        :returns: all Dalite-xblock LTI Passports indexed by LTI ID
+        :rtype: DalitePassportIndex
         """
-        return filter_and_parse_passports(self.course.lti_passports)
+        return PASSPORT_CACHE.get_passports(self.course_id, self.course_settings.get_lti_passports(self.course_id))
 
     @lazy
     def lti_passport(self):
@@ -115,34 +201,62 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         :returns: LTI passport matching selected LTI ID
         :rtype: DaliteLtiPassport|None
         """
-        for lti_passport in self.dalite_xblock_lti_passports:
-            if lti_passport.lti_id == self.lti_id.strip():
-                logging.warn(
-                    _(u"LTI passport found for LTI ID %s: dalite URL is %s"), self.lti_id, lti_passport.dalite_root_url
-                )
-                return lti_passport
+        lti_passport = self.dalite_xblock_lti_passports.get(self.lti_id)
+        if lti_passport is not None:
+            logging.warn(
+                _(u"LTI passport found for LTI ID %s: dalite URL is %s"), self.lti_id, lti_passport.dalite_root_url
+            )
+            return lti_passport
 
         logging.warn(_(u"No matching LTI passport found for LTI ID %s"), self.lti_id)
         return None
 
     @property
     def lti_provider_key_secret(self):
-        """Obtain client_key and client_secret credentials from current course."""
+        """
+        Obtain client_key and client_secret credentials from current course.
+
+        Passports are decoded as byte strings, while lti_consumer OAuth code only accepts unicode ones.
+        """
         if not self.lti_passport:
-            return '', ''
-        return self.lti_passport.lti_key, self.lti_passport.lti_secret
+            return u'', u''
+        return unicode(self.lti_passport.lti_key), unicode(self.lti_passport.lti_secret)
+
+    @property
+    def lti_signer(self):
+        """
+        Return OAuth signer of selected LTI passport, shared by all blocks using the passport.
+
+        :rtype: PassportSigner
+        """
+        from .oauth import SIGNER_REGISTRY
+        key, secret = self.lti_provider_key_secret
+        return SIGNER_REGISTRY.get_signer(key, secret)
 
     @property
     def launch_url(self):
         """
         Return LTI launch URL for selected LTI passport.
 
+        If the passport lists several dalite-ng nodes, each student is consistently routed to one of them based on
+        their anonymous user id. With health probing enabled only nodes that are up are considered, so students of a
+        node that is down are spread over the others; if all of them are down the usual node is returned.
+
         :returns: launch URL for selected Dalite-ng instance
         :rtype: string
         """
         if not self.lti_passport:
             return ''
-        return self.lti_passport.dalite_root_url.rstrip('/') + '/lti/'
+        user_id = getattr(self.runtime, 'anonymous_student_id', None)
+        root_urls = self.lti_passport.dalite_root_urls
+        root_url = select_root_url(healthy_root_urls(root_urls) or root_urls, user_id)
+        return root_url.rstrip('/') + '/lti/'
+
+    @property
+    def is_dalite_available(self):
+        """Check that selected dalite-ng is not known to be down - health probing is disabled or any node is up."""
+        passport = self.lti_passport
+        return passport is None or bool(healthy_root_urls(passport.dalite_root_urls))
 
     def lti_id_values_provider(self):
         """
@@ -152,12 +266,9 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         :rtype: [dict[str, str]]
         """
         if not self.dalite_xblock_lti_passports:
-            return [self.NO_LTI_PASSPORTS_OPTION]
+            return [dict(self.NO_LTI_PASSPORTS_OPTION)]
 
-        return [
-            {"display_name": passport.lti_id, "value": passport.lti_id}
-            for passport in self.dalite_xblock_lti_passports
-        ]
+        return self.dalite_xblock_lti_passports.lti_id_options
 
     @property
     def is_lti_ready(self):
@@ -172,7 +283,7 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         :return: str or None
         """
         if self.is_lti_ready:
-            return None
+            return None if self.is_dalite_available else self.DALITE_UNAVAILABLE_MESSAGE
 
         if not in_studio:
             return self.LMS_ERROR_MESSAGE
@@ -182,32 +293,191 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
 
         return self.CMS_NO_QUESTION_ERROR
 
+    def get_status(self, in_studio):
+        """
+        Return readiness of this component and the message displayed to the viewer.
+
+        :param bool in_studio: If true will return message for the Instructor.
+        :rtype: dict
+        """
+        return {
+            "is_lti_ready": bool(self.is_lti_ready),
+            "message": self.get_status_message(in_studio),
+        }
+
+    def _load_dalite_block(self, block_id):
+        """
+        Load another Dalite block of the same course.
+
+        :param unicode block_id: Usage id of the block
+        :returns: Loaded block, or None if it does not exist, is not a Dalite block or belongs to another course
+        :rtype: DaliteXBlock|None
+        """
+        try:
+            usage_id = UsageKey.from_string(block_id) if UsageKey is not None else block_id
+            block = self.runtime.get_block(usage_id)
+        except InvalidKeyError:
+            logger.info(u"Invalid block id requested in block status: %s", block_id)
+            return None
+        except Exception:  # pylint: disable=broad-except
+            # Runtimes raise different exceptions for missing blocks (i.e. ItemNotFoundError, NoSuchUsage)
+            logger.info(u"Unable to load block %s requested in block status", block_id, exc_info=True)
+            return None
+
+        if not isinstance(block, DaliteXBlock) or block.course_id != self.course_id:
+            return None
+        return block
+
+    @XBlock.json_handler
+    def block_status(self, data, suffix=u''):  # pylint: disable=unused-argument
+        """
+        Report readiness and status messages of Dalite blocks.
+
+        Lets client code update status of all Dalite blocks on a page with a single request instead of
+        re-rendering every block.
+
+        :param dict data: Request data: `block_ids` - list of usage ids (defaults to this block only) and
+            `in_studio` - whether messages for the Instructor should be returned
+        :returns: Statuses keyed by usage id; blocks that cannot be loaded are omitted
+        :rtype: dict
+        """
+        in_studio = bool(data.get("in_studio"))
+        own_id = unicode(self.scope_ids.usage_id)
+        block_ids = data.get("block_ids") or [own_id]
+        if not isinstance(block_ids, list):
+            raise JsonHandlerError(400, "block_ids must be a list")
+        if len(block_ids) > self.MAX_STATUS_BLOCK_IDS:
+            raise JsonHandlerError(400, "At most {} block ids can be requested".format(self.MAX_STATUS_BLOCK_IDS))
+
+        statuses = {}
+        with timed("handler.block_status", self.metric_tags):
+            for block_id in block_ids:
+                block_id = unicode(block_id)
+                block = self if block_id == own_id else self._load_dalite_block(block_id)
+                if block is not None:
+                    statuses[block_id] = block.get_status(in_studio)
+        return {"statuses": statuses}
+
+    def get_field_values(self, scopes):
+        """
+        Return values of fields in given scopes, ordered by field name.
+
+        :param tuple[xblock.fields.Scope] scopes: Field scopes
+        :rtype: tuple[(str, Any)]
+        """
+        return tuple(
+            (field_name, field.read_from(self))
+            for field_name, field in sorted(self.fields.items())
+            if field.scope in scopes
+        )
+
+    def get_fragment_fingerprint(self, in_studio):
+        """
+        Return fingerprint of everything student view fragment depends on.
+
+        :param bool in_studio: If true fragment is rendered for CMS
+        :rtype: str
+        """
+        field_values = self.get_field_values(self.FRAGMENT_FIELD_SCOPES)
+        get_user_role = getattr(self.runtime, 'get_user_role', None)
+        user_role = get_user_role() if get_user_role is not None else None
+        return fragment_fingerprint(
+            field_values, self.lti_passport, user_role, bool(in_studio), self.defer_inline_launch,
+            self.is_dalite_available
+        )
+
     def render_student_view(self, context, in_studio):
         """
         Helper method that renders the "student" part of this XBlock both in CMS and in LMS.
 
+        If fragment cache is configured, rendered fragments are served from it until fields, selected passport,
+        viewer role or availability of dalite-ng change.
+
         :param dict context: Rendering context.
         :param bool in_studio: If true we are rendering for CMS (displays different error messages)
         :return: Fragment.
         """
-        fragment = super(DaliteXBlock, self).student_view(context)
+        with timed("render.student_view", self.metric_tags):
+            fragment_cache = get_fragment_cache()
+            if fragment_cache is None:
+                return self._render_student_view(context, in_studio)
+
+            usage_id = self.scope_ids.usage_id
+            fingerprint = self.get_fragment_fingerprint(in_studio)
+            fragment_dict = fragment_cache.get(usage_id, fingerprint)
+            if fragment_dict is not None:
+                increment("fragment_cache.hit", self.metric_tags)
+                return Fragment.from_dict(fragment_dict)
+
+            increment("fragment_cache.miss", self.metric_tags)
+            fragment = self._render_student_view(context, in_studio)
+            fragment_cache.set(usage_id, fingerprint, fragment.to_dict())
+            return fragment
+
+    def _render_student_view(self, context, in_studio):
+        """Render the "student" part of this XBlock, bypassing fragment cache."""
+        message = self.get_status_message(in_studio)
+        defer_launch = self.defer_inline_launch and self.launch_target == 'iframe' and message is None
+        with self._deferring_launch(defer_launch):
+            fragment = super(DaliteXBlock, self).student_view(context)
         fragment.add_javascript(loader.load_unicode('public/js/dalite_xblock.js'))
-        fragment.initialize_js('DaliteXBlock')
+        fragment.initialize_js('DaliteXBlock', {
+            "in_studio": bool(in_studio),
+            "is_lti_ready": bool(self.is_lti_ready),
+            "deferred_launch_url": self._get_launch_form_url() if defer_launch else None,
+        })
 
-        if not self.is_lti_ready:
-            message = self.get_status_message(in_studio)
+        if message is not None:
             fragment.content = u''
             context.update(self._get_context_for_template())
             context.update({
                 "message": message
             })
-            fragment.add_content(
-                loader.render_django_template('/templates/dalite_xblock_data_not_filled.html', context)
-            )
+            with timed("render.template.data_not_filled", self.metric_tags):
+                fragment.add_content(
+                    loader.render_django_template('/templates/dalite_xblock_data_not_filled.html', context)
+                )
             return fragment
 
         return fragment
 
+    def _get_launch_form_url(self):
+        """Return URL inline iframe is launched with - the same as LtiConsumerXBlock uses."""
+        return self.runtime.handler_url(self, 'lti_launch_handler').rstrip('/?')
+
+    @contextlib.contextmanager
+    def _deferring_launch(self, defer_launch):
+        """
+        Render inline iframe without launch URL while in this context, if `defer_launch` is true.
+
+        The iframe is then launched by `dalite_xblock.js` when it nears the viewport; until then the (empty) iframe
+        wrapper reserves `inline_height` of the page.
+        """
+        if not defer_launch:
+            yield
+            return
+        block_ids = getattr(_deferred_launch_renders, 'block_ids', None)
+        if block_ids is None:
+            block_ids = _deferred_launch_renders.block_ids = set()
+        block_ids.add(id(self))
+        try:
+            yield
+        finally:
+            block_ids.discard(id(self))
+
+    def _get_context_for_template(self):
+        """
+        Return the context dict for LTI templates.
+
+        Inline iframe launch URL is omitted if launch is deferred (see `_deferring_launch`).
+
+        :rtype: dict
+        """
+        context = super(DaliteXBlock, self)._get_context_for_template()
+        if id(self) in getattr(_deferred_launch_renders, 'block_ids', ()):
+            context['form_url'] = u''
+        return context
+
     def student_view(self, context):
         """
         XBlock student view of this component.
@@ -223,20 +493,78 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         """
         return self.render_student_view(context, False)
 
+    @property
+    def extra_custom_parameters(self):
+        """
+        Return custom parameters added to LTI launches of this block made by current thread.
+
+        :rtype: list[str]
+        """
+        overlays = getattr(_launch_overlay, 'custom_parameters', None)
+        if not overlays:
+            return []
+        return overlays.get(id(self), [])
+
+    @property
+    def static_custom_parameters(self):
+        """
+        Return custom LTI parameters configured for this block, without request-scoped extra parameters.
+
+        :rtype: dict[unicode, unicode]
+        """
+        return super(DaliteXBlock, self).prefixed_custom_parameters
+
+    @property
+    def extra_prefixed_custom_parameters(self):
+        """
+        Return request-scoped extra custom LTI parameters, prefixed as LTI requires.
+
+        :rtype: dict[unicode, unicode]
+        """
+        custom_parameters = {}
+        for parameter in self.extra_custom_parameters:
+            param_name, param_value = [part.strip() for part in parameter.split('=', 1)]
+            custom_parameters[u'custom_' + param_name] = unicode(param_value)
+        return custom_parameters
+
+    @property
+    def prefixed_custom_parameters(self):
+        """
+        Return custom LTI parameters sent to the LTI provider, including request-scoped extra parameters.
+
+        :rtype: dict[unicode, unicode]
+        """
+        custom_parameters = self.static_custom_parameters
+        extra_custom_parameters = self.extra_prefixed_custom_parameters
+        if extra_custom_parameters:
+            custom_parameters = dict(custom_parameters)
+            custom_parameters.update(extra_custom_parameters)
+        return custom_parameters
+
     @contextlib.contextmanager
     def add_extra_custom_params(self, additional_custom_parameters):
         """
-        Temporarily adds custom parameters to this xblock.
+        Temporarily adds custom parameters to LTI launches of this xblock made by current thread.
 
-        These parameters will be sent to the `lti` provider by any calls made during that time.
+        These parameters will be sent to the `lti` provider by any calls made during that time. Block fields are
+        not modified, so concurrent launches of the same block are not affected and no field data is saved.
 
         :param list additional_custom_parameters: A list of parameters in a 'key=value` format.
                Eg: ``[u'action=launch-admin']``
         """
-        current_params = self.custom_parameters
-        self.custom_parameters = list(self.custom_parameters) + additional_custom_parameters
-        yield
-        self.custom_parameters = current_params
+        overlays = getattr(_launch_overlay, 'custom_parameters', None)
+        if overlays is None:
+            overlays = _launch_overlay.custom_parameters = {}
+        block_key = id(self)
+        previous_params = overlays.get(block_key)
+        overlays[block_key] = list(previous_params or []) + list(additional_custom_parameters)
+        try:
+            yield
+        finally:
+            if previous_params is None:
+                del overlays[block_key]
+            else:
+                overlays[block_key] = previous_params
 
     @XBlock.handler
     def lti_launch_handler(self, request, suffix=u''):
@@ -245,7 +573,22 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
 
         This method interprets suffix parameter and translates it to
         action LTI parameter, which is then passed to dalite.
+
+        Launch parameters are built by DaliteLtiConsumer from cached static parameters, and the launch form is
+        rendered from the compiled LtiConsumerXBlock template. Launch URL is read once, so the form is posted to the
+        URL that was signed even if health of dalite-ng nodes changes meanwhile. If all dalite-ng nodes are down a
+        status message is returned right away instead of a launch that would hang.
         """
+        if self.is_lti_ready and not self.is_dalite_available:
+            increment("lti.launch.unavailable", self.metric_tags)
+            context = self._get_context_for_template()
+            context.update({"message": self.DALITE_UNAVAILABLE_MESSAGE})
+            return Response(
+                loader.render_django_template('/templates/dalite_xblock_data_not_filled.html', context),
+                status=503, content_type='text/html'
+            )
+
+        from .lti import DaliteLtiConsumer
         suffix = unicode(suffix)
         custom_params = []
         # By default no action, which means to show the question.
@@ -256,8 +599,27 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
             # Launch admin url that allows to edit currently selected question
             custom_params = [u'action=edit-question']
 
-        with self.add_extra_custom_params(custom_params):
-            return super(DaliteXBlock, self).lti_launch_handler(request)
+        with self.add_extra_custom_params(custom_params), timed("lti.launch", self.metric_tags):
+            launch_url = self.launch_url
+            lti_parameters = DaliteLtiConsumer(self).get_signed_lti_parameters(launch_url)
+            context = self._get_context_for_template()
+            context.update({'launch_url': launch_url.strip(), 'lti_parameters': lti_parameters})
+            return Response(
+                lti_consumer_loader.render_mako_template('/templates/html/lti_launch.html', context),
+                content_type='text/html'
+            )
+
+    @XBlock.handler
+    def outcome_service_handler(self, request, suffix=u''):  # pylint: disable=unused-argument
+        """
+        Override superclass method.
+
+        Handles grade callbacks with DaliteOutcomeService, which adds replay protection and grade buffering to
+        lti_consumer OutcomeService.
+        """
+        from .outcomes import DaliteOutcomeService
+        with timed("lti.outcome", self.metric_tags):
+            return Response(DaliteOutcomeService(self).handle_request(request), content_type="application/xml")
 
     def render_button_launching_admin(self, context, form_url_suffix, button_label, id_specifier):
         """A helper method that renders a button that launches dalite admin in an overlay."""
@@ -267,10 +629,12 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
             'has_score': False,
             'form_url_suffix': form_url_suffix,
             'dalite_admin_label': button_label,
-            'element_id_specifier': id_specifier
+            'element_id_specifier': id_specifier,
+            'lazy_iframe': self.lazy_admin_iframes,
         })
 
-        return loader.render_django_template("/templates/dalite_xblock_lti_iframe.html", admin_context)
+        with timed("render.template.lti_iframe", self.metric_tags):
+            return loader.render_django_template("/templates/dalite_xblock_lti_iframe.html", admin_context)
 
     def author_view(self, context):
         """XBlock view in studio. It adds admin buttons that allow to launch an overlay displaying admin."""
@@ -301,14 +665,13 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         :returns: XBlock HTML fragment
         :rtype: xblock.fragment.Fragment
         """
-        # can't use values_provider as we need it to be bound to current block instance
-        with FieldValuesContextManager(self, 'lti_id', self.lti_id_values_provider):
-            fragment = super(DaliteXBlock, self).studio_view(context)
-            fragment.add_javascript(loader.load_unicode('public/js/dalite_xblock_edit.js'))
-            fragment.initialize_js('DaliteXBlockEdit')
-            return fragment
+        # LTI ID values are provided by lti_id_values_provider - see StudioFieldValuesProviderMixin
+        fragment = super(DaliteXBlock, self).studio_view(context)
+        fragment.add_javascript(loader.load_unicode('public/js/dalite_xblock_edit.js'))
+        fragment.initialize_js('DaliteXBlockEdit')
+        return fragment
 
-    def clean_studio_edits(self, data):  # pylint: disable=no-self-use
+    def clean_studio_edits(self, data):
         """
         Given POST data dictionary 'data', clean the data before validating it.
 
@@ -329,3 +692,7 @@ class DaliteXBlock(LtiConsumerXBlock, CourseAwareXBlockMixin):
         }
         data.update(fixed_values)
         logging.info(_(u"Cleaned xblock field values: %s"), data)
+
+        fragment_cache = get_fragment_cache()
+        if fragment_cache is not None:
+            fragment_cache.invalidate(self.scope_ids.usage_id)
@@ -0,0 +1,220 @@
+"""
+Cache of rendered Dalite XBlock fragments.
+
+Student (and author) view fragment of a Dalite block depends only on the block fields, the selected LTI passport and
+the viewer role, so it can be rendered once and served from a cache until any of those change. Cached fragments are
+keyed by block usage id, a per-block version token and a fingerprint of everything the fragment depends on:
+
+* changes to fields or passports produce a new fingerprint, so stale fragments are never served;
+* `FragmentCache.invalidate` replaces the version token of a block, orphaning all its cached fragments - it is called
+  when the block is edited in Studio.
+
+Fragment caching is disabled by default. Enable it by calling ``configure(cache)``, or with
+``DALITE_XBLOCK_FRAGMENT_CACHE`` environment variable, using one of the following values:
+
+* ``memory`` - keep fragments in an in-process LRU cache;
+* ``django`` or ``django://<alias>`` - keep fragments in a Django cache (``default`` alias if not specified), shared
+  between processes.
+"""
+import binascii
+import hashlib
+import os
+import urlparse
+
+from .passport_cache import LruTtlCache
+
+FRAGMENT_CACHE_ENV_VARIABLE = "DALITE_XBLOCK_FRAGMENT_CACHE"
+DEFAULT_FRAGMENT_CACHE_SIZE = 1024
+DEFAULT_FRAGMENT_CACHE_TTL = 3600  # seconds
+
+_KEY_PREFIX = "dalite_xblock.fragment"
+
+
+class FragmentCacheBackend(object):
+    """Base class for storages of cached fragments."""
+
+    def get(self, key):
+        """
+        Return value stored under `key`, or None if it is absent.
+
+        :param str key: Cache key
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`.
+
+        :param str key: Cache key
+        :param dict|str value: Value to store - either fragment dictionary representation or a version token
+        """
+        raise NotImplementedError()
+
+
+class LocalFragmentCacheBackend(FragmentCacheBackend):
+    """Storage keeping fragments in an in-process LRU cache."""
+
+    def __init__(self, max_size=DEFAULT_FRAGMENT_CACHE_SIZE, ttl=DEFAULT_FRAGMENT_CACHE_TTL):
+        """
+        Initialize LocalFragmentCacheBackend.
+
+        :param int max_size: Maximum number of entries (fragments and version tokens) kept in the cache
+        :param float|None ttl: Number of seconds an entry stays valid
+        """
+        self._cache = LruTtlCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key):
+        """Return value stored under `key`."""
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        """Store `value` under `key`."""
+        self._cache.set(key, value)
+
+    def clear(self):
+        """Drop all cached values."""
+        self._cache.clear()
+
+
+class DjangoFragmentCacheBackend(FragmentCacheBackend):
+    """Storage keeping fragments in a Django cache, i.e. memcached shared by all LMS processes."""
+
+    def __init__(self, alias="default", timeout=DEFAULT_FRAGMENT_CACHE_TTL):
+        """
+        Initialize DjangoFragmentCacheBackend.
+
+        :param str alias: Django cache alias, as configured in `CACHES` setting
+        :param int|None timeout: Number of seconds an entry stays valid
+        """
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key):
+        """Return value stored under `key`."""
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        """Store `value` under `key`."""
+        self._cache.set(key, value, self.timeout)
+
+
+def _new_version():
+    """Return a random version token (`uuid` is not used, as importing it loads `ctypes`)."""
+    return binascii.hexlify(os.urandom(16))
+
+
+def fragment_fingerprint(*parts):
+    """
+    Return a fingerprint of values a fragment depends on.
+
+    :param parts: Values with stable `repr`, i.e. strings, numbers, tuples of those
+    :rtype: str
+    """
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+class FragmentCache(object):
+    """Cache of fragment dictionary representations keyed by block usage id and fingerprint."""
+
+    def __init__(self, backend):
+        """
+        Initialize FragmentCache.
+
+        :param FragmentCacheBackend backend: Storage of cached fragments
+        """
+        self.backend = backend
+
+    @staticmethod
+    def _block_key(usage_id):
+        # Usage ids can be longer than memcached key length limit and contain characters it does not accept
+        return hashlib.sha1(unicode(usage_id).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _version_key(block_key):
+        return "{}.version.{}".format(_KEY_PREFIX, block_key)
+
+    def _get_version(self, block_key):
+        """Return current version token of a block, generating a new one if it is absent."""
+        version_key = self._version_key(block_key)
+        version = self.backend.get(version_key)
+        if version is None:
+            # New token, rather than a default one - entries cached before version token was evicted stay orphaned
+            version = _new_version()
+            self.backend.set(version_key, version)
+        return version
+
+    def _fragment_key(self, usage_id, fingerprint):
+        block_key = self._block_key(usage_id)
+        return "{}.{}.{}.{}".format(_KEY_PREFIX, block_key, self._get_version(block_key), fingerprint)
+
+    def get(self, usage_id, fingerprint):
+        """
+        Return cached fragment representation, or None if it is not cached.
+
+        :param usage_id: Block usage id
+        :param str fingerprint: Fingerprint of values the fragment depends on (see `fragment_fingerprint`)
+        :rtype: dict|None
+        """
+        return self.backend.get(self._fragment_key(usage_id, fingerprint))
+
+    def set(self, usage_id, fingerprint, fragment_dict):
+        """
+        Store fragment representation.
+
+        :param usage_id: Block usage id
+        :param str fingerprint: Fingerprint of values the fragment depends on (see `fragment_fingerprint`)
+        :param dict fragment_dict: Fragment dictionary representation, as returned by `Fragment.to_dict`
+        """
+        self.backend.set(self._fragment_key(usage_id, fingerprint), fragment_dict)
+
+    def invalidate(self, usage_id):
+        """
+        Orphan all cached fragments of a block.
+
+        :param usage_id: Block usage id
+        """
+        self.backend.set(self._version_key(self._block_key(usage_id)), _new_version())
+
+
+def cache_from_url(url):
+    """
+    Create fragment cache described by a URL-like string (see module docstring).
+
+    :param str|None url: Cache description, empty means disabled fragment caching
+    :rtype: FragmentCache|None
+    """
+    if not url:
+        return None
+    if url == "memory":
+        return FragmentCache(LocalFragmentCacheBackend())
+    parsed = urlparse.urlparse(url)
+    if parsed.scheme == "django" or url == "django":
+        return FragmentCache(DjangoFragmentCacheBackend(alias=parsed.netloc or "default"))
+    raise ValueError("Unknown fragment cache: {}".format(url))
+
+
+_fragment_cache = cache_from_url(os.environ.get(FRAGMENT_CACHE_ENV_VARIABLE))
+
+
+def configure(cache):
+    """
+    Set process-wide fragment cache.
+
+    :param FragmentCache|None cache: Cache to use, None disables fragment caching
+    """
+    global _fragment_cache  # pylint: disable=global-statement
+    _fragment_cache = cache
+
+
+def get_fragment_cache():
+    """
+    Return process-wide fragment cache.
+
+    :rtype: FragmentCache|None
+    """
+    return _fragment_cache
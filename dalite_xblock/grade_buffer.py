@@ -0,0 +1,316 @@
+"""
+Write-behind buffer of grades reported by dalite-ng.
+
+dalite-ng reports a score (LTI ``replaceResult``) every time a student answers or re-answers a question, and again
+when it resyncs grades, and each report publishes a grade to the runtime. With grade buffering enabled the outcome
+service only records the score (usage id, anonymous user id and score - no blocks or runtimes) and acknowledges the
+request; scores are published later, in batches, by a background flusher thread:
+
+* repeated scores of the same user in the same block are coalesced - only the latest one is published;
+* a score is published at most `window` seconds after the first (not yet published) report of it was received;
+* pending scores are flushed every `window` seconds, as soon as `batch_size` scores are pending, and at process exit.
+
+Grade callbacks never publish scores themselves. Every score is published to a freshly loaded block, which is saved
+right after (see `block_loader`). The flusher thread is started when the first score is buffered, and recycles its
+database connections around every batch, as Django does around requests.
+
+Buffering is disabled by default. Enable it by calling ``configure(buffer)``, or with ``DALITE_XBLOCK_GRADE_BUFFER``
+environment variable, using one of the following values:
+
+* ``memory`` - keep pending scores in an in-process queue, with default window and batch size;
+* ``memory://?window=<seconds>&batch=<size>`` - same, with custom window and batch size.
+
+Pending scores are lost if the process is killed before they are flushed - dalite-ng resends them on its next resync.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import urlparse
+from collections import OrderedDict, namedtuple
+
+from django.db import close_old_connections
+
+from .block_loader import check_lms_block_loading, load_block_from_lms, publish_user_score
+from .instrumentation import increment, timed
+
+logger = logging.getLogger(__name__)
+
+GRADE_BUFFER_ENV_VARIABLE = "DALITE_XBLOCK_GRADE_BUFFER"
+DEFAULT_WINDOW = 5.0  # seconds
+DEFAULT_BATCH_SIZE = 100
+
+# Score waiting to be published: coalescing key - (block usage id, anonymous user id), latest reported score (between
+# 0 and 1), maximum score of the block, time the first report of the score was received at and number of reports
+# coalesced into it.
+PendingGrade = namedtuple("PendingGrade", ["key", "score", "max_score", "received", "reports"])
+
+
+class GradeQueueBackend(object):
+    """Base class for storages of pending grades."""
+
+    def put(self, grade):
+        """
+        Add grade to the queue, replacing pending grade with the same key.
+
+        Replaced grade keeps its position in the queue and receive time, so coalescing never delays a score.
+
+        :param PendingGrade grade: Reported grade
+        :returns: True if a pending grade was replaced
+        :rtype: bool
+        """
+        raise NotImplementedError()
+
+    def take(self, received_before, max_items):
+        """
+        Remove and return oldest pending grades.
+
+        :param float|None received_before: Only take grades received before this time, None takes any grades
+        :param int max_items: Maximum number of grades returned
+        :rtype: list[PendingGrade]
+        """
+        raise NotImplementedError()
+
+    def __len__(self):
+        """Return number of pending grades."""
+        raise NotImplementedError()
+
+
+class InMemoryGradeQueue(GradeQueueBackend):
+    """Thread-safe in-process storage of pending grades, ordered by receive time."""
+
+    def __init__(self):
+        """Initialize InMemoryGradeQueue."""
+        self._grades = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, grade):
+        """Add grade to the queue, replacing pending grade with the same key."""
+        with self._lock:
+            pending = self._grades.get(grade.key)
+            if pending is None:
+                self._grades[grade.key] = grade
+                return False
+            self._grades[grade.key] = grade._replace(received=pending.received, reports=pending.reports + 1)
+            return True
+
+    def take(self, received_before, max_items):
+        """Remove and return oldest pending grades."""
+        taken = []
+        with self._lock:
+            while self._grades and len(taken) < max_items:
+                key, grade = next(self._grades.iteritems())
+                if received_before is not None and grade.received >= received_before:
+                    break
+                del self._grades[key]
+                taken.append(grade)
+        return taken
+
+    def __len__(self):
+        """Return number of pending grades."""
+        return len(self._grades)
+
+
+class GradeBuffer(object):
+    """Coalesces reported grades per user and block and publishes them in batches."""
+
+    def __init__(
+            self, backend, window=DEFAULT_WINDOW, batch_size=DEFAULT_BATCH_SIZE, load_block=load_block_from_lms,
+            clock=time.time
+    ):
+        """
+        Initialize GradeBuffer.
+
+        :param GradeQueueBackend backend: Storage of pending grades
+        :param float window: Maximum number of seconds a grade stays pending
+        :param int batch_size: Maximum number of grades published in one batch, more pending grades wake the flusher
+        :param (unicode) -> DaliteXBlock load_block: Returns block with a fresh runtime by its usage id
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.backend = backend
+        self.window = window
+        self.batch_size = batch_size
+        self.load_block = load_block
+        self.clock = clock
+        # Start GradeFlusher thread when the first grade is added (see `configure`)
+        self.background_flusher = False
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        # Set when a full batch is pending, so the flusher does not wait for the window to pass
+        self.batch_ready = threading.Event()
+        # Only one thread publishes at a time, so batches of the same key are published in order
+        self._flush_lock = threading.Lock()
+
+    def add(self, key, score, max_score):
+        """
+        Record reported grade; it is published later by the flusher.
+
+        :param key: Coalescing key, (block usage id, anonymous user id)
+        :param float score: Reported score, between 0 and 1
+        :param float max_score: Maximum score of the block
+        """
+        grade = PendingGrade(key=key, score=score, max_score=max_score, received=self.clock(), reports=1)
+        if self.backend.put(grade):
+            increment("grade_buffer.coalesced")
+        else:
+            increment("grade_buffer.buffered")
+        if len(self.backend) >= self.batch_size:
+            self.batch_ready.set()
+        if self.background_flusher and self._flusher is None:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        """Start background flusher, unless another thread has just started it."""
+        with self._flusher_lock:
+            if self._flusher is None and self.background_flusher:
+                self._flusher = GradeFlusher(self)
+                self._flusher.start()
+
+    def stop_flusher(self):
+        """Stop background flusher, if it is running, and don't start it again."""
+        with self._flusher_lock:
+            self.background_flusher = False
+            if self._flusher is not None:
+                self._flusher.stop()
+                self._flusher = None
+
+    def flush(self, force=False):
+        """
+        Publish pending grades.
+
+        Forced flush waits for flushes running in other threads; otherwise flushing is skipped if another thread is
+        flushing already - it will pick up grades that are due. Stale database connections of the calling thread are
+        closed around every batch, so flushes are only made by the flusher thread and at exit, never by requests.
+
+        :param bool force: Publish all pending grades, not only the ones pending for longer than `window`
+        :returns: Number of published grades
+        :rtype: int
+        """
+        if not self._flush_lock.acquire(force):
+            return 0
+        self.batch_ready.clear()
+        published = 0
+        try:
+            while True:
+                received_before = None if force else self.clock() - self.window
+                batch = self.backend.take(received_before, self.batch_size)
+                if not batch:
+                    break
+                close_old_connections()
+                try:
+                    with timed("grade_buffer.flush", {"batch_size": len(batch)}):
+                        published += self._publish(batch)
+                finally:
+                    close_old_connections()
+        finally:
+            self._flush_lock.release()
+        return published
+
+    def _publish(self, batch):
+        """Publish batch of grades to freshly loaded blocks, logging (and dropping) the ones that fail."""
+        published = 0
+        for grade in batch:
+            usage_id, user_id = grade.key
+            try:
+                if publish_user_score(self.load_block(usage_id), user_id, grade.score, grade.max_score):
+                    published += 1
+            except Exception:  # pylint: disable=broad-except
+                # One broken grade must not prevent publishing the rest of the batch
+                logger.exception("Failed to publish buffered grade %s", grade.key)
+        return published
+
+
+class GradeFlusher(threading.Thread):
+    """Background thread flushing grade buffer periodically, and whenever a full batch is pending."""
+
+    def __init__(self, grade_buffer, interval=None):
+        """
+        Initialize GradeFlusher.
+
+        :param GradeBuffer grade_buffer: Buffer to flush
+        :param float|None interval: Seconds between flushes, defaults to buffer window
+        """
+        super(GradeFlusher, self).__init__(name="dalite-grade-flusher")
+        self.daemon = True
+        self.grade_buffer = grade_buffer
+        self.interval = interval if interval is not None else grade_buffer.window
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Flush buffer until stopped."""
+        while True:
+            batch_ready = self.grade_buffer.batch_ready.wait(self.interval)
+            if self._stopped.is_set():
+                return
+            try:
+                self.grade_buffer.flush(force=bool(batch_ready))
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to flush grade buffer")
+
+    def stop(self):
+        """Stop flushing."""
+        self._stopped.set()
+        self.grade_buffer.batch_ready.set()
+
+
+def buffer_from_url(url):
+    """
+    Create grade buffer described by a URL-like string (see module docstring).
+
+    :param str|None url: Buffer description, empty means disabled grade buffering
+    :rtype: GradeBuffer|None
+    """
+    if not url:
+        return None
+    parsed = urlparse.urlparse(url)
+    if url != "memory" and parsed.scheme != "memory":
+        raise ValueError("Unknown grade buffer: {}".format(url))
+    options = urlparse.parse_qs(parsed.query)
+    return GradeBuffer(
+        InMemoryGradeQueue(),
+        window=float(options.get("window", [DEFAULT_WINDOW])[0]),
+        batch_size=int(options.get("batch", [DEFAULT_BATCH_SIZE])[0]),
+    )
+
+
+_grade_buffer = None
+
+
+def configure(grade_buffer, background_flusher=True):
+    """
+    Set process-wide grade buffer, flushing the previous one.
+
+    :param GradeBuffer|None grade_buffer: Buffer to use, None disables grade buffering
+    :param bool background_flusher: Flush the buffer in a background thread, started when the first grade is added;
+        without it grades are published only at exit or by explicit flushes (i.e. in tests)
+    :raises BlockLoaderConfigurationError: if grades would be published to LMS blocks outside of edx-platform LMS
+    """
+    global _grade_buffer  # pylint: disable=global-statement
+    if grade_buffer is not None and grade_buffer.load_block is load_block_from_lms:
+        check_lms_block_loading()
+    if _grade_buffer is not None:
+        _grade_buffer.stop_flusher()
+        _grade_buffer.flush(force=True)
+    _grade_buffer = grade_buffer
+    if grade_buffer is not None:
+        grade_buffer.background_flusher = background_flusher
+
+
+def get_grade_buffer():
+    """
+    Return process-wide grade buffer.
+
+    :rtype: GradeBuffer|None
+    """
+    return _grade_buffer
+
+
+def flush_at_exit():
+    """Publish all pending grades of process-wide grade buffer."""
+    if _grade_buffer is not None:
+        _grade_buffer.flush(force=True)
+
+
+configure(buffer_from_url(os.environ.get(GRADE_BUFFER_ENV_VARIABLE)))
+atexit.register(flush_at_exit)
@@ -0,0 +1,380 @@
+"""
+Bulk synchronization of grades from dalite-ng.
+
+Grades normally reach the LMS through LTI outcome callbacks, one student answer at a time. When callbacks fail,
+`GradeSynchronizer` pulls all grades of a course from dalite-ng instead: for every Dalite block it requests grades of
+the block question and assignment from the dalite-ng instance of the block passport, and publishes them in batches.
+
+dalite-ng exports grades as newline-delimited JSON, one object per student::
+
+    GET <dalite_root_url>/api/grades/?assignment_id=<assignment id>&question_id=<question id>
+
+    {"user_id": "<anonymous student id, as sent in LTI launches>", "score": 0.75}
+
+Requests are signed with OAuth 1 (HMAC-SHA1) using key and secret of the passport, as LTI launches are. Responses are
+parsed line by line as they arrive, requests to dalite-ng instances are sent over pooled keep-alive connections by a
+bounded number of threads, and batches are published from the calling thread only.
+
+`sync_course_grades` publishes grades of a whole course to the LMS; call it from an LMS shell. Every block is loaded
+once per batch, bound to each student of the batch in turn, and saved after every grade (see `block_loader`).
+"""
+import json
+import logging
+import threading
+import urllib
+from collections import namedtuple
+from Queue import Queue
+
+import six
+
+from .block_loader import bind_blocks_from_lms, publish_user_score
+from .course_settings import ModulestoreCourseSettingsProvider
+from .http_pool import PoolManager
+from .oauth import SIGNER_REGISTRY
+from .passport_utils import DALITE_BLOCK_CATEGORY, DalitePassportIndex
+
+logger = logging.getLogger(__name__)
+
+GRADES_ENDPOINT_PATH = "api/grades/"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BATCH_SIZE = 500
+
+SyncTarget = namedtuple("SyncTarget", ["usage_id", "passport", "assignment_id", "question_id"])
+SyncedGrade = namedtuple("SyncedGrade", ["user_id", "score"])
+
+
+class GradeSyncError(Exception):
+    """Grades of a block could not be fetched from dalite-ng."""
+
+
+class GradeSyncReport(object):
+    """Outcome of grade synchronization; safe to update from many threads."""
+
+    def __init__(self):
+        """Initialize GradeSyncReport."""
+        self.targets = 0
+        self.grades = 0
+        self.batches = 0
+        self.malformed_lines = 0
+        self.skipped = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add_skipped(self, usage_id, reason):
+        """Record block that was not synchronized."""
+        with self._lock:
+            self.skipped.append({"usage_id": usage_id, "reason": reason})
+
+    def add_error(self, usage_id, message):
+        """Record block whose grades could not be fetched or published."""
+        with self._lock:
+            self.errors.append({"usage_id": usage_id, "error": message})
+
+    def add_malformed_line(self):
+        """Record grade line that could not be parsed."""
+        with self._lock:
+            self.malformed_lines += 1
+
+    def as_dict(self):
+        """
+        Return report as a JSON-serializable dictionary.
+
+        :rtype: dict
+        """
+        return {
+            "targets": self.targets,
+            "grades": self.grades,
+            "batches": self.batches,
+            "malformed_lines": self.malformed_lines,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+def block_description(block):
+    """
+    Return description of a Dalite block used to synchronize its grades.
+
+    :param DaliteXBlock block: Dalite block
+    :rtype: dict
+    """
+    return {
+        "usage_id": six.text_type(block.scope_ids.usage_id),
+        "lti_id": block.lti_id,
+        "assignment_id": block.assignment_id,
+        "question_id": block.question_id,
+    }
+
+
+def blocks_from_modulestore(modulestore, course_key):
+    """
+    Yield descriptions of all Dalite blocks in a course.
+
+    :param modulestore: edx-platform modulestore
+    :param course_key: Course key
+    :rtype: Iterable[dict]
+    """
+    for block in modulestore.get_items(course_key, qualifiers={"category": DALITE_BLOCK_CATEGORY}):
+        yield block_description(block)
+
+
+def iter_sync_targets(blocks, passport_index, report):
+    """
+    Resolve passports of Dalite blocks, skipping blocks that are not configured.
+
+    :param Iterable[dict] blocks: Block descriptions, see `block_description`
+    :param DalitePassportIndex passport_index: Course passports
+    :param GradeSyncReport report: Report skipped blocks are recorded in
+    :rtype: Iterable[SyncTarget]
+    """
+    for block in blocks:
+        usage_id = block.get("usage_id")
+        passport = passport_index.get(block.get("lti_id"))
+        if passport is None:
+            report.add_skipped(usage_id, u"No LTI passport for LTI ID {}".format(block.get("lti_id")))
+        elif not block.get("assignment_id") or not block.get("question_id"):
+            report.add_skipped(usage_id, u"Assignment or question is not set")
+        else:
+            yield SyncTarget(
+                usage_id=usage_id, passport=passport,
+                assignment_id=block["assignment_id"], question_id=block["question_id"]
+            )
+
+
+def grades_url(target, endpoint_path=GRADES_ENDPOINT_PATH):
+    """
+    Return URL of dalite-ng grade export of a block.
+
+    :param SyncTarget target: Synchronized block
+    :param str endpoint_path: Path of grade export endpoint, relative to dalite-ng root URL
+    :rtype: str
+    """
+    query = urllib.urlencode([
+        ("assignment_id", six.text_type(target.assignment_id).encode('utf-8')),
+        ("question_id", six.text_type(target.question_id).encode('utf-8')),
+    ])
+    # Nodes of a multi-node passport share their database, so grades are exported by the first one
+    root_url = target.passport.get_root_url(None)
+    return "{}/{}?{}".format(root_url.rstrip('/'), endpoint_path.lstrip('/'), query)
+
+
+def parse_grade_line(line):
+    """
+    Parse a single line of dalite-ng grade export.
+
+    :param str line: JSON object with `user_id` and `score` keys
+    :rtype: SyncedGrade
+    :raises ValueError: if line is malformed or score is not between 0 and 1
+    """
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("Grade is not an object")
+    score = float(data["score"])
+    if not 0 <= score <= 1:
+        raise ValueError("Score out of range: {}".format(score))
+    return SyncedGrade(user_id=six.text_type(data["user_id"]), score=score)
+
+
+class GradePublisher(object):
+    """Base class for destinations of synchronized grades."""
+
+    def publish(self, target, grades):
+        """
+        Publish batch of grades of a block.
+
+        :param SyncTarget target: Synchronized block
+        :param list[SyncedGrade] grades: Grades
+        :returns: Number of published grades
+        :rtype: int
+        """
+        raise NotImplementedError()
+
+
+class JsonLinesGradePublisher(GradePublisher):
+    """Writes grades to a stream as newline-delimited JSON, i.e. to review them before they are published."""
+
+    def __init__(self, stream):
+        """
+        Initialize JsonLinesGradePublisher.
+
+        :param file stream: Output stream
+        """
+        self.stream = stream
+
+    def publish(self, target, grades):
+        """Write grades to the stream."""
+        for grade in grades:
+            self.stream.write(json.dumps({
+                "usage_id": target.usage_id, "user_id": grade.user_id, "score": grade.score,
+            }, sort_keys=True))
+            self.stream.write("\n")
+        self.stream.flush()
+        return len(grades)
+
+
+class BlockGradePublisher(GradePublisher):
+    """Publishes grades to the runtime as Dalite blocks do when handling outcome callbacks, and saves them."""
+
+    def __init__(self, bind_blocks=bind_blocks_from_lms):
+        """
+        Initialize BlockGradePublisher.
+
+        :param bind_blocks: Returns context manager loading block by its usage id, and returning a callable binding
+            the block to a fresh LMS runtime, see `bind_blocks_from_lms`
+        """
+        self.bind_blocks = bind_blocks
+
+    def publish(self, target, grades):
+        """Set and save module scores of students known to the runtime, loading the block once."""
+        published = 0
+        with self.bind_blocks(target.usage_id) as bind_block:
+            for grade in grades:
+                # Publishing binds the block to the student, so it is bound back for every grade
+                if publish_user_score(bind_block(), grade.user_id, grade.score):
+                    published += 1
+        return published
+
+
+class GradeSynchronizer(object):
+    """Pulls grades of Dalite blocks from dalite-ng and publishes them in batches."""
+
+    def __init__(
+            self, publisher, pool_manager=None, concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+            endpoint_path=GRADES_ENDPOINT_PATH, signer_registry=SIGNER_REGISTRY
+    ):
+        """
+        Initialize GradeSynchronizer.
+
+        :param GradePublisher publisher: Destination of synchronized grades
+        :param PoolManager|None pool_manager: HTTP connection pools, shared by all fetching threads
+        :param int concurrency: Maximum number of concurrent requests to dalite-ng
+        :param int batch_size: Maximum number of grades published at once
+        :param str endpoint_path: Path of grade export endpoint, relative to dalite-ng root URL
+        :param SignerRegistry signer_registry: OAuth signers of passports
+        """
+        self.publisher = publisher
+        self.pool_manager = pool_manager or PoolManager(max_size=concurrency)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.endpoint_path = endpoint_path
+        self.signer_registry = signer_registry
+
+    def fetch(self, target, report):
+        """
+        Stream grades of a block from dalite-ng, in batches.
+
+        :param SyncTarget target: Synchronized block
+        :param GradeSyncReport report: Report malformed lines are recorded in
+        :rtype: Iterable[list[SyncedGrade]]
+        :raises GradeSyncError: if dalite-ng does not return grades
+        """
+        url = grades_url(target, self.endpoint_path)
+        signer = self.signer_registry.get_signer(target.passport.lti_key, target.passport.lti_secret)
+        headers = {"Authorization": signer.sign_request(url).encode('utf-8'), "Accept": "application/x-ndjson"}
+        with self.pool_manager.request("GET", url, headers=headers) as response:
+            if response.status != 200:
+                raise GradeSyncError("dalite-ng responded with {} {}".format(response.status, response.reason))
+            batch = []
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    batch.append(parse_grade_line(line))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Malformed grade line of %s: %r", target.usage_id, line[:200])
+                    report.add_malformed_line()
+                    continue
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def _fetch_worker(self, targets, results, report):
+        """Fetch grades of targets from the queue until a None target is found."""
+        while True:
+            target = targets.get()
+            if target is None:
+                results.put(None)
+                return
+            try:
+                for batch in self.fetch(target, report):
+                    results.put((target, batch))
+            except Exception as exc:  # pylint: disable=broad-except
+                # Failing block must not stop synchronization of other blocks
+                logger.warning("Failed to fetch grades of %s: %s", target.usage_id, exc)
+                report.add_error(target.usage_id, u"Fetch failed: {}".format(exc))
+
+    def sync(self, targets, report=None):
+        """
+        Fetch and publish grades of blocks.
+
+        :param Iterable[SyncTarget] targets: Synchronized blocks
+        :param GradeSyncReport|None report: Report to update, i.e. one already holding skipped blocks
+        :rtype: GradeSyncReport
+        """
+        report = report or GradeSyncReport()
+        target_queue = Queue()
+        for target in targets:
+            target_queue.put(target)
+            report.targets += 1
+        # Bounded, so fetching pauses when publishing can't keep up
+        results = Queue(maxsize=self.concurrency * 2)
+        workers = [
+            threading.Thread(target=self._fetch_worker, args=(target_queue, results, report))
+            for __ in range(self.concurrency)
+        ]
+        for worker in workers:
+            target_queue.put(None)
+            worker.daemon = True
+            worker.start()
+
+        running = len(workers)
+        while running:
+            result = results.get()
+            if result is None:
+                running -= 1
+                continue
+            target, batch = result
+            try:
+                report.grades += self.publisher.publish(target, batch)
+                report.batches += 1
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Failed to publish grades of %s", target.usage_id)
+                report.add_error(target.usage_id, u"Publish failed: {}".format(exc))
+        return report
+
+
+def sync_course_grades(course_key, store=None, bind_blocks=bind_blocks_from_lms, **synchronizer_options):
+    """
+    Pull grades of all Dalite blocks of a course from dalite-ng, and publish them to the LMS.
+
+    From an LMS shell::
+
+        >>> from opaque_keys.edx.keys import CourseKey
+        >>> from dalite_xblock.grade_sync import sync_course_grades
+        >>> sync_course_grades(CourseKey.from_string("course-v1:Org+Course+Run")).as_dict()
+
+    :param course_key: Course key
+    :param store: Modulestore blocks and course passports are read from, defaults to edx-platform modulestore
+    :param bind_blocks: Loads blocks grades are published to, see `BlockGradePublisher`
+    :param synchronizer_options: Other `GradeSynchronizer` arguments, i.e. `concurrency` or `batch_size`
+    :rtype: GradeSyncReport
+    """
+    if store is None:
+        from xmodule.modulestore.django import modulestore
+        store = modulestore()
+    passport_index = DalitePassportIndex.from_passport_strings(
+        ModulestoreCourseSettingsProvider(store).get_lti_passports(course_key)
+    )
+    report = GradeSyncReport()
+    targets = iter_sync_targets(blocks_from_modulestore(store, course_key), passport_index, report)
+    pool_manager = synchronizer_options.pop("pool_manager", None)
+    synchronizer = GradeSynchronizer(
+        BlockGradePublisher(bind_blocks), pool_manager=pool_manager, **synchronizer_options
+    )
+    try:
+        return synchronizer.sync(targets, report)
+    finally:
+        if pool_manager is None:
+            synchronizer.pool_manager.close()
@@ -0,0 +1,385 @@
+"""
+Health of dalite-ng nodes, probed in the background.
+
+When a dalite-ng node is down every launch sent to it hangs until the iframe times out. With health probing enabled a
+background thread periodically requests the root URL of every distinct dalite-ng node of cached passports, and keeps
+a circuit breaker per node:
+
+* a node is taken out of rotation (breaker opens) after `threshold` consecutive failed probes - a connection error,
+  a timeout or a 5xx response;
+* an unavailable node is probed again only after `reset` seconds (breaker is half-open), and is put back into
+  rotation by the first successful probe;
+* nodes that were never probed are considered healthy.
+
+Students are routed to healthy nodes of the passport only (see `DaliteXBlock.launch_url`), and get a status message
+instead of a launch when none of them is healthy. Probes of a node are spaced `interval` seconds apart, randomly
+shifted by up to `jitter` of the interval so workers of all LMS processes don't probe in lockstep, at most
+`concurrency` probes run at once, and probes reuse keep-alive connections.
+
+Probing is disabled by default. Enable it by calling ``configure(prober)``, or with ``DALITE_XBLOCK_HEALTH_PROBE``
+environment variable, using one of the following values:
+
+* ``probe`` - probe with default settings;
+* ``probe://?interval=<seconds>&jitter=<fraction>&concurrency=<probes>&timeout=<seconds>&threshold=<failures>``
+  ``&reset=<seconds>&path=<path>`` - same, with custom settings.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import urlparse
+
+from .http_pool import PoolManager
+from .instrumentation import increment
+from .passport_cache import PASSPORT_CACHE
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_ENV_VARIABLE = "DALITE_XBLOCK_HEALTH_PROBE"
+DEFAULT_INTERVAL = 15.0  # seconds
+DEFAULT_JITTER = 0.2
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 3.0  # seconds
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0  # seconds
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker(object):
+    """Health of a single dalite-ng node, as a closed / open / half-open circuit breaker."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 clock=time.time):
+        """
+        Initialize CircuitBreaker.
+
+        :param int failure_threshold: Number of consecutive failures opening the breaker
+        :param float reset_timeout: Seconds an open breaker waits before letting a trial request through
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        Return breaker state.
+
+        :rtype: str
+        """
+        opened_at = self._opened_at
+        if opened_at is None:
+            return CLOSED
+        return HALF_OPEN if self._clock() - opened_at >= self.reset_timeout else OPEN
+
+    @property
+    def is_closed(self):
+        """Check if the node is in rotation."""
+        return self._opened_at is None
+
+    def record_success(self):
+        """
+        Record a successful request, closing the breaker.
+
+        :returns: Whether the breaker was closed by this request
+        :rtype: bool
+        """
+        with self._lock:
+            was_open = self._opened_at is not None
+            self.failures = 0
+            self._opened_at = None
+        return was_open
+
+    def record_failure(self):
+        """
+        Record a failed request, opening the breaker once failure threshold is reached or if the trial request failed.
+
+        :returns: Whether the breaker was opened by this request
+        :rtype: bool
+        """
+        with self._lock:
+            self.failures += 1
+            if self._opened_at is not None:
+                # Failed trial request - wait another reset timeout
+                self._opened_at = self._clock()
+                return False
+            if self.failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                return True
+            return False
+
+
+class HealthRegistry(object):
+    """Circuit breakers of dalite-ng nodes, keyed by root URL."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 clock=time.time):
+        """
+        Initialize HealthRegistry.
+
+        :param int failure_threshold: Number of consecutive failed probes taking a node out of rotation
+        :param float reset_timeout: Seconds before an unavailable node is probed again
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        """
+        Return circuit breaker of a node, creating it if needed.
+
+        :param str url: dalite-ng root URL
+        :rtype: CircuitBreaker
+        """
+        url = url.rstrip('/')
+        with self._lock:
+            breaker = self._breakers.get(url)
+            if breaker is None:
+                breaker = self._breakers[url] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self._clock)
+            return breaker
+
+    def is_healthy(self, url):
+        """
+        Check if a node is in rotation; nodes that were never probed are.
+
+        :param str url: dalite-ng root URL
+        :rtype: bool
+        """
+        breaker = self._breakers.get(url.rstrip('/'))
+        return breaker is None or breaker.is_closed
+
+    def healthy_urls(self, urls):
+        """
+        Return the nodes that are in rotation.
+
+        :param Iterable[str] urls: dalite-ng root URLs
+        :rtype: tuple[str]
+        """
+        return tuple(url for url in urls if self.is_healthy(url))
+
+    def should_probe(self, url):
+        """
+        Check if a node should be probed - it is in rotation, or has been out of it for the reset timeout.
+
+        :param str url: dalite-ng root URL
+        :rtype: bool
+        """
+        return self.breaker(url).state != OPEN
+
+    def record(self, url, healthy):
+        """
+        Record outcome of a probe, logging nodes taken out of or put back into rotation.
+
+        :param str url: dalite-ng root URL
+        :param bool healthy: Whether the probe succeeded
+        """
+        breaker = self.breaker(url)
+        if healthy:
+            if breaker.record_success():
+                logger.warning("dalite-ng node %s is back up", url)
+                increment("health.node_up", {"dalite_url": url})
+        elif breaker.record_failure():
+            logger.warning("dalite-ng node %s is down after %d failed probes", url, breaker.failures)
+            increment("health.node_down", {"dalite_url": url})
+
+    def as_dict(self):
+        """
+        Return state of all probed nodes.
+
+        :rtype: dict[str, dict]
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            url: {"state": breaker.state, "failures": breaker.failures}
+            for url, breaker in breakers.items()
+        }
+
+
+class HealthProber(threading.Thread):
+    """Background thread probing dalite-ng nodes."""
+
+    def __init__(self, registry, endpoints=None, interval=DEFAULT_INTERVAL, jitter=DEFAULT_JITTER,
+                 concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, path="", pool_manager=None,
+                 clock=time.time, rand=random.random):
+        """
+        Initialize HealthProber.
+
+        :param HealthRegistry registry: Registry probe outcomes are recorded in
+        :param (() -> Iterable[str])|None endpoints: Returns root URLs of nodes to probe, defaults to nodes of
+            cached passports
+        :param float interval: Seconds between probes of a node
+        :param float jitter: Fraction of the interval probes are randomly shifted by
+        :param int concurrency: Maximum number of probes running at once
+        :param float timeout: Probe timeout, in seconds
+        :param str path: Path probed, relative to the root URL
+        :param PoolManager|None pool_manager: Connections probes are sent over
+        :param () -> float clock: Time source, useful in tests
+        :param () -> float rand: Random number source, useful in tests
+        """
+        super(HealthProber, self).__init__(name="dalite-health-prober")
+        self.daemon = True
+        self.registry = registry
+        self.endpoints = endpoints or PASSPORT_CACHE.dalite_root_urls
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.path = path
+        self.pool_manager = pool_manager or PoolManager(max_size=concurrency, timeout=timeout)
+        self._clock = clock
+        self._rand = rand
+        self._next_probes = {}
+        self._workers = None
+        self._stopped = threading.Event()
+
+    def probe(self, url):
+        """
+        Probe a node.
+
+        Any response other than 5xx means the node is up - root URL of dalite-ng redirects or asks for login.
+
+        :param str url: dalite-ng root URL
+        :returns: Whether the node is up
+        :rtype: bool
+        """
+        probe_url = url.rstrip('/') + '/' + self.path.lstrip('/')
+        try:
+            with self.pool_manager.request("GET", probe_url.encode('utf-8')) as response:
+                response.read()
+        except Exception:  # pylint: disable=broad-except
+            logger.info("Health probe of dalite-ng node %s failed", url, exc_info=True)
+            return False
+        return response.status < 500
+
+    def _probe_and_record(self, url):
+        """Probe a node and record the outcome."""
+        self.registry.record(url, self.probe(url))
+
+    def probe_due(self):
+        """
+        Probe all nodes whose probe is due, at most `concurrency` at once.
+
+        :returns: Seconds until the next probe is due
+        :rtype: float
+        """
+        now = self._clock()
+        urls = list(self.endpoints())
+        # Forget nodes whose passports are no longer cached
+        self._next_probes = {url: self._next_probes.get(url, now) for url in urls}
+        due = []
+        for url in urls:
+            next_probe = self._next_probes[url]
+            if next_probe <= now and self.registry.should_probe(url):
+                due.append(url)
+                self._next_probes[url] = now + self.interval * (1 + self.jitter * (2 * self._rand() - 1))
+
+        if due:
+            if self._workers is None:
+                from multiprocessing.pool import ThreadPool
+                self._workers = ThreadPool(self.concurrency)
+            self._workers.map(self._probe_and_record, due)
+
+        now = self._clock()
+        return max(0.0, min([self.interval] + [probe_at - now for probe_at in self._next_probes.values()]))
+
+    def run(self):
+        """Probe nodes until stopped."""
+        delay = 0.0
+        while not self._stopped.wait(delay):
+            try:
+                delay = self.probe_due()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to probe dalite-ng nodes")
+                delay = self.interval
+            # Avoid a busy loop when a probe is due but its node is waiting for the breaker to reset
+            delay = max(delay, min(self.interval, 1.0))
+
+    def stop(self):
+        """Stop probing and close connections."""
+        self._stopped.set()
+        if self._workers is not None:
+            self._workers.close()
+            self._workers = None
+        self.pool_manager.close()
+
+
+def prober_from_url(url):
+    """
+    Create health prober described by a URL-like string (see module docstring).
+
+    :param str|None url: Prober description, empty means disabled health probing
+    :rtype: HealthProber|None
+    """
+    if not url:
+        return None
+    parsed = urlparse.urlparse(url)
+    if url != "probe" and parsed.scheme != "probe":
+        raise ValueError("Unknown health prober: {}".format(url))
+    options = urlparse.parse_qs(parsed.query)
+    registry = HealthRegistry(
+        failure_threshold=int(options.get("threshold", [DEFAULT_FAILURE_THRESHOLD])[0]),
+        reset_timeout=float(options.get("reset", [DEFAULT_RESET_TIMEOUT])[0]),
+    )
+    return HealthProber(
+        registry,
+        interval=float(options.get("interval", [DEFAULT_INTERVAL])[0]),
+        jitter=float(options.get("jitter", [DEFAULT_JITTER])[0]),
+        concurrency=int(options.get("concurrency", [DEFAULT_CONCURRENCY])[0]),
+        timeout=float(options.get("timeout", [DEFAULT_TIMEOUT])[0]),
+        path=options.get("path", [""])[0],
+    )
+
+
+_prober = None
+
+
+def configure(prober, start=True):
+    """
+    Set process-wide health prober, stopping the previous one.
+
+    :param HealthProber|None prober: Prober to use, None disables health probing
+    :param bool start: Start probing in the background
+    """
+    global _prober  # pylint: disable=global-statement
+    if _prober is not None:
+        _prober.stop()
+    _prober = prober
+    if prober is not None and start:
+        prober.start()
+
+
+def get_health_registry():
+    """
+    Return health of dalite-ng nodes tracked by process-wide health prober.
+
+    :rtype: HealthRegistry|None
+    """
+    prober = _prober
+    return prober.registry if prober is not None else None
+
+
+def healthy_root_urls(urls):
+    """
+    Return dalite-ng nodes that are in rotation; all of them if health probing is disabled.
+
+    :param Iterable[str] urls: dalite-ng root URLs
+    :rtype: tuple[str]
+    """
+    registry = get_health_registry()
+    if registry is None:
+        return tuple(urls)
+    return registry.healthy_urls(urls)
+
+
+configure(prober_from_url(os.environ.get(HEALTH_PROBE_ENV_VARIABLE)))
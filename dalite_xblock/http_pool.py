@@ -0,0 +1,235 @@
+"""
+Pooled keep-alive HTTP connections to dalite-ng instances.
+
+`httplib` opens a new TCP (and TLS) connection for every request unless a connection object is reused. `ConnectionPool`
+keeps up to `max_size` idle connections to a single host and hands them out to threads; `PoolManager` keeps one pool
+per scheme, host and port. Connections are returned to the pool only after their response has been read to the end,
+so the next request on the same connection does not see leftovers of the previous one.
+"""
+import httplib
+import logging
+import socket
+import threading
+import urlparse
+from Queue import Empty, Full, LifoQueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30  # seconds
+READ_CHUNK_SIZE = 16 * 1024
+
+# Errors meaning that an idle keep-alive connection was closed by the server, the request can be retried
+_STALE_CONNECTION_ERRORS = (httplib.BadStatusLine, httplib.CannotSendRequest, socket.error)
+
+
+class PooledResponse(object):
+    """HTTP response returning its connection to the pool once it is read to the end or closed."""
+
+    def __init__(self, pool, connection, response):
+        """
+        Initialize PooledResponse.
+
+        :param ConnectionPool pool: Pool the connection belongs to
+        :param httplib.HTTPConnection connection: Connection the response is read from
+        :param httplib.HTTPResponse response: Response
+        """
+        self._pool = pool
+        self._connection = connection
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+
+    def getheader(self, name, default=None):
+        """Return response header value."""
+        return self._response.getheader(name, default)
+
+    def read(self, amount=None):
+        """Read (part of) response body."""
+        data = self._response.read(amount) if amount is not None else self._response.read()
+        if self._response.isclosed():
+            self._release()
+        return data
+
+    def iter_lines(self, chunk_size=READ_CHUNK_SIZE):
+        """
+        Iterate over lines of response body (with line endings stripped) without reading the whole body into memory.
+
+        :param int chunk_size: Number of bytes read at once
+        """
+        pending = ''
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        if pending:
+            yield pending.rstrip('\r')
+
+    def close(self):
+        """Discard the rest of the response; the connection is closed unless the response was read to the end."""
+        if self._connection is not None and not self._response.isclosed():
+            self._connection.close()
+            self._connection = None
+        self._response.close()
+        self._release()
+
+    def _release(self):
+        if self._connection is not None:
+            reusable = not self._response.will_close
+            self._pool.release(self._connection, reusable=reusable)
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of keep-alive connections to a single host."""
+
+    def __init__(self, scheme, host, port=None, max_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize ConnectionPool.
+
+        :param str scheme: "http" or "https"
+        :param str host: Host name
+        :param int|None port: Port, None for scheme default
+        :param int max_size: Maximum number of idle connections kept open
+        :param float timeout: Socket timeout, in seconds
+        """
+        if scheme not in ("http", "https"):
+            raise ValueError("Unsupported scheme: {}".format(scheme))
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self.connections_created = 0
+
+    def _new_connection(self):
+        connection_class = httplib.HTTPSConnection if self.scheme == "https" else httplib.HTTPConnection
+        with self._lock:
+            self.connections_created += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _get_connection(self):
+        """Return idle connection, or a new one if there are no idle connections."""
+        try:
+            return self._idle.get_nowait(), True
+        except Empty:
+            return self._new_connection(), False
+
+    def release(self, connection, reusable=True):
+        """
+        Return connection to the pool.
+
+        :param httplib.HTTPConnection connection: Connection whose response was read to the end
+        :param bool reusable: False if the server asked to close the connection
+        """
+        if not reusable:
+            connection.close()
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except Full:
+            connection.close()
+
+    def request(self, method, path, headers=None, body=None):
+        """
+        Send request over pooled connection.
+
+        Requests on idle connections that were closed by the server in the meantime are retried once on a new
+        connection.
+
+        :param str method: HTTP method
+        :param str path: Request path, including query string
+        :param dict headers: Request headers
+        :param str|None body: Request body
+        :rtype: PooledResponse
+        """
+        connection, reused = self._get_connection()
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            connection.close()
+            if not reused:
+                raise
+            logger.debug("Stale connection to %s, reconnecting", self.host)
+            connection = self._new_connection()
+            try:
+                connection.request(method, path, body, headers or {})
+                response = connection.getresponse()
+            except Exception:
+                connection.close()
+                raise
+        return PooledResponse(self, connection, response)
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class PoolManager(object):
+    """Connection pools keyed by scheme, host and port."""
+
+    def __init__(self, max_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize PoolManager.
+
+        :param int max_size: Maximum number of idle connections kept open per host
+        :param float timeout: Socket timeout, in seconds
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, url):
+        """
+        Return connection pool for host of the URL.
+
+        :param str url: Absolute URL
+        :rtype: ConnectionPool
+        """
+        parsed = urlparse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ConnectionPool(
+                    parsed.scheme, parsed.hostname, parsed.port, max_size=self.max_size, timeout=self.timeout
+                )
+        return pool
+
+    def request(self, method, url, headers=None, body=None):
+        """
+        Send request to absolute URL over pooled connection.
+
+        :param str method: HTTP method
+        :param str url: Absolute URL
+        :param dict headers: Request headers
+        :param str|None body: Request body
+        :rtype: PooledResponse
+        """
+        parsed = urlparse.urlsplit(url)
+        path = urlparse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+        return self.get_pool(url).request(method, path, headers=headers, body=body)
+
+    def close(self):
+        """Close idle connections of all pools."""
+        with self._lock:
+            pools, self._pools = self._pools.values(), {}
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,308 @@
+"""
+Timing instrumentation for Dalite XBlock hot paths.
+
+Instrumented code wraps each phase in ``timed(phase, tags)``; timings and counts are sent to a process-wide metrics
+sink. Instrumentation is disabled by default - ``timed`` then returns a shared no-op context manager, so the overhead
+is a single attribute check. Tags can be passed as a callable, so they are not even computed when disabled.
+
+Sink can be configured in code with ``configure(sink)``, or with ``DALITE_XBLOCK_METRICS`` environment variable,
+using one of the following values:
+
+* ``logging`` - log timings using ``dalite_xblock.metrics`` logger;
+* ``memory`` - keep counters and most recent timings in memory (see ``InMemorySink.snapshot``);
+* ``statsd://host:port/prefix`` - send timings as statsd packets (with dogstatsd-style tags) over UDP.
+"""
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import urlparse
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV_VARIABLE = "DALITE_XBLOCK_METRICS"
+DEFAULT_STATSD_PORT = 8125
+DEFAULT_STATSD_PREFIX = "dalite_xblock"
+DEFAULT_MAX_TIMINGS = 1000  # per phase
+
+_TAG_UNSAFE_CHARACTERS = re.compile(r"[:|,#@\s]")
+
+
+class MetricsSink(object):
+    """Base class for metrics sinks."""
+
+    enabled = True
+
+    def timing(self, name, duration_ms, tags):
+        """
+        Record duration of a phase.
+
+        :param str name: Phase name
+        :param float duration_ms: Duration in milliseconds
+        :param dict[str, str] tags: Tags, i.e. course and passport ids
+        """
+        raise NotImplementedError()
+
+    def increment(self, name, tags, value=1):
+        """
+        Increment a counter.
+
+        :param str name: Counter name
+        :param dict[str, str] tags: Tags, i.e. course and passport ids
+        :param int value: Increment
+        """
+        raise NotImplementedError()
+
+
+class NullSink(MetricsSink):
+    """Sink discarding all metrics - instrumentation is disabled when it is used."""
+
+    enabled = False
+
+    def timing(self, name, duration_ms, tags):
+        """Discard timing."""
+        pass
+
+    def increment(self, name, tags, value=1):
+        """Discard counter increment."""
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """Sink writing metrics to a logger."""
+
+    def __init__(self, metrics_logger=None, level=logging.INFO):
+        """
+        Initialize LoggingSink.
+
+        :param logging.Logger metrics_logger: Logger to use, defaults to `dalite_xblock.metrics`
+        :param int level: Log level
+        """
+        self.logger = metrics_logger or logging.getLogger("dalite_xblock.metrics")
+        self.level = level
+
+    def timing(self, name, duration_ms, tags):
+        """Log timing."""
+        self.logger.log(self.level, u"%s took %.3f ms %s", name, duration_ms, tags)
+
+    def increment(self, name, tags, value=1):
+        """Log counter increment."""
+        self.logger.log(self.level, u"%s incremented by %d %s", name, value, tags)
+
+
+class InMemorySink(MetricsSink):
+    """
+    Sink keeping counters and timings in memory - for tests, benchmarks and debugging.
+
+    Only the most recent `max_timings` timings of every phase are kept, so the sink can stay enabled in long-running
+    processes; counters keep counting all of them.
+    """
+
+    def __init__(self, max_timings=DEFAULT_MAX_TIMINGS):
+        """
+        Initialize InMemorySink.
+
+        :param int max_timings: Maximum number of timings kept per phase
+        """
+        self._lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(lambda: deque(maxlen=max_timings))
+
+    @staticmethod
+    def _key(name, tags):
+        return (name,) + tuple(sorted(tags.items()))
+
+    def timing(self, name, duration_ms, tags):
+        """Store timing."""
+        with self._lock:
+            self.timings[name].append(duration_ms)
+            self.counters[self._key(name, tags)] += 1
+
+    def increment(self, name, tags, value=1):
+        """Increment counter."""
+        with self._lock:
+            self.counters[self._key(name, tags)] += value
+
+    def count(self, name):
+        """
+        Return total count of a counter or timed phase, regardless of tags.
+
+        :param str name: Counter or phase name
+        :rtype: int
+        """
+        with self._lock:
+            return sum(value for key, value in self.counters.items() if key[0] == name)
+
+    def snapshot(self):
+        """
+        Return copy of recorded metrics.
+
+        :returns: counters keyed by (name, (tag, value)...) tuples and lists of most recent timings keyed by phase
+            name
+        :rtype: (dict, dict)
+        """
+        with self._lock:
+            return dict(self.counters), {name: list(values) for name, values in self.timings.items()}
+
+    def reset(self):
+        """Drop recorded metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+class StatsdSink(MetricsSink):
+    """Sink sending metrics as statsd packets over UDP, with tags in dogstatsd format."""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_STATSD_PORT, prefix=DEFAULT_STATSD_PREFIX):
+        """
+        Initialize StatsdSink.
+
+        :param str host: Collector host, should be local - packets are sent synchronously
+        :param int port: Collector port
+        :param str prefix: Prefix of metric names
+        """
+        self.address = (host, port)
+        self.prefix = prefix + "." if prefix else ""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def _format_tags(tags):
+        if not tags:
+            return ""
+        return "|#" + ",".join(
+            "{}:{}".format(name, _TAG_UNSAFE_CHARACTERS.sub("_", unicode(value)).encode("utf-8"))
+            for name, value in sorted(tags.items())
+        )
+
+    def _send(self, packet):
+        try:
+            self._socket.sendto(packet, self.address)
+        except (socket.error, socket.gaierror):
+            # Metrics must never break rendering
+            logger.debug("Failed to send metrics packet to %s:%s", *self.address)
+
+    def timing(self, name, duration_ms, tags):
+        """Send timing packet."""
+        self._send("{}{}:{:.3f}|ms{}".format(self.prefix, name, duration_ms, self._format_tags(tags)))
+
+    def increment(self, name, tags, value=1):
+        """Send counter packet."""
+        self._send("{}{}:{}|c{}".format(self.prefix, name, value, self._format_tags(tags)))
+
+
+def sink_from_url(url):
+    """
+    Create sink described by a URL-like string (see module docstring).
+
+    :param str|None url: Sink description, empty means disabled instrumentation
+    :rtype: MetricsSink
+    """
+    if not url:
+        return NullSink()
+    if url == "logging":
+        return LoggingSink()
+    if url == "memory":
+        return InMemorySink()
+    parsed = urlparse.urlparse(url)
+    if parsed.scheme == "statsd":
+        return StatsdSink(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or DEFAULT_STATSD_PORT,
+            prefix=parsed.path.strip("/") or DEFAULT_STATSD_PREFIX,
+        )
+    raise ValueError("Unknown metrics sink: {}".format(url))
+
+
+class _Timer(object):
+    """Context manager sending duration of the wrapped block to a sink."""
+
+    __slots__ = ("_sink", "_name", "_tags", "_started")
+
+    def __init__(self, sink, name, tags):
+        self._sink = sink
+        self._name = name
+        self._tags = tags
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration_ms = (time.time() - self._started) * 1000.0
+        self._sink.timing(self._name, duration_ms, _resolve_tags(self._tags))
+        return False
+
+
+class _NoopTimer(object):
+    """Context manager doing nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+_sink = sink_from_url(os.environ.get(METRICS_ENV_VARIABLE))
+
+
+def configure(sink):
+    """
+    Set process-wide metrics sink.
+
+    :param MetricsSink|None sink: Sink to use, None disables instrumentation
+    """
+    global _sink  # pylint: disable=global-statement
+    _sink = sink if sink is not None else NullSink()
+
+
+def get_sink():
+    """
+    Return process-wide metrics sink.
+
+    :rtype: MetricsSink
+    """
+    return _sink
+
+
+def _resolve_tags(tags):
+    """Return tags dictionary, calling tags factory if needed."""
+    if tags is None:
+        return {}
+    if callable(tags):
+        return tags()
+    return tags
+
+
+def timed(phase, tags=None):
+    """
+    Return context manager timing a phase.
+
+    :param str phase: Phase name, i.e. `lti.launch`
+    :param dict[str, str]|() -> dict[str, str]|None tags: Tags attached to the timing (i.e. `course_id`),
+        or a callable returning them
+    """
+    sink = _sink
+    if not sink.enabled:
+        return _NOOP_TIMER
+    return _Timer(sink, phase, tags)
+
+
+def increment(name, tags=None):
+    """
+    Increment a counter.
+
+    :param str name: Counter name
+    :param dict[str, str]|() -> dict[str, str]|None tags: Tags attached to the counter, or a callable returning them
+    """
+    sink = _sink
+    if sink.enabled:
+        sink.increment(name, _resolve_tags(tags))
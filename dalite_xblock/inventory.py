@@ -0,0 +1,279 @@
+"""
+Inventory of Dalite blocks of a course, and of their readiness.
+
+For every Dalite block `BlockInventory` works out what `DaliteXBlock.is_lti_ready` would: the passport resolved from
+block LTI ID, and whether both assignment and question are set. Passports are resolved through a single
+`DalitePassportIndex` of the course, so blocks are never loaded one by one. The inventory reports:
+
+* unready blocks - blocks students can't launch, and why;
+* dangling LTI IDs - LTI IDs selected in blocks that no course passport provides;
+* duplicate questions - (assignment_id, question_id) pairs used by more than one block.
+
+Blocks are read from the modulestore (see `inventory_course`), or from OLX course exports (see `inventory_export`).
+Exports are read in a single pass: OLX files are parsed incrementally and only `xblock-dalite` elements are kept, so
+courses with tens of thousands of blocks are scanned in bounded memory. Unpublished changes (``drafts/``) are ignored.
+
+Scanning exports needs no XBlock related imports, so `tools/dalite_block_inventory.py` runs on vanilla python;
+modulestore-only helpers are imported in `inventory_course`.
+"""
+import functools
+import logging
+import posixpath
+import xml.etree.cElementTree as ElementTree
+from collections import OrderedDict
+from contextlib import closing
+
+from .passport_audit import (
+    course_id_from_xml, is_course_xml, is_policy_file, iter_export_files, map_exports, read_policy_passports
+)
+from .passport_utils import DALITE_BLOCK_CATEGORY, DalitePassportIndex, normalize_lti_id
+
+logger = logging.getLogger(__name__)
+
+NO_PASSPORT_SELECTED = u"LTI passport is not selected"
+NO_MATCHING_PASSPORT = u"No LTI passport for LTI ID {}"
+NO_QUESTION = u"Assignment or question is not set"
+
+DRAFTS_DIRECTORY = "drafts"
+BLOCK_FIELDS = ("lti_id", "assignment_id", "question_id")
+
+
+def unready_reason(block, passport):
+    """
+    Return why a block is not ready to launch dalite-ng, or None if it is ready.
+
+    Mirrors `DaliteXBlock.is_lti_ready`: block needs a passport, an assignment and a question.
+
+    :param dict block: Block description, see `grade_sync.block_description`
+    :param DaliteLtiPassport|None passport: Passport resolved from block LTI ID
+    :rtype: unicode|None
+    """
+    if passport is None:
+        lti_id = normalize_lti_id(block.get("lti_id"))
+        return NO_MATCHING_PASSPORT.format(lti_id) if lti_id else NO_PASSPORT_SELECTED
+    if not block.get("assignment_id") or not block.get("question_id"):
+        return NO_QUESTION
+    return None
+
+
+class BlockInventory(object):
+    """Readiness report of Dalite blocks of a single course, built one block at a time."""
+
+    def __init__(self, passport_index, include_blocks=False):
+        """
+        Initialize BlockInventory.
+
+        :param DalitePassportIndex passport_index: Course passports
+        :param bool include_blocks: Whether the report lists every block, not only the problematic ones
+        """
+        self.passport_index = passport_index
+        self.include_blocks = include_blocks
+        self.blocks = 0
+        self.ready = 0
+        self.unready = []
+        self.block_statuses = []
+        self._dangling = OrderedDict()
+        self._questions = OrderedDict()
+
+    def add(self, block):
+        """
+        Add a block to the inventory.
+
+        :param dict block: Block description, see `grade_sync.block_description`
+        """
+        usage_id = block.get("usage_id")
+        lti_id = normalize_lti_id(block.get("lti_id"))
+        passport = self.passport_index.get(lti_id) if lti_id else None
+        reason = unready_reason(block, passport)
+
+        self.blocks += 1
+        if reason is None:
+            self.ready += 1
+        else:
+            self.unready.append({"usage_id": usage_id, "lti_id": lti_id, "reason": reason})
+        if lti_id and passport is None:
+            self._dangling.setdefault(lti_id, []).append(usage_id)
+        if block.get("assignment_id") and block.get("question_id"):
+            self._questions.setdefault((block["assignment_id"], block["question_id"]), []).append(usage_id)
+
+        if self.include_blocks:
+            self.block_statuses.append({
+                "usage_id": usage_id,
+                "lti_id": lti_id,
+                "dalite_urls": list(passport.dalite_root_urls) if passport else [],
+                "assignment_id": block.get("assignment_id"),
+                "question_id": block.get("question_id"),
+                "is_lti_ready": reason is None,
+            })
+
+    def extend(self, blocks):
+        """
+        Add blocks to the inventory.
+
+        :param Iterable[dict] blocks: Block descriptions
+        :rtype: BlockInventory
+        """
+        for block in blocks:
+            self.add(block)
+        return self
+
+    def as_dict(self):
+        """
+        Return inventory report as a JSON-serializable dictionary.
+
+        :rtype: dict
+        """
+        report = {
+            "blocks": self.blocks,
+            "ready": self.ready,
+            "unready": self.unready,
+            "dangling_lti_ids": [
+                {"lti_id": lti_id, "usage_ids": usage_ids} for lti_id, usage_ids in self._dangling.iteritems()
+            ],
+            "duplicate_questions": [
+                {"assignment_id": assignment_id, "question_id": question_id, "usage_ids": usage_ids}
+                for (assignment_id, question_id), usage_ids in self._questions.iteritems() if len(usage_ids) > 1
+            ],
+            "duplicate_passports": list(self.passport_index.duplicate_lti_ids),
+        }
+        if self.include_blocks:
+            report["block_statuses"] = self.block_statuses
+        return report
+
+
+def has_problems(report):
+    """
+    Check if inventory report of a course reports any problem.
+
+    :param dict report: Result of `BlockInventory.as_dict`, `inventory_course` or `inventory_export`
+    :rtype: bool
+    """
+    return bool(
+        report.get("error") or report.get("unready") or report.get("dangling_lti_ids") or
+        report.get("duplicate_questions") or report.get("duplicate_passports")
+    )
+
+
+def inventory_course(modulestore, course_key, include_blocks=False):
+    """
+    Build inventory of all Dalite blocks of a course in the modulestore.
+
+    :param modulestore: edx-platform modulestore
+    :param course_key: Course key
+    :param bool include_blocks: Whether the report lists every block
+    :rtype: dict
+    """
+    from .grade_sync import blocks_from_modulestore
+
+    course = modulestore.get_course(course_key)
+    passport_index = DalitePassportIndex.from_passport_strings(course.lti_passports)
+    inventory = BlockInventory(passport_index, include_blocks=include_blocks)
+    return inventory.extend(blocks_from_modulestore(modulestore, course_key)).as_dict()
+
+
+def iter_olx_blocks(stream, default_url_name=None):
+    """
+    Yield attributes of Dalite blocks in an OLX file, parsing the file incrementally.
+
+    :param file stream: OLX file
+    :param str|None default_url_name: url_name of blocks defined in their own file, that don't repeat it
+    :rtype: Iterable[dict]
+    """
+    for __, element in ElementTree.iterparse(stream, events=("end",)):
+        if element.tag == DALITE_BLOCK_CATEGORY:
+            attributes = dict(element.attrib)
+            url_name = attributes.get("url_name") or default_url_name
+            if url_name:
+                attributes["url_name"] = url_name
+                yield attributes
+        # Elements are not needed once their end is reached
+        element.clear()
+
+
+def olx_usage_id(course_id, url_name):
+    """
+    Return usage id of a Dalite block of a course exported to OLX.
+
+    :param unicode|None course_id: Course id, `course-v1:...`
+    :param str url_name: Block url_name
+    :returns: Usage id, or just url_name if course id is not known
+    :rtype: unicode
+    """
+    if not course_id or not course_id.startswith(u"course-v1:"):
+        return url_name
+    return u"block-v1:{}+type@{}+block@{}".format(course_id[len(u"course-v1:"):], DALITE_BLOCK_CATEGORY, url_name)
+
+
+def read_export_blocks(path):
+    """
+    Read course id, LTI passports and Dalite blocks of a course export.
+
+    Blocks are often split between a pointer in their parent (``<xblock-dalite url_name="..."/>``) and a definition
+    in ``xblock-dalite/<url_name>.xml``, so attributes of elements with the same url_name are merged.
+
+    :param str path: Export directory or archive
+    :returns: Course id (or None if it can't be found), LTI passports and block descriptions
+    :rtype: (unicode|None, list[str], list[dict])
+    """
+    course_id, passports = None, []
+    blocks = OrderedDict()
+    for name, open_file in iter_export_files(path):
+        parts = name.strip("/").split("/")
+        if is_course_xml(name):
+            with closing(open_file()) as stream:
+                course_id = course_id_from_xml(stream)
+        elif is_policy_file(name):
+            passports.extend(read_policy_passports(open_file))
+        elif name.endswith(".xml") and DRAFTS_DIRECTORY not in parts[:-1]:
+            default_url_name = None
+            if len(parts) > 1 and parts[-2] == DALITE_BLOCK_CATEGORY:
+                default_url_name = posixpath.splitext(parts[-1])[0]
+            with closing(open_file()) as stream:
+                for attributes in iter_olx_blocks(stream, default_url_name):
+                    blocks.setdefault(attributes["url_name"], {}).update(attributes)
+
+    descriptions = [
+        dict(
+            {field: attributes.get(field) for field in BLOCK_FIELDS},
+            usage_id=olx_usage_id(course_id, url_name)
+        )
+        for url_name, attributes in blocks.iteritems()
+    ]
+    return course_id, passports, descriptions
+
+
+def inventory_export(path, include_blocks=False):
+    """
+    Build inventory of all Dalite blocks of a course export.
+
+    :param str path: Export directory or archive
+    :param bool include_blocks: Whether the report lists every block
+    :returns: Inventory report, with `error` if export could not be read
+    :rtype: dict
+    """
+    result = {"export": path}
+    try:
+        course_id, passports, blocks = read_export_blocks(path)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Broken export must not stop the inventory of the others
+        result["error"] = "{}: {}".format(exc.__class__.__name__, exc)
+        return result
+    result["course_id"] = course_id
+    inventory = BlockInventory(DalitePassportIndex.from_passport_strings(passports), include_blocks=include_blocks)
+    result.update(inventory.extend(blocks).as_dict())
+    return result
+
+
+def inventory_exports(root, processes=None, include_blocks=False, chunk_size=4):
+    """
+    Build inventories of all course exports under a directory, in parallel.
+
+    :param str root: Directory to search
+    :param int|None processes: Number of worker processes, defaults to number of CPUs; 1 scans in this process
+    :param bool include_blocks: Whether reports list every block
+    :param int chunk_size: Number of exports sent to a worker process at once
+    :returns: Inventory reports, in order of completion
+    :rtype: Iterable[dict]
+    """
+    function = functools.partial(inventory_export, include_blocks=include_blocks)
+    return map_exports(function, root, processes=processes, chunk_size=chunk_size)
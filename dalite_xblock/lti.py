@@ -0,0 +1,178 @@
+"""
+LTI launch parameters of Dalite XBlock.
+
+Most of LTI launch parameters (context id, course title, custom parameters derived from assignment and question ids)
+depend only on the block and its passport, yet building them takes loading the course. `DaliteLtiConsumer` caches these
+static parameters per block in a process-wide cache, keyed by a fingerprint of block fields and passport, so each
+launch only adds user-specific and request-specific parameters and signs the request with the passport signer (see
+`dalite_xblock.oauth`). Resource link id and outcome service URL are built on every launch: they include the LMS host
+name, and a process may serve several sites.
+
+`LtiConsumer.get_signed_lti_parameters` builds all parameters in one method, so user-specific parameters and parameter
+processors are added here the way lti_consumer 1.4.0 adds them - setup.py pins that version, and tests check that
+launches send the same parameters as `LtiConsumer`. Compare these methods with upstream when upgrading it.
+"""
+import hashlib
+import logging
+
+import six
+from lti_consumer.lti import LtiConsumer
+from xblock.fields import Scope
+
+from .instrumentation import timed
+from .passport_cache import LruTtlCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAYLOAD_CACHE_SIZE = 1024
+# Course title and organization are sent in launches, but course changes do not change the fingerprint - keep
+# entries short-lived, so renamed courses are picked up soon.
+DEFAULT_PAYLOAD_CACHE_TTL = 300  # seconds
+
+# Static launch parameters are built from values of fields in these scopes
+STATIC_PARAMETERS_FIELD_SCOPES = (Scope.content, Scope.settings)
+
+LAUNCH_PAYLOAD_CACHE = LruTtlCache(max_size=DEFAULT_PAYLOAD_CACHE_SIZE, ttl=DEFAULT_PAYLOAD_CACHE_TTL)
+
+
+class DaliteLtiConsumer(LtiConsumer):
+    """LtiConsumer building static part of LTI launch parameters once per block and passport."""
+
+    def __init__(self, xblock, payload_cache=LAUNCH_PAYLOAD_CACHE):
+        """
+        Initialize DaliteLtiConsumer.
+
+        :param DaliteXBlock xblock: Launched block
+        :param LruTtlCache payload_cache: Cache of static launch parameters
+        """
+        super(DaliteLtiConsumer, self).__init__(xblock)
+        self.payload_cache = payload_cache
+
+    def get_payload_key(self):
+        """
+        Return cache key of static launch parameters of the block.
+
+        :rtype: (unicode, str)
+        """
+        xblock = self.xblock
+        fingerprint = hashlib.sha1(repr((
+            xblock.get_field_values(STATIC_PARAMETERS_FIELD_SCOPES), xblock.lti_passport, xblock.course_id
+        ))).hexdigest()
+        return six.text_type(xblock.scope_ids.usage_id), fingerprint
+
+    def build_static_lti_parameters(self):
+        """
+        Build launch parameters not depending on the user or on the request.
+
+        :returns: Static parameters and custom parameters, as tuples of items
+        :rtype: (tuple, tuple)
+        """
+        xblock = self.xblock
+        lti_parameters = {
+            u'oauth_callback': u'about:blank',
+            u'launch_presentation_return_url': '',
+            u'lti_message_type': u'basic-lti-launch-request',
+            u'lti_version': u'LTI-1p0',
+            u'context_id': xblock.context_id,
+            u'custom_component_display_name': xblock.display_name,
+            u'context_title': xblock.course.display_name_with_default,
+            u'context_label': xblock.course.display_org_with_default,
+        }
+
+        if xblock.due:
+            lti_parameters[u'custom_component_due_date'] = xblock.due.strftime('%Y-%m-%d %H:%M:%S')
+            if xblock.graceperiod:
+                lti_parameters[u'custom_component_graceperiod'] = str(xblock.graceperiod.total_seconds())
+
+        return tuple(lti_parameters.items()), tuple(xblock.static_custom_parameters.items())
+
+    def get_static_lti_parameters(self):
+        """
+        Return (cached) launch parameters not depending on the user or on the request.
+
+        :rtype: (tuple, tuple)
+        """
+        return self.payload_cache.get_or_create(self.get_payload_key(), self.build_static_lti_parameters)
+
+    def _add_site_parameters(self, lti_parameters):
+        """Add parameters depending on the site (LMS host name) the launch is served for."""
+        xblock = self.xblock
+        lti_parameters[u'resource_link_id'] = xblock.resource_link_id
+        if xblock.has_score:
+            lti_parameters[u'lis_outcome_service_url'] = xblock.outcome_service_url
+
+    def _add_user_parameters(self, lti_parameters):
+        """Add parameters describing current user, as LtiConsumer 1.4.0 does."""
+        xblock = self.xblock
+        lti_parameters.update({
+            u'user_id': xblock.user_id,
+            u'roles': xblock.role,
+            u'lis_result_sourcedid': xblock.lis_result_sourcedid,
+        })
+
+        xblock.user_email = ""
+        xblock.user_username = ""
+        xblock.user_language = ""
+
+        # Username, email, and language can't be sent in studio mode, because the user object is not defined.
+        if callable(xblock.runtime.get_real_user):
+            real_user_object = xblock.runtime.get_real_user(xblock.runtime.anonymous_student_id)
+            xblock.user_email = getattr(real_user_object, "email", "")
+            xblock.user_username = getattr(real_user_object, "username", "")
+            user_preferences = getattr(real_user_object, "preferences", None)
+
+            if user_preferences is not None:
+                language_preference = user_preferences.filter(key='pref-lang')
+                if len(language_preference) == 1:
+                    xblock.user_language = language_preference[0].value
+
+        if xblock.ask_to_send_username and xblock.user_username:
+            lti_parameters[u"lis_person_sourcedid"] = xblock.user_username
+        if xblock.ask_to_send_email and xblock.user_email:
+            lti_parameters[u"lis_person_contact_email_primary"] = xblock.user_email
+        if xblock.user_language:
+            lti_parameters[u"launch_presentation_locale"] = xblock.user_language
+
+    def _add_processor_parameters(self, lti_parameters):
+        """Add parameters returned by LTI parameter processors configured in settings."""
+        for processor in self.xblock.get_parameter_processors():
+            try:
+                default_params = getattr(processor, 'lti_xblock_default_params', {})
+                lti_parameters.update(default_params)
+                lti_parameters.update(processor(self.xblock) or {})
+            except Exception:  # pylint: disable=broad-except
+                # Broken processor must not break launches, as in LtiConsumer
+                logger.exception('Error in XBlock LTI parameter processor "%s"', processor)
+
+    def sign_lti_parameters(self, lti_parameters, launch_url):
+        """
+        Sign launch parameters with the passport signer, adding OAuth parameters to them.
+
+        :param dict lti_parameters: Launch parameters, updated in place
+        :param unicode launch_url: LTI launch URL the parameters are posted to
+        """
+        xblock = self.xblock
+        with timed("lti.sign", xblock.metric_tags):
+            lti_parameters.update(xblock.lti_signer.sign_launch(launch_url, lti_parameters))
+
+    def get_signed_lti_parameters(self, launch_url=None):
+        """
+        Return signed LTI launch parameters, built from cached static parameters.
+
+        Parameters are combined in the same order LtiConsumer uses, so custom parameters and parameter processors
+        can override the standard ones.
+
+        :param unicode|None launch_url: LTI launch URL the parameters are posted to, launch URL of the block by
+            default. It depends on health of dalite-ng nodes, so launches pass the URL they post the form to.
+        :rtype: dict
+        """
+        with timed("lti.launch.parameters", self.xblock.metric_tags):
+            static_parameters, static_custom_parameters = self.get_static_lti_parameters()
+            lti_parameters = dict(static_parameters)
+            self._add_site_parameters(lti_parameters)
+            self._add_user_parameters(lti_parameters)
+            lti_parameters.update(static_custom_parameters)
+            lti_parameters.update(self.xblock.extra_prefixed_custom_parameters)
+            self._add_processor_parameters(lti_parameters)
+        self.sign_lti_parameters(lti_parameters, self.xblock.launch_url if launch_url is None else launch_url)
+        return lti_parameters
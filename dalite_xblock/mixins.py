@@ -14,3 +14,39 @@ class CourseAwareXBlockMixin(object):
         """
         raw_course_id = getattr(self.runtime, 'course_id', 'all')
         return unicode(raw_course_id)
+
+
+class StudioFieldValuesProviderMixin(object):
+    """
+    Allow using bound methods as values providers for fields edited in Studio.
+
+    Field `values` can be callable, but that callable is parameterless and is stored on the field descriptor, which
+    is shared by all block instances (and all threads). This mixin asks current block instance for the values
+    while building Studio editor field info instead, so no shared state is touched.
+
+    Must precede StudioEditableXBlockMixin (or a block class using it) in the list of base classes.
+    """
+
+    # Maps field name to a name of block method returning available values for that field
+    field_values_providers = {}
+
+    def _make_field_info(self, field_name, field):
+        """
+        Create the information that the template needs to render a form field for this field.
+
+        :param str field_name: Field name
+        :param xblock.fields.Field field: Field descriptor
+        :rtype: dict
+        """
+        info = super(StudioFieldValuesProviderMixin, self)._make_field_info(field_name, field)
+        provider_name = self.field_values_providers.get(field_name)
+        if provider_name is None:
+            return info
+
+        values = getattr(self, provider_name)()
+        info['values'] = [
+            value if isinstance(value, dict) else {"display_name": unicode(value), "value": value}
+            for value in values
+        ]
+        info['has_values'] = True
+        return info
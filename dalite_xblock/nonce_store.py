@@ -0,0 +1,222 @@
+"""
+Replay protection of OAuth signed requests.
+
+Grade callbacks from dalite-ng are signed with the passport secret, but a correctly signed request can be captured and
+sent again. OAuth 1 prevents that with nonces: a request is accepted only if its `oauth_timestamp` is recent and its
+`oauth_nonce` was not used with the same timestamp and key before. Nonce stores remember used nonces for `window`
+seconds - older requests are rejected by their timestamp alone.
+
+`LocalNonceStore` keeps nonces in a ring of timestamp buckets, each `bucket_seconds` wide, covering timestamps up to
+`window` seconds in the past or future. A bucket is reused once its timestamps fall out of the window, so expiring
+nonces costs O(1) per bucket and nothing is ever scanned. The number of remembered nonces is capped: when the store is
+full, the oldest bucket older than the one of the request is dropped, and requests with timestamps in or before it are
+rejected from then on, so the window shrinks rather than letting evicted nonces be replayed. The bucket of the request
+is never dropped - if there is no older bucket, only the request is rejected.
+
+Replay protection is disabled by default: `lti_consumer` checks neither nonces nor timestamps, and enabling it rejects
+callbacks whose timestamp is more than `window` seconds off the LMS clock. Enable it by calling ``configure(store)``,
+or with ``DALITE_XBLOCK_NONCE_STORE`` environment variable, using one of the following values:
+
+* ``memory`` - keep nonces in memory of each process;
+* ``django`` or ``django://<alias>`` - keep nonces in a Django cache (``default`` alias if not specified), shared
+  between processes, so a request can't be replayed against another LMS worker;
+* ``none`` - disable replay protection (default).
+"""
+import hashlib
+import os
+import threading
+import time
+import urlparse
+
+NONCE_STORE_ENV_VARIABLE = "DALITE_XBLOCK_NONCE_STORE"
+DEFAULT_WINDOW = 300  # seconds
+DEFAULT_BUCKET_SECONDS = 10
+DEFAULT_MAX_ENTRIES = 100000
+
+_KEY_PREFIX = "dalite_xblock.nonce"
+
+
+class NonceStore(object):
+    """Base class for stores of used OAuth nonces."""
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.time):
+        """
+        Initialize NonceStore.
+
+        :param int window: Number of seconds request timestamps may differ from current time
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.window = window
+        self.clock = clock
+
+    def is_timestamp_valid(self, timestamp):
+        """
+        Check if request timestamp is within the window.
+
+        :param int timestamp: Request timestamp, seconds since epoch
+        :rtype: bool
+        """
+        return abs(self.clock() - timestamp) <= self.window
+
+    def check_and_add(self, client_key, timestamp, nonce):
+        """
+        Check that request is not a replay, and remember its nonce.
+
+        :param unicode client_key: OAuth client key
+        :param int timestamp: Request timestamp, seconds since epoch
+        :param unicode nonce: Request nonce
+        :returns: False if request timestamp is not recent or nonce was already used
+        :rtype: bool
+        """
+        raise NotImplementedError()
+
+
+class _Bucket(object):
+    """Nonces of requests with timestamps in a single bucket."""
+
+    __slots__ = ("index", "nonces")
+
+    def __init__(self):
+        self.index = None
+        self.nonces = set()
+
+
+class LocalNonceStore(NonceStore):
+    """Thread-safe in-process nonce store, keeping nonces in a ring of timestamp buckets."""
+
+    def __init__(
+            self, window=DEFAULT_WINDOW, bucket_seconds=DEFAULT_BUCKET_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+            clock=time.time
+    ):
+        """
+        Initialize LocalNonceStore.
+
+        :param int window: Number of seconds request timestamps may differ from current time
+        :param int bucket_seconds: Width of timestamp buckets, expired nonces are dropped a bucket at a time
+        :param int max_entries: Maximum number of remembered nonces
+        :param () -> float clock: Time source, useful in tests
+        """
+        super(LocalNonceStore, self).__init__(window=window, clock=clock)
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        # Enough buckets for timestamps `window` seconds in the past and in the future
+        self._buckets = [_Bucket() for __ in xrange(2 * (window // bucket_seconds + 1) + 1)]
+        self._size = 0
+        # Requests in buckets before this one are rejected, as their nonces might have been evicted
+        self._first_valid_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return number of remembered nonces."""
+        return self._size
+
+    def _evict_bucket_before(self, index):
+        """
+        Drop nonces of the oldest bucket before given one, and reject requests with timestamps up to its end.
+
+        :param int index: Index of the bucket being written, which is never dropped
+        :returns: False if there is no older bucket to drop
+        :rtype: bool
+        """
+        older = [bucket for bucket in self._buckets if bucket.nonces and bucket.index < index]
+        if not older:
+            return False
+        oldest = min(older, key=lambda bucket: bucket.index)
+        self._size -= len(oldest.nonces)
+        self._first_valid_index = max(self._first_valid_index, oldest.index + 1)
+        oldest.nonces = set()
+        oldest.index = None
+        return True
+
+    def check_and_add(self, client_key, timestamp, nonce):
+        """Check that request is not a replay, and remember its nonce."""
+        if not self.is_timestamp_valid(timestamp):
+            return False
+        index = int(timestamp) // self.bucket_seconds
+        entry = (client_key, int(timestamp), nonce)
+        with self._lock:
+            if index < self._first_valid_index:
+                return False
+            bucket = self._buckets[index % len(self._buckets)]
+            if bucket.index != index:
+                if bucket.index > index:
+                    # Bucket is taken by newer timestamps, so this one is out of the window
+                    return False
+                # Bucket holds nonces of timestamps that fell out of the window - reuse it
+                self._size -= len(bucket.nonces)
+                bucket.index, bucket.nonces = index, set()
+            if entry in bucket.nonces:
+                return False
+            if self._size >= self.max_entries and not self._evict_bucket_before(index):
+                # Store is full of nonces of this or newer buckets - reject this request only
+                return False
+            bucket.nonces.add(entry)
+            self._size += 1
+            return True
+
+
+class DjangoNonceStore(NonceStore):
+    """Nonce store keeping nonces in a Django cache, i.e. memcached shared by all LMS processes."""
+
+    def __init__(self, alias="default", window=DEFAULT_WINDOW, clock=time.time):
+        """
+        Initialize DjangoNonceStore.
+
+        :param str alias: Django cache alias, as configured in `CACHES` setting
+        :param int window: Number of seconds request timestamps may differ from current time
+        :param () -> float clock: Time source, useful in tests
+        """
+        super(DjangoNonceStore, self).__init__(window=window, clock=clock)
+        self.alias = alias
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def check_and_add(self, client_key, timestamp, nonce):
+        """Check that request is not a replay, and remember its nonce."""
+        if not self.is_timestamp_valid(timestamp):
+            return False
+        digest = hashlib.sha1(repr((client_key, int(timestamp), nonce))).hexdigest()
+        # `add` is atomic in memcached - only one of concurrent replays succeeds
+        return self._cache.add("{}.{}".format(_KEY_PREFIX, digest), 1, 2 * self.window)
+
+
+def nonce_store_from_url(url):
+    """
+    Create nonce store described by a URL-like string (see module docstring).
+
+    :param str|None url: Store description, empty means disabled replay protection
+    :rtype: NonceStore|None
+    """
+    if not url or url == "none":
+        return None
+    if url == "memory":
+        return LocalNonceStore()
+    parsed = urlparse.urlparse(url)
+    if parsed.scheme == "django" or url == "django":
+        return DjangoNonceStore(alias=parsed.netloc or "default")
+    raise ValueError("Unknown nonce store: {}".format(url))
+
+
+_nonce_store = nonce_store_from_url(os.environ.get(NONCE_STORE_ENV_VARIABLE))
+
+
+def configure(store):
+    """
+    Set process-wide nonce store.
+
+    :param NonceStore|None store: Store to use, None disables replay protection
+    """
+    global _nonce_store  # pylint: disable=global-statement
+    _nonce_store = store
+
+
+def get_nonce_store():
+    """
+    Return process-wide nonce store.
+
+    :rtype: NonceStore|None
+    """
+    return _nonce_store
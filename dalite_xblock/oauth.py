@@ -0,0 +1,120 @@
+"""
+Reusable OAuth signers of Dalite LTI passports.
+
+LtiConsumerXBlock creates an OAuth client for every launch. `PassportSigner` creates it once per passport and reuses it
+for every launch and dalite-ng API request; the client holds no mutable state, so a single signer is shared by all
+threads. `SIGNER_REGISTRY` keeps one signer per passport for the whole process. Signatures are computed by `oauthlib` -
+signers only save rebuilding clients. Grade callbacks are verified by `lti_consumer`, which builds no client to do so.
+"""
+import logging
+
+import six
+from lti_consumer.exceptions import LtiError
+from oauthlib import oauth1
+from oauthlib.oauth1.rfc5849 import signature
+
+from .passport_cache import LruTtlCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_SIZE = 256
+
+FORM_URLENCODED_HEADERS = {
+    # This is needed for body encoding:
+    'Content-Type': 'application/x-www-form-urlencoded',
+}
+
+
+class PassportSigner(object):
+    """Signs LTI launches and dalite-ng API requests for a single LTI key and secret."""
+
+    def __init__(self, key, secret):
+        """
+        Initialize PassportSigner.
+
+        :param unicode key: LTI key
+        :param unicode secret: LTI secret
+        """
+        self.key = six.text_type(key)
+        self._client = oauth1.Client(client_key=self.key, client_secret=six.text_type(secret or u''))
+
+    def sign_launch(self, launch_url, lti_parameters):
+        """
+        Return OAuth parameters signing LTI launch form.
+
+        :param unicode launch_url: LTI launch URL
+        :param dict lti_parameters: Launch parameters
+        :rtype: dict[unicode, unicode]
+        :raises LtiError: if launch URL has no scheme
+        """
+        try:
+            __, headers, __ = self._client.sign(
+                six.text_type(launch_url.strip()), http_method=u'POST', body=lti_parameters,
+                headers=FORM_URLENCODED_HEADERS
+            )
+        except ValueError:  # Scheme not in url.
+            raise LtiError("Failed to sign oauth request")
+
+        oauth_parameters = dict(
+            [param.strip().replace('"', '').split('=') for param in headers['Authorization'].split(',')]
+        )
+        oauth_parameters[u'oauth_nonce'] = oauth_parameters.pop(u'OAuth oauth_nonce')
+        # Signature is urlencoded in the header, but launch form is urlencoded by the browser again
+        oauth_parameters[u'oauth_signature'] = six.moves.urllib.parse.unquote(oauth_parameters[u'oauth_signature'])
+        return oauth_parameters
+
+    def sign_request(self, url, http_method=u'GET'):
+        """
+        Return Authorization header signing a request without body, i.e. a call to dalite-ng API.
+
+        :param unicode url: Request URL, query string parameters are signed too
+        :param unicode http_method: HTTP method
+        :rtype: unicode
+        :raises LtiError: if URL has no scheme
+        """
+        try:
+            __, headers, __ = self._client.sign(six.text_type(url.strip()), http_method=six.text_type(http_method))
+        except ValueError:  # Scheme not in url.
+            raise LtiError("Failed to sign oauth request")
+        return headers['Authorization']
+
+
+def get_oauth_parameters(request):
+    """
+    Return OAuth parameters of a request, without signature, i.e. to check nonce and timestamp of a verified request.
+
+    :param webob.Request request: Request signed with OAuth parameters in Authorization header
+    :rtype: dict[unicode, unicode]
+    """
+    headers = {'Authorization': six.text_type(request.headers.get('Authorization'))}
+    return dict(signature.collect_parameters(headers=headers))
+
+
+class SignerRegistry(object):
+    """Process-wide registry of passport signers keyed by LTI key and secret."""
+
+    def __init__(self, max_size=DEFAULT_REGISTRY_SIZE):
+        """
+        Initialize SignerRegistry.
+
+        :param int max_size: Maximum number of signers kept in the registry
+        """
+        # Signers never become stale - changed passports have different key or secret
+        self._signers = LruTtlCache(max_size=max_size, ttl=None)
+
+    def get_signer(self, key, secret):
+        """
+        Return signer for LTI key and secret, creating it on first use.
+
+        :param unicode key: LTI key
+        :param unicode secret: LTI secret
+        :rtype: PassportSigner
+        """
+        return self._signers.get_or_create((key, secret), lambda: PassportSigner(key, secret))
+
+    def clear(self):
+        """Drop all signers."""
+        self._signers.clear()
+
+
+SIGNER_REGISTRY = SignerRegistry()
@@ -0,0 +1,151 @@
+"""
+LTI Outcome Service of Dalite XBlock.
+
+Grade callbacks (``replaceResultRequest``) sent by dalite-ng are handled by `lti_consumer.outcomes.OutcomeService`.
+`DaliteOutcomeService` only adds to it:
+
+* replay protection - when a nonce store is configured (see `dalite_xblock.nonce_store`), requests are verified and
+  their nonces checked before they are handed to `OutcomeService`, and replayed requests are rejected;
+* grade buffering - `OutcomeService` stores scores with ``set_user_module_score`` of the block it handles, which is
+  passed to it wrapped, so that scores go through `DaliteOutcomeService.store_score`. When grade buffering is enabled
+  (see `dalite_xblock.grade_buffer`), scores are acknowledged right away and published later, coalesced per user and
+  block, to freshly loaded blocks.
+"""
+import logging
+from xml.sax.saxutils import escape
+
+import six
+from lti_consumer.exceptions import LtiError
+from lti_consumer.oauth import verify_oauth_body_signature
+from lti_consumer.outcomes import OutcomeService
+
+from .grade_buffer import get_grade_buffer
+from .instrumentation import increment, timed
+from .nonce_store import get_nonce_store
+from .oauth import get_oauth_parameters
+from .resources import CachedResourceLoader
+
+logger = logging.getLogger(__name__)
+loader = CachedResourceLoader(OutcomeService.__module__)
+
+RESPONSE_TEMPLATE = '/templates/xml/outcome_service_response.xml'
+
+
+class _ScoreStoringRuntime(object):
+    """Runtime of the block handling a grade callback, remembering anonymous id of the user the score is for."""
+
+    def __init__(self, runtime):
+        """
+        Initialize _ScoreStoringRuntime.
+
+        :param runtime: Runtime of the block
+        """
+        self._runtime = runtime
+        self.anonymous_user_id = None
+
+    def __getattr__(self, name):
+        """Delegate everything else to the runtime."""
+        return getattr(self._runtime, name)
+
+    def get_real_user(self, anonymous_user_id):
+        """Return user with given anonymous id, as the runtime does, and remember the anonymous id."""
+        self.anonymous_user_id = anonymous_user_id
+        return self._runtime.get_real_user(anonymous_user_id)
+
+
+class _ScoreStoringBlock(object):
+    """Block handling a grade callback, as seen by `OutcomeService`: scores are stored with `store_score`."""
+
+    def __init__(self, block, store_score):
+        """
+        Initialize _ScoreStoringBlock.
+
+        :param DaliteXBlock block: Block handling the grade callback
+        :param store_score: Called with the user, their anonymous id, score and maximum score instead of
+            ``set_user_module_score`` of the block
+        """
+        self.block = block
+        self.runtime = _ScoreStoringRuntime(block.runtime)
+        self._store_score = store_score
+
+    def __getattr__(self, name):
+        """Delegate everything else to the block."""
+        return getattr(self.block, name)
+
+    def set_user_module_score(self, user, score, max_score, comment=u''):  # pylint: disable=unused-argument
+        """Store score of the user, looked up by `OutcomeService` right before."""
+        self._store_score(user, self.runtime.anonymous_user_id, score, max_score)
+
+
+class DaliteOutcomeService(OutcomeService):
+    """Service handling LTI Outcome Management Service requests for Dalite XBlock."""
+
+    def __init__(self, xblock):
+        """
+        Initialize DaliteOutcomeService.
+
+        :param DaliteXBlock xblock: Block handling the grade callback
+        """
+        super(DaliteOutcomeService, self).__init__(_ScoreStoringBlock(xblock, self.store_score))
+
+    def verify_signature(self, request, nonce_store):
+        """
+        Verify OAuth body signature of the request, and check that the request is not a replay.
+
+        :param webob.Request request: Outcome Service request
+        :param NonceStore nonce_store: Store of nonces of handled requests
+        :raises LtiError: if signature is incorrect or request was already handled
+        """
+        __, secret = self.xblock.lti_provider_key_secret
+        verify_oauth_body_signature(request, secret, self.xblock.outcome_service_url)
+        # Nonce is checked after the signature, so forged requests can't fill the store
+        oauth_params = get_oauth_parameters(request)
+        try:
+            timestamp = int(oauth_params.get('oauth_timestamp'))
+        except (TypeError, ValueError):
+            raise LtiError("OAuth timestamp is missing or malformed.")
+        consumer_key, nonce = oauth_params.get('oauth_consumer_key'), oauth_params.get('oauth_nonce')
+        if not nonce_store.check_and_add(consumer_key, timestamp, nonce):
+            increment("lti.outcome.replay_rejected", self.xblock.metric_tags)
+            logger.warning("Rejected replayed or expired outcome request for %s", self.xblock.scope_ids.usage_id)
+            raise LtiError("OAuth nonce was already used or timestamp is expired.")
+
+    def store_score(self, real_user, anonymous_user_id, score, max_score):
+        """
+        Store score reported by the LTI provider, or add it to the grade buffer if grade buffering is enabled.
+
+        Buffered scores keep no reference to the block or its runtime: the runtime saves the block when the handler
+        returns, so scores are later published to a freshly loaded block (see `dalite_xblock.grade_buffer`).
+
+        :param real_user: User the score is reported for
+        :param unicode anonymous_user_id: Anonymous id of the user, as sent in LTI launches
+        :param float score: Score, between 0 and 1
+        :param float max_score: Maximum score of the block
+        """
+        grade_buffer = get_grade_buffer()
+        if grade_buffer is None:
+            self.xblock.block.set_user_module_score(real_user, score, max_score)
+            return
+        key = (six.text_type(self.xblock.scope_ids.usage_id), anonymous_user_id)
+        grade_buffer.add(key, score, max_score)
+
+    def handle_request(self, request):
+        """
+        Handle Outcome Service request, rejecting replayed requests if replay protection is enabled.
+
+        :param webob.Request request: Outcome Service request
+        :returns: Outcome Service XML response
+        :rtype: unicode
+        """
+        nonce_store = get_nonce_store()
+        if nonce_store is not None:
+            try:
+                with timed("lti.outcome.verify", self.xblock.metric_tags):
+                    self.verify_signature(request, nonce_store)
+            except (ValueError, LtiError) as ex:
+                logger.debug("[LTI]: OAuth verification error: %s", ex)
+                return loader.load_unicode(RESPONSE_TEMPLATE).format(
+                    imsx_codeMajor='failure', imsx_description="OAuth verification error: " + escape(str(ex)),
+                    imsx_messageIdentifier='unknown', response=''
+                )
+        return super(DaliteOutcomeService, self).handle_request(request)
@@ -0,0 +1,365 @@
+"""
+Offline audit of Dalite passports in OLX course exports.
+
+Walks a directory tree looking for course exports - directories with ``course.xml`` and ``.tar.gz`` export archives -
+and checks `lti_passports` advanced setting of every course:
+
+* malformed - passports marked as Dalite passports that `parse_passport` rejects, or with empty key or secret;
+* duplicate - LTI IDs used by more than one Dalite passport (only the first one is used);
+* unreachable-looking - dalite-ng URLs (any of them, if a passport lists several dalite-ng nodes) without http(s)
+  scheme or host, or pointing at local, private or unqualified host names, which students' browsers can't reach.
+
+Advanced settings are read from ``policies/<run>/policy.json``. Policy files hold settings of all course blocks and can
+be large, so only `lti_passports` values are decoded - the rest of the file is scanned, not parsed. Courses are
+audited in parallel by a pool of processes. Passport secrets never appear in the report.
+
+As with `passport_utils` no XBlock related imports are used in this module, so it can be run on vanilla python.
+"""
+import codecs
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tarfile
+import urlparse
+import xml.etree.cElementTree as ElementTree
+from contextlib import closing
+
+from .passport_utils import DALITE_PASSPORT_MARKER, DalitePassportIndex, parse_passport
+
+logger = logging.getLogger(__name__)
+
+COURSE_XML = "course.xml"
+POLICY_JSON = "policy.json"
+EXPORT_ARCHIVE_SUFFIXES = (".tar.gz", ".tgz")
+LTI_PASSPORTS_KEY = "lti_passports"
+READ_CHUNK_SIZE = 64 * 1024
+MAX_VALUE_CHUNKS = 64
+
+_KEY_SEPARATOR = re.compile(r'\s*:\s*')
+LOCAL_HOST_NAMES = ("localhost", "localhost.localdomain")
+LOCAL_HOST_SUFFIXES = (".local", ".localhost", ".internal", ".test", ".example", ".invalid")
+
+
+def iter_json_values(stream, key, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield values of all object members named `key` in a JSON document, without parsing the rest of the document.
+
+    :param file stream: JSON document, UTF-8 encoded
+    :param str key: Member name
+    :param int chunk_size: Number of characters read at once
+    :rtype: Iterable
+    """
+    reader = codecs.getreader('utf-8')(stream)
+    decoder = json.JSONDecoder()
+    needle = u'"{}"'.format(key)
+    # Values longer than that are considered malformed, rather than read to the end of the document
+    max_value_length = MAX_VALUE_CHUNKS * chunk_size
+    buffer_, eof = u'', False
+
+    while True:
+        position = buffer_.find(needle)
+        if position == -1:
+            if eof:
+                return
+            # Keep the tail, it might hold beginning of the member name
+            chunk = reader.read(chunk_size)
+            buffer_, eof = buffer_[-len(needle):] + chunk, not chunk
+            continue
+
+        value_start = position + len(needle)
+        separator = _KEY_SEPARATOR.match(buffer_, value_start)
+        try:
+            if separator is None:
+                if buffer_[value_start:].strip():
+                    # Name appears in a string value rather than as a member name
+                    buffer_ = buffer_[value_start:]
+                    continue
+                raise ValueError("Separator is not in the buffer yet")
+            if separator.end() == len(buffer_):
+                raise ValueError("Member value is not in the buffer yet")
+            value, end = decoder.raw_decode(buffer_, separator.end())
+        except ValueError:
+            if not eof and len(buffer_) - position < max_value_length:
+                # Value might continue in the next chunk
+                chunk = reader.read(chunk_size)
+                buffer_, eof = buffer_[position:] + chunk, not chunk
+                continue
+            # Malformed value - skip it
+            buffer_ = buffer_[value_start:]
+            continue
+        yield value
+        buffer_ = buffer_[end:]
+
+
+def _passports_from_value(value):
+    """Return passport strings from `lti_passports` setting, as stored in policy or advanced settings API."""
+    if isinstance(value, dict):
+        value = value.get("value")
+    if not isinstance(value, list):
+        return []
+    return [passport for passport in value if isinstance(passport, basestring)]
+
+
+def is_dalite_passport(passport_str):
+    """
+    Check if passport is meant for Dalite XBlock, whether it is well formed or not.
+
+    :param str passport_str: LTI passport
+    :rtype: bool
+    """
+    parts = passport_str.split(":")
+    return len(parts) > 1 and parts[1].strip() == DALITE_PASSPORT_MARKER
+
+
+def _is_private_ipv4(host):
+    """Check if host is a loopback, private, link-local or unspecified IPv4 address."""
+    parts = host.split(".")
+    if len(parts) != 4 or not all(part.isdigit() and int(part) < 256 for part in parts):
+        return False
+    first, second = int(parts[0]), int(parts[1])
+    return (
+        first in (0, 10, 127) or (first == 172 and 16 <= second < 32) or (first == 192 and second == 168) or
+        (first == 169 and second == 254)
+    )
+
+
+def unreachable_reason(dalite_root_url):
+    """
+    Return why students' browsers probably can't reach dalite-ng URL, or None if it looks fine.
+
+    :param str dalite_root_url: dalite-ng URL from a passport
+    :rtype: str|None
+    """
+    parsed = urlparse.urlsplit(dalite_root_url.strip())
+    if parsed.scheme not in ("http", "https"):
+        return "URL scheme is not http or https"
+    host = (parsed.hostname or "").lower()
+    if not host:
+        return "URL has no host"
+    if host in LOCAL_HOST_NAMES or host.endswith(LOCAL_HOST_SUFFIXES) or host == "::1":
+        return "URL points at a local host"
+    if _is_private_ipv4(host):
+        return "URL points at a private or loopback address"
+    if "." not in host and ":" not in host:
+        return "URL host name is not fully qualified"
+    return None
+
+
+def audit_passports(passport_strings):
+    """
+    Audit LTI passports of a course.
+
+    :param Iterable[str] passport_strings: Course LTI passports, including non-Dalite ones
+    :returns: Number of Dalite passports, and lists of malformed, duplicate and unreachable-looking passports
+    :rtype: dict
+    """
+    malformed = []
+    parsed = []
+    for passport_str in passport_strings:
+        if not is_dalite_passport(passport_str):
+            continue
+        lti_id = passport_str.split(":", 1)[0]
+        passport = parse_passport(passport_str)
+        if passport is None:
+            malformed.append({"lti_id": lti_id, "reason": "Passport can't be decoded"})
+        elif not passport.lti_key or not passport.lti_secret:
+            malformed.append({"lti_id": lti_id, "reason": "LTI key or secret is empty"})
+        else:
+            parsed.append(passport)
+
+    index = DalitePassportIndex(parsed)
+    unreachable = []
+    for passport in index:
+        for dalite_root_url in passport.dalite_root_urls or ("",):
+            reason = unreachable_reason(dalite_root_url)
+            if reason:
+                unreachable.append({"lti_id": passport.lti_id, "url": dalite_root_url, "reason": reason})
+
+    return {
+        "passports": len(parsed) + len(malformed),
+        "malformed": malformed,
+        "duplicates": list(index.duplicate_lti_ids),
+        "unreachable": unreachable,
+    }
+
+
+def course_id_from_xml(course_xml):
+    """
+    Return course id from attributes of root element of `course.xml`.
+
+    :param file|str course_xml: `course.xml` file or path
+    :returns: Course id, or None if root element has no org, course or url_name
+    :rtype: unicode|None
+    """
+    try:
+        for __, element in ElementTree.iterparse(course_xml, events=("start",)):
+            attributes = element.attrib
+            if all(attributes.get(name) for name in ("org", "course", "url_name")):
+                return u"course-v1:{org}+{course}+{url_name}".format(**attributes)
+            return None
+    except ElementTree.ParseError:
+        return None
+    return None
+
+
+def is_policy_file(name):
+    """Check if export file is a course policy file."""
+    parts = name.replace(os.sep, "/").split("/")
+    return len(parts) >= 3 and parts[-1] == POLICY_JSON and parts[-3] == "policies"
+
+
+def is_course_xml(name):
+    """Check if export file is `course.xml` at the root of the export."""
+    parts = name.replace(os.sep, "/").strip("/").split("/")
+    return parts[-1] == COURSE_XML and len(parts) <= 2
+
+
+def iter_export_files(path):
+    """
+    Yield files of a course export, in a single pass over the export.
+
+    Files are opened only when the caller asks for them; archive members can only be opened before the next file is
+    requested, as archives are read as a stream, member by member.
+
+    :param str path: Export directory or archive
+    :returns: Pairs of file name relative to the export (or archive) root, with "/" separators, and a function
+        opening the file
+    :rtype: Iterable[(str, () -> file)]
+    """
+    if os.path.isdir(path):
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                file_path = os.path.join(directory, name)
+                yield os.path.relpath(file_path, path).replace(os.sep, "/"), functools.partial(open, file_path, "rb")
+        return
+
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, functools.partial(archive.extractfile, member)
+
+
+def read_export(path):
+    """
+    Read course id and LTI passports of a course export.
+
+    :param str path: Export directory or archive
+    :returns: Course id (or None if it can't be found) and LTI passports
+    :rtype: (unicode|None, list[str])
+    """
+    course_id, passports = None, []
+    for name, open_file in iter_export_files(path):
+        if is_course_xml(name):
+            with closing(open_file()) as stream:
+                course_id = course_id_from_xml(stream)
+        elif is_policy_file(name):
+            passports.extend(read_policy_passports(open_file))
+    return course_id, passports
+
+
+def read_policy_passports(open_file):
+    """
+    Read LTI passports from a course policy file.
+
+    :param () -> file open_file: Function opening the policy file
+    :rtype: list[str]
+    """
+    passports = []
+    with closing(open_file()) as stream:
+        for value in iter_json_values(stream, LTI_PASSPORTS_KEY):
+            passports.extend(_passports_from_value(value))
+    return passports
+
+
+def iter_course_exports(root):
+    """
+    Yield paths of course exports under a directory, without descending into exports.
+
+    :param str root: Directory to search
+    :rtype: Iterable[str]
+    """
+    for directory, subdirectories, files in os.walk(root):
+        if COURSE_XML in files:
+            subdirectories[:] = []
+            yield directory
+            continue
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.endswith(EXPORT_ARCHIVE_SUFFIXES):
+                yield os.path.join(directory, name)
+
+
+def audit_export(path):
+    """
+    Audit Dalite passports of a course export.
+
+    :param str path: Export directory or archive
+    :returns: Audit result, with `error` if export could not be read
+    :rtype: dict
+    """
+    result = {"export": path}
+    try:
+        course_id, passports = read_export(path)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Broken export must not stop the audit of the others
+        result["error"] = "{}: {}".format(exc.__class__.__name__, exc)
+        return result
+    result["course_id"] = course_id
+    result.update(audit_passports(passports))
+    return result
+
+
+def has_problems(result):
+    """
+    Check if audit result of a course reports any problem.
+
+    :param dict result: Result of `audit_export`
+    :rtype: bool
+    """
+    return bool(result.get("error") or result.get("malformed") or result.get("duplicates") or result.get("unreachable"))
+
+
+def map_exports(function, root, processes=None, chunk_size=4):
+    """
+    Apply a function to all course exports under a directory, in parallel.
+
+    :param (str) -> Any function: Function taking export path; must be picklable, i.e. a module-level function
+    :param str root: Directory to search
+    :param int|None processes: Number of worker processes, defaults to number of CPUs; 1 runs in this process
+    :param int chunk_size: Number of exports sent to a worker process at once
+    :returns: Function results, in order of completion
+    :rtype: Iterable
+    """
+    exports = iter_course_exports(root)
+    if processes == 1:
+        for path in exports:
+            yield function(path)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(function, exports, chunksize=chunk_size):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def audit_exports(root, processes=None, chunk_size=4):
+    """
+    Audit Dalite passports of all course exports under a directory, in parallel.
+
+    :param str root: Directory to search
+    :param int|None processes: Number of worker processes, defaults to number of CPUs; 1 audits in this process
+    :param int chunk_size: Number of exports sent to a worker process at once
+    :returns: Audit results, in order of completion
+    :rtype: Iterable[dict]
+    """
+    return map_exports(audit_export, root, processes=processes, chunk_size=chunk_size)
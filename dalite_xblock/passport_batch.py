@@ -0,0 +1,181 @@
+"""
+Batch generation of Dalite passports.
+
+Rows with passport id, dalite-ng URL, LTI key and LTI secret are read from CSV (with a header row) or newline-delimited
+JSON, one at a time, encoded with `prepare_passport`, and written out as soon as they are encoded, so memory use does
+not depend on input size. Rows that can't be encoded produce a row with an error instead of failing the whole run.
+Large inputs can be encoded by a pool of processes; input is handed to the pool in windows of limited size, so memory
+use stays constant there too, and output keeps input order.
+
+As with `passport_utils` no XBlock related imports are used in this module, so it can be run on vanilla python.
+"""
+import csv
+import itertools
+import json
+import multiprocessing
+
+from .passport_utils import DaliteLtiPassport, join_root_urls, parse_passport, prepare_passport
+
+FIELDS = ("passport_id", "dalite_url", "lti_key", "lti_secret")
+OUTPUT_FIELDS = ("line", "passport_id", "passport", "error")
+FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 500
+# Number of chunks per process handed to the pool at once
+POOL_WINDOW_CHUNKS = 4
+
+
+def _to_str(value):
+    """Return value as utf-8 encoded str, as passports are encoded from bytes."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def read_rows(stream, input_format):
+    """
+    Yield (line number, row) pairs from input stream.
+
+    Rows that can't be parsed are yielded as exceptions, so they are reported with the rest of output.
+
+    :param file stream: Input stream
+    :param str input_format: "csv" or "jsonl"
+    :rtype: Iterable[(int, dict|Exception)]
+    """
+    if input_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, exc
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("Row is not a JSON object")
+
+
+def encode_row(numbered_row):
+    """
+    Encode a single row as a passport.
+
+    :param (int, dict|Exception) numbered_row: Line number and row, as yielded by `read_rows`
+    :returns: Output row with `line` and either `passport_id` and `passport`, or `error`
+    :rtype: dict
+    """
+    line_number, row = numbered_row
+    result = {"line": line_number, "passport_id": None, "passport": None, "error": None}
+    try:
+        if isinstance(row, Exception):
+            raise row
+        missing = [field for field in FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError("Missing fields: {}".format(", ".join(missing)))
+        dalite_url = row["dalite_url"]
+        # JSONL rows may list root URLs of several dalite-ng nodes
+        if isinstance(dalite_url, list):
+            dalite_url = join_root_urls(_to_str(url) for url in dalite_url)
+        passport = DaliteLtiPassport(
+            lti_id=_to_str(row["passport_id"]).strip(), dalite_root_url=_to_str(dalite_url).strip(),
+            lti_key=_to_str(row["lti_key"]), lti_secret=_to_str(row["lti_secret"])
+        )
+        result["passport_id"] = passport.lti_id
+        if ":" in passport.lti_id:
+            raise ValueError("Passport id must not contain ':'")
+        if any(";" in value for value in passport[1:]):
+            raise ValueError("Dalite URL, LTI key and LTI secret must not contain ';'")
+        encoded = prepare_passport(passport)
+        if parse_passport(encoded) != passport:
+            raise ValueError("Passport does not survive encoding")
+        result["passport"] = encoded
+    except Exception as exc:  # pylint: disable=broad-except
+        # Any broken row is reported in output, other rows are still encoded
+        result["error"] = str(exc) or exc.__class__.__name__
+    return result
+
+
+def encode_rows(numbered_rows, processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encode rows as passports, preserving order.
+
+    :param Iterable[(int, dict|Exception)] numbered_rows: Rows, as yielded by `read_rows`
+    :param int|None processes: Number of worker processes, None or less than 2 encodes rows in this process
+    :param int chunk_size: Number of rows sent to a worker process at once
+    :rtype: Iterable[dict]
+    """
+    if not processes or processes < 2:
+        for numbered_row in numbered_rows:
+            yield encode_row(numbered_row)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        window_size = processes * chunk_size * POOL_WINDOW_CHUNKS
+        numbered_rows = iter(numbered_rows)
+        while True:
+            # Pool.imap consumes its whole input at once, so input is handed over in windows
+            window = list(itertools.islice(numbered_rows, window_size))
+            if not window:
+                break
+            for result in pool.imap(encode_row, window, chunksize=chunk_size):
+                yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+class RowWriter(object):
+    """Writes output rows as CSV (with a header row) or newline-delimited JSON, flushing after every row."""
+
+    def __init__(self, stream, output_format):
+        """
+        Initialize RowWriter.
+
+        :param file stream: Output stream
+        :param str output_format: "csv" or "jsonl"
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self._csv_writer = None
+        if output_format == "csv":
+            self._csv_writer = csv.DictWriter(stream, OUTPUT_FIELDS)
+            self._csv_writer.writeheader()
+
+    def write(self, result):
+        """Write single output row."""
+        if self._csv_writer is not None:
+            self._csv_writer.writerow({key: "" if value is None else value for key, value in result.items()})
+        else:
+            present = {key: value for key, value in result.items() if value is not None}
+            self.stream.write(json.dumps(present, sort_keys=True) + "\n")
+        self.stream.flush()
+
+
+def generate_passports(input_stream, output_stream, input_format="csv", output_format=None, processes=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encode passports of all input rows and write them out.
+
+    :param file input_stream: Input stream
+    :param file output_stream: Output stream
+    :param str input_format: "csv" or "jsonl"
+    :param str|None output_format: "csv" or "jsonl", defaults to input format
+    :param int|None processes: Number of worker processes
+    :param int chunk_size: Number of rows sent to a worker process at once
+    :returns: Number of encoded rows and number of rows with errors
+    :rtype: (int, int)
+    """
+    writer = RowWriter(output_stream, output_format or input_format)
+    encoded, failed = 0, 0
+    for result in encode_rows(read_rows(input_stream, input_format), processes=processes, chunk_size=chunk_size):
+        writer.write(result)
+        if result["error"]:
+            failed += 1
+        else:
+            encoded += 1
+    return encoded, failed
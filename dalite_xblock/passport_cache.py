@@ -0,0 +1,183 @@
+"""
+Process-wide cache of parsed Dalite LTI passports.
+
+Parsed passport indexes are shared between all DaliteXBlock instances of a course, so a page displaying many
+Dalite blocks parses course passports only once. Cache entries are keyed by course id and a fingerprint of the raw
+passport list, so any change to the passports in Advanced Settings produces a new key and stale entries are never
+served.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from .instrumentation import timed
+from .passport_utils import DalitePassportIndex
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL = 300  # seconds
+
+
+class LruTtlCache(object):
+    """
+    Thread-safe, size-bounded mapping with least-recently-used eviction and per-entry time to live.
+
+    Values are stored as is, so callers should only put immutable objects into the cache.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL, clock=time.time):
+        """
+        Initialize LruTtlCache.
+
+        :param int max_size: Maximum number of entries kept in the cache
+        :param float|None ttl: Number of seconds an entry stays valid, None means entries never expire
+        :param () -> float clock: Time source, useful in tests
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Return number of entries in the cache (including expired, but not evicted ones)."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Return value stored under `key`, or `default` if it is absent or expired.
+
+        :param Hashable key: Cache key
+        :param Any default: Value returned on cache miss
+        """
+        with self._lock:
+            entry = self._entries.pop(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                return default
+            # Re-inserting moves the key to the most-recently-used end
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting least recently used entries if the cache is full.
+
+        :param Hashable key: Cache key
+        :param Any value: Value to store
+        """
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """
+        Return value stored under `key`, calling `factory` to create and store it on cache miss.
+
+        Factory is called outside of the cache lock, so concurrent misses for the same key might call it more than
+        once - this is fine for cheap, deterministic factories this cache is meant for.
+
+        :param Hashable key: Cache key
+        :param () -> Any factory: Value factory
+        """
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def values(self):
+        """
+        Return values of all entries that have not expired, without marking them as recently used.
+
+        :rtype: list
+        """
+        now = self._clock()
+        with self._lock:
+            entries = list(self._entries.values())
+        return [value for expires_at, value in entries if expires_at is None or expires_at > now]
+
+    def delete(self, key):
+        """Remove entry stored under `key`, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+def passport_fingerprint(raw_passports):
+    """
+    Return a fingerprint of a raw passport list.
+
+    :param Iterable[str] raw_passports: Passports as stored in course Advanced Settings
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    for passport_str in raw_passports:
+        if isinstance(passport_str, unicode):
+            passport_str = passport_str.encode('utf-8')
+        digest.update(passport_str)
+        digest.update('\n')
+    return digest.hexdigest()
+
+
+class PassportCache(object):
+    """Cache of parsed Dalite passports keyed by course id and passport list fingerprint."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL, clock=time.time):
+        """
+        Initialize PassportCache.
+
+        :param int max_size: Maximum number of passport lists kept in the cache
+        :param float|None ttl: Number of seconds parsed passports stay valid
+        :param () -> float clock: Time source, useful in tests
+        """
+        self._cache = LruTtlCache(max_size=max_size, ttl=ttl, clock=clock)
+
+    def get_passports(self, course_id, raw_passports):
+        """
+        Return index of parsed Dalite passports for a course.
+
+        :param str course_id: Course ID
+        :param Iterable[str] raw_passports: Course LTI passports, including non-Dalite ones
+        :rtype: DalitePassportIndex
+        """
+        raw_passports = tuple(raw_passports)
+        key = (course_id, passport_fingerprint(raw_passports))
+
+        def parse_passports():
+            """Parse passports on cache miss."""
+            with timed("passports.parse", {"course_id": course_id}):
+                return DalitePassportIndex.from_passport_strings(raw_passports)
+
+        return self._cache.get_or_create(key, parse_passports)
+
+    def dalite_root_urls(self):
+        """
+        Return every distinct dalite-ng root URL of cached passports.
+
+        :rtype: list[str]
+        """
+        urls = OrderedDict()
+        for passport_index in self._cache.values():
+            for passport in passport_index:
+                for url in passport.dalite_root_urls:
+                    urls[url.rstrip('/')] = None
+        return [url for url in urls if url]
+
+    def clear(self):
+        """Drop all cached passports."""
+        self._cache.clear()
+
+
+PASSPORT_CACHE = PassportCache()
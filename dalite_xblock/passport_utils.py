@@ -5,16 +5,85 @@ Separate module so I know no XBlock related imports are used from here, and
 it can be launched locally on vanilla python, just to generate passports.
 """
 import base64
-from collections import namedtuple
+import hashlib
+from collections import namedtuple, OrderedDict
 import logging
 
 logger = logging.getLogger(__name__)
 
-DaliteLtiPassport = namedtuple("DaliteLtiPassport", ["lti_id", "dalite_root_url", "lti_key", "lti_secret"])
-
 DALITE_PASSPORT_MARKER = "dalite-xblock"
+# Block type of DaliteXBlock, as registered in `xblock.v1` entry point - OLX tag and modulestore category
+DALITE_BLOCK_CATEGORY = "xblock-dalite"
+DALITE_ROOT_URL_SEPARATOR = "|"
 
 MALFORMED_LTI_PASSPORT_MESSAGE = u"Malformed Dalite-XBlock LTI Passport: %s - skipping"
+DUPLICATE_LTI_PASSPORT_MESSAGE = u"Duplicate Dalite-XBlock LTI Passport ID: %s - using first occurrence"
+
+
+def split_root_urls(dalite_root_url):
+    """
+    Split dalite-ng root URLs stored in a passport.
+
+    :param str dalite_root_url: Single root URL, or several separated with `DALITE_ROOT_URL_SEPARATOR`
+    :rtype: tuple[str]
+    """
+    return tuple(url.strip() for url in dalite_root_url.split(DALITE_ROOT_URL_SEPARATOR) if url.strip())
+
+
+def join_root_urls(dalite_root_urls):
+    """
+    Join dalite-ng root URLs, so they can be stored in a passport.
+
+    :param Iterable[str] dalite_root_urls: Root URLs
+    :rtype: str
+    """
+    return DALITE_ROOT_URL_SEPARATOR.join(url.strip() for url in dalite_root_urls)
+
+
+def select_root_url(dalite_root_urls, user_id):
+    """
+    Select root URL of the dalite-ng node serving a user, using rendezvous (highest random weight) hashing.
+
+    A user is always routed to the same node, and adding or removing a node moves only the users of that node.
+
+    :param tuple[str] dalite_root_urls: Root URLs of dalite-ng nodes
+    :param unicode|str|None user_id: Anonymous user id; users without one are routed to the first node
+    :rtype: str
+    """
+    if len(dalite_root_urls) < 2 or not isinstance(user_id, basestring) or not user_id:
+        return dalite_root_urls[0] if dalite_root_urls else ''
+    if isinstance(user_id, unicode):
+        user_id = user_id.encode('utf-8')
+    return max(dalite_root_urls, key=lambda url: hashlib.md5(url + "\n" + user_id).digest())
+
+
+class DaliteLtiPassport(namedtuple("DaliteLtiPassport", ["lti_id", "dalite_root_url", "lti_key", "lti_secret"])):
+    """
+    Dalite LTI passport.
+
+    `dalite_root_url` is either a single dalite-ng root URL, or root URLs of several dalite-ng nodes separated with
+    `DALITE_ROOT_URL_SEPARATOR`, in which case students are spread over the nodes (see `get_root_url`).
+    """
+
+    __slots__ = ()
+
+    @property
+    def dalite_root_urls(self):
+        """
+        Return all dalite-ng root URLs of this passport.
+
+        :rtype: tuple[str]
+        """
+        return split_root_urls(self.dalite_root_url)
+
+    def get_root_url(self, user_id):
+        """
+        Return root URL of the dalite-ng node a user is routed to.
+
+        :param unicode|str|None user_id: Anonymous user id
+        :rtype: str
+        """
+        return select_root_url(self.dalite_root_urls, user_id)
 
 
 def prepare_passport(passport_data):
@@ -69,3 +138,95 @@ def filter_and_parse_passports(passports):
         for passport in (parse_passport(passport_str) for passport_str in passports)
         if passport is not None
     ]
+
+
+def normalize_lti_id(lti_id):
+    """
+    Normalize LTI ID for lookups.
+
+    :param str|None lti_id: LTI ID as entered in passport or selected in studio
+    :rtype: str
+    """
+    return (lti_id or '').strip()
+
+
+class DalitePassportIndex(object):
+    """
+    Read-only collection of Dalite passports indexed by normalized LTI ID.
+
+    Iteration preserves passport order. If more than one passport uses the same LTI ID, first one wins (as it did
+    when passports were searched linearly) and the ID is recorded in `duplicate_lti_ids`.
+    """
+
+    def __init__(self, passports):
+        """
+        Initialize DalitePassportIndex.
+
+        :param Iterable[DaliteLtiPassport] passports: Parsed passports
+        """
+        by_id = OrderedDict()
+        duplicate_lti_ids = []
+        for passport in passports:
+            lti_id = normalize_lti_id(passport.lti_id)
+            if lti_id in by_id:
+                logger.warn(DUPLICATE_LTI_PASSPORT_MESSAGE, lti_id)
+                if lti_id not in duplicate_lti_ids:
+                    duplicate_lti_ids.append(lti_id)
+                continue
+            by_id[lti_id] = passport
+
+        self._by_id = by_id
+        self.duplicate_lti_ids = tuple(duplicate_lti_ids)
+        self._option_lti_ids = tuple(passport.lti_id for passport in by_id.itervalues())
+
+    @classmethod
+    def from_passport_strings(cls, passports):
+        """
+        Parse passport strings and build an index out of Dalite passports.
+
+        :param Iterable[str] passports: Passports for this xblock and for normal LTI modules
+        :rtype: DalitePassportIndex
+        """
+        return cls(filter_and_parse_passports(passports))
+
+    def __iter__(self):
+        """Iterate over passports in original order."""
+        return self._by_id.itervalues()
+
+    def __len__(self):
+        """Return number of indexed passports."""
+        return len(self._by_id)
+
+    def __contains__(self, lti_id):
+        """Check if passport with a given LTI ID is present."""
+        return normalize_lti_id(lti_id) in self._by_id
+
+    @property
+    def lti_id_options(self):
+        """
+        Return LTI ID field options of all indexed passports.
+
+        Options are new dicts on every call, so callers (i.e. Studio field editors) can modify them.
+
+        :rtype: list[dict[str, str]]
+        """
+        return [{"display_name": lti_id, "value": lti_id} for lti_id in self._option_lti_ids]
+
+    @property
+    def lti_ids(self):
+        """
+        Return LTI IDs of all indexed passports.
+
+        :rtype: list[str]
+        """
+        return self._by_id.keys()
+
+    def get(self, lti_id, default=None):
+        """
+        Return passport by LTI ID.
+
+        :param str lti_id: LTI ID
+        :param Any default: Value returned if there is no matching passport
+        :rtype: DaliteLtiPassport|None
+        """
+        return self._by_id.get(normalize_lti_id(lti_id), default)
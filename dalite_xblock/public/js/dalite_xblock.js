@@ -1,19 +1,95 @@
-function DaliteXBlock(runtime, element) {
+function DaliteXBlock(runtime, element, options) {
+    options = options || {};
     LtiConsumerXBlock(runtime, element);
 
+    var $block = $(element);
+
     // hack to make LTI Consumer css applied to Dalite XBlock
-    $(element).addClass("xblock-student_view-lti_consumer xblock-student_view");
-    $(element).children(".xblock-dalite").addClass("lti_consumer");
+    $block.addClass("xblock-student_view-lti_consumer xblock-student_view");
+    $block.children(".xblock-dalite").addClass("lti_consumer");
+
+    // Readiness rendered by the server, compared with the reported one to decide whether the block must be re-rendered
+    $block.attr("data-dalite-lti-ready", options.is_lti_ready ? "true" : "false");
+
+    // Deferred inline launch: the iframe is rendered without src, launch it when it nears the viewport
+    if (options.deferred_launch_url) {
+        var $iframe = $block.find(".lti-consumer-container iframe.ltiLaunchFrame").first();
+        var launch = function () { $iframe.attr("src", options.deferred_launch_url); };
+        if ($iframe.length && "IntersectionObserver" in window) {
+            var observer = new IntersectionObserver(function (entries) {
+                var isNearViewport = entries.some(function (entry) { return entry.isIntersecting; });
+                if (isNearViewport) {
+                    observer.disconnect();
+                    launch();
+                }
+            }, {rootMargin: "200px 0px"});
+            observer.observe($iframe[0]);
+        } else {
+            launch();
+        }
+    }
+
+    // Fetch statuses of all Dalite blocks on the page in a single request; only re-render blocks whose readiness
+    // changed, and update status messages of the others in place.
+    var refreshStatuses = function () {
+        var $daliteBlocks = $("[data-dalite-lti-ready]");
+        var blockIds = $daliteBlocks.map(function () { return $(this).attr("data-usage-id"); }).get();
+        $.ajax({
+            type: "POST",
+            url: runtime.handlerUrl(element, "block_status"),
+            data: JSON.stringify({block_ids: blockIds, in_studio: !!options.in_studio}),
+            contentType: "application/json; charset=utf-8",
+            dataType: "json"
+        }).done(function (response) {
+            $daliteBlocks.each(function () {
+                var $daliteBlock = $(this);
+                var status = response.statuses[$daliteBlock.attr("data-usage-id")];
+                if (!status) {
+                    return;
+                }
+                if (String(status.is_lti_ready) !== $daliteBlock.attr("data-dalite-lti-ready")) {
+                    runtime.refreshXBlock($daliteBlock);
+                } else {
+                    $daliteBlock.find(".dalite-status-message").text(status.message || "");
+                }
+            });
+        });
+    };
+
+    // Lazily rendered admin overlays contain an empty container instead of an iframe - the iframe is created when
+    // the overlay is opened (before iframeModal sets its src and launches dalite-ng admin) and dropped when closed.
+    var createAdminIframe = function ($modal) {
+        var $container = $modal.find(".dalite-admin-iframe-container");
+        if (!$container.length || $container.children("iframe").length) {
+            return;
+        }
+        $("<iframe>", {
+            title: $container.data("iframe-title"),
+            "class": "ltiLaunchFrame",
+            name: $container.data("iframe-name"),
+            allowfullscreen: "true",
+            webkitallowfullscreen: "true",
+            mozallowfullscreen: "true"
+        }).appendTo($container);
+    };
+    var removeAdminIframe = function ($modal) {
+        $modal.find(".dalite-admin-iframe-container").empty();
+    };
 
-    $('.btn-lti-modal-dalite-admin').each(function (index, element) {
-        var $element = $(element);
-        $element.iframeModal({
+    $block.find('.btn-lti-modal-dalite-admin').each(function (index, button) {
+        var $button = $(button);
+        var modal_selector = $button.data("target");
+        var overlay_selector = (modal_selector + '_lean-overlay');
+        var onClose = function () {
+            removeAdminIframe($(modal_selector));
+            refreshStatuses();
+        };
+        // Must be bound before iframeModal, so the iframe exists when iframeModal handler sets its src
+        $button.on("click", function () { createAdminIframe($(modal_selector)); });
+        $button.iframeModal({
             top: 200,
             closeButton: '.close-modal'
         });
-        var modal_selector = $element.data("target");
-        var overlay_selector = (modal_selector + '_lean-overlay');
-        var onClose = function () { runtime.refreshXBlock($element.data("data-xblock-id")); };
         $(overlay_selector).on("click", onClose);
         $(modal_selector).on("click", ".close-modal", onClose);
     });
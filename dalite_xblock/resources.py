@@ -0,0 +1,130 @@
+"""
+Cached access to package resources and templates.
+
+`CachedResourceLoader` is a drop-in replacement for `xblockutils.resources.ResourceLoader` that reads every resource
+and compiles every template once per process, so rendering fragments does no disk I/O and no template parsing.
+In development mode (``DALITE_XBLOCK_RESOURCES_DEV_MODE`` environment variable set to a non-empty value) resources
+are reloaded whenever the underlying file changes.
+
+Loaders are created when modules are imported, so `pkg_resources`, `xblockutils` and template engines are only
+imported when the first resource is loaded.
+"""
+import os
+import threading
+
+DEV_MODE_ENV_VARIABLE = "DALITE_XBLOCK_RESOURCES_DEV_MODE"
+
+
+class CachedResourceLoader(object):
+    """Loads resources of a python package, caching their contents and compiled templates."""
+
+    def __init__(self, module_name, dev_mode=None):
+        """
+        Initialize CachedResourceLoader.
+
+        :param str module_name: Module (or package) name resources are relative to
+        :param bool|None dev_mode: If true, resources are reloaded when files change; defaults to the value of
+            `DALITE_XBLOCK_RESOURCES_DEV_MODE` environment variable
+        """
+        self.module_name = module_name
+        self.dev_mode = bool(os.environ.get(DEV_MODE_ENV_VARIABLE)) if dev_mode is None else dev_mode
+        self._loader = None
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _get_loader(self):
+        """Return `xblockutils` resource loader, creating it on first use."""
+        if self._loader is None:
+            from xblockutils.resources import ResourceLoader
+            self._loader = ResourceLoader(self.module_name)
+        return self._loader
+
+    def _get_mtime(self, resource_path):
+        """Return modification time of a resource file, or None if it is not a plain file (i.e. in a zipped egg)."""
+        import pkg_resources
+        try:
+            return os.path.getmtime(pkg_resources.resource_filename(self.module_name, resource_path))
+        except (OSError, NotImplementedError):
+            return None
+
+    def _get_cached(self, kind, resource_path, factory):
+        """
+        Return cached object created from a resource, creating it with `factory` if needed.
+
+        :param str kind: Kind of cached object, i.e. "django" for compiled django templates
+        :param str resource_path: Resource path
+        :param (unicode) -> Any factory: Creates cached object from resource contents
+        """
+        key = (kind, resource_path)
+        mtime = self._get_mtime(resource_path) if self.dev_mode else None
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        value = factory(self._get_loader().load_unicode(resource_path))
+        with self._lock:
+            self._cache[key] = (mtime, value)
+        return value
+
+    def load_unicode(self, resource_path):
+        """
+        Return contents of a resource.
+
+        :param str resource_path: Resource path, i.e. `public/js/dalite_xblock.js`
+        :rtype: unicode
+        """
+        return self._get_cached("text", resource_path, lambda text: text)
+
+    def get_django_template(self, template_path):
+        """
+        Return compiled django template.
+
+        :param str template_path: Template resource path
+        :rtype: django.template.Template
+        """
+        from django.template import Template
+        return self._get_cached("django", template_path, Template)
+
+    def render_django_template(self, template_path, context=None):
+        """
+        Render django template.
+
+        :param str template_path: Template resource path
+        :param dict|None context: Template context
+        :rtype: unicode
+        """
+        from django.template import Context
+        return self.get_django_template(template_path).render(Context(context or {}))
+
+    def get_mako_template(self, template_path):
+        """
+        Return compiled mako template, able to include other templates of the same package.
+
+        :param str template_path: Template resource path
+        :rtype: mako.template.Template
+        """
+        import pkg_resources
+        from mako.lookup import TemplateLookup
+        from mako.template import Template
+
+        def compile_template(template_str):
+            """Compile mako template."""
+            lookup = TemplateLookup(directories=[pkg_resources.resource_filename(self.module_name, '')])
+            return Template(template_str, lookup=lookup)
+
+        return self._get_cached("mako", template_path, compile_template)
+
+    def render_mako_template(self, template_path, context=None):
+        """
+        Render mako template.
+
+        :param str template_path: Template resource path
+        :param dict|None context: Template context
+        :rtype: unicode
+        """
+        return self.get_mako_template(template_path).render(**(context or {}))
+
+    def clear(self):
+        """Drop all cached resources."""
+        with self._lock:
+            self._cache.clear()
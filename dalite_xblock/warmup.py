@@ -0,0 +1,191 @@
+"""
+Warm-up of LMS and Studio worker processes.
+
+The first request a fresh worker serves pays for importing `lti_consumer` and its dependencies, reading and compiling
+Dalite templates and, for every course, loading the course from the modulestore and parsing its passports. `warm_up`
+does all of that ahead of time:
+
+* imports the modules DaliteXBlock needs to render and launch, and builds its fields;
+* reads Dalite JS and compiles Dalite templates into the process-wide resource caches (see `resources`);
+* parses passports of active courses into the process-wide passport cache (see `passport_cache`).
+
+Active courses are passed explicitly, or listed in ``DALITE_XBLOCK_WARMUP_COURSES`` environment variable (course ids
+separated by commas or whitespace). Warm-up never raises: failures are logged and listed in the returned report, next
+to the duration of every warm-up phase.
+
+Call `post_fork` from the post-fork hook of the WSGI server, i.e. in gunicorn configuration::
+
+    def post_fork(server, worker):
+        from dalite_xblock.warmup import post_fork
+        post_fork()
+
+Warm-up only helps the process it runs in: there is no warm-up on course publish, since edx-platform sends its
+publish signal in the Studio process that publishes, not in LMS workers serving students. Passports changed by a
+publish are parsed again by every LMS worker on its first request for the course, as passport cache keys include the
+passports themselves.
+"""
+import importlib
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from .course_settings import ModulestoreCourseSettingsProvider
+from .instrumentation import timed
+from .passport_cache import PASSPORT_CACHE
+
+try:
+    from xmodule.modulestore.django import modulestore
+except ImportError:
+    # Outside of edx-platform there is no modulestore
+    modulestore = None
+
+logger = logging.getLogger(__name__)
+
+WARMUP_COURSES_ENV_VARIABLE = "DALITE_XBLOCK_WARMUP_COURSES"
+
+# Modules imported on first render or launch
+WARMUP_MODULES = (
+    "dalite_xblock.dalite_xblock",
+    "dalite_xblock.health",
+    "dalite_xblock.lti",
+    "dalite_xblock.oauth",
+    "dalite_xblock.outcomes",
+    "lti_consumer.lti_consumer",
+    "lti_consumer.oauth",
+    "oauthlib.oauth1.rfc5849.signature",
+    "django.template",
+    "mako.lookup",
+    "mako.template",
+)
+
+_COURSE_ID_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def courses_from_env(value=None):
+    """
+    Return ids of active courses listed in ``DALITE_XBLOCK_WARMUP_COURSES`` environment variable.
+
+    :param str|None value: Variable value, read from the environment by default
+    :rtype: list[unicode]
+    """
+    if value is None:
+        value = os.environ.get(WARMUP_COURSES_ENV_VARIABLE, "")
+    return [course_id.decode('utf-8') for course_id in _COURSE_ID_SEPARATORS.split(value) if course_id]
+
+
+@contextmanager
+def _phase(report, name):
+    """Record duration of a warm-up phase in the report, and send it to the metrics sink."""
+    started = time.time()
+    with timed("warmup." + name):
+        yield
+    report[name + "_ms"] = (time.time() - started) * 1000
+
+
+def warm_imports(report):
+    """
+    Import modules needed to render and launch Dalite blocks, and build DaliteXBlock fields.
+
+    :param dict report: Warm-up report import errors are added to
+    """
+    for module_name in WARMUP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Warm-up failed to import %s", module_name, exc_info=True)
+            report["errors"].append({"module": module_name, "error": "{}: {}".format(exc.__class__.__name__, exc)})
+
+    from .dalite_xblock import DaliteXBlock
+    # XBlock builds class fields lazily and without locking
+    DaliteXBlock.fields  # pylint: disable=pointless-statement
+
+
+def warm_resources():
+    """Read Dalite JS and compile Dalite templates into process-wide resource caches."""
+    from . import dalite_xblock, outcomes
+
+    for js_path in ('public/js/dalite_xblock.js', 'public/js/dalite_xblock_edit.js'):
+        dalite_xblock.loader.load_unicode(js_path)
+    for template_path in ('/templates/dalite_xblock_data_not_filled.html', '/templates/dalite_xblock_lti_iframe.html'):
+        dalite_xblock.loader.get_django_template(template_path)
+    dalite_xblock.lti_consumer_loader.get_mako_template('/templates/html/lti_launch.html')
+    outcomes.loader.load_unicode(outcomes.RESPONSE_TEMPLATE)
+
+
+def warm_passports(course_ids, settings_provider, report):
+    """
+    Parse passports of courses into process-wide passport cache.
+
+    :param Iterable[unicode] course_ids: Course ids
+    :param dalite_xblock.course_settings.CourseSettingsProvider settings_provider: Source of course passports
+    :param dict report: Warm-up report; warmed courses are counted in it, and failures added to it
+    """
+    for course_id in course_ids:
+        course_id = unicode(course_id)
+        try:
+            PASSPORT_CACHE.get_passports(course_id, settings_provider.get_lti_passports(course_id))
+        except Exception as exc:  # pylint: disable=broad-except
+            # A broken or deleted course must not stop warm-up of the others
+            logger.warning("Warm-up failed to load passports of course %s", course_id, exc_info=True)
+            report["errors"].append({"course_id": course_id, "error": "{}: {}".format(exc.__class__.__name__, exc)})
+        else:
+            report["courses"] += 1
+
+
+def _default_settings_provider():
+    """Return course settings provider reading from edx-platform modulestore, or None outside of edx-platform."""
+    if modulestore is None:
+        return None
+    return ModulestoreCourseSettingsProvider(modulestore())
+
+
+def warm_up(course_ids=None, settings_provider=None, resources=True):
+    """
+    Warm up this process.
+
+    :param Iterable[unicode]|None course_ids: Ids of courses whose passports are parsed, defaults to courses listed
+        in ``DALITE_XBLOCK_WARMUP_COURSES`` environment variable
+    :param dalite_xblock.course_settings.CourseSettingsProvider|None settings_provider: Source of course passports,
+        defaults to edx-platform modulestore
+    :param bool resources: Whether modules are imported and resources loaded, or only passports parsed
+    :returns: Warm-up report: number of warmed courses, errors and duration of every phase, in milliseconds
+    :rtype: dict
+    """
+    course_ids = courses_from_env() if course_ids is None else list(course_ids)
+    report = {"courses": 0, "errors": []}
+    started = time.time()
+    if resources:
+        with _phase(report, "imports"):
+            warm_imports(report)
+        with _phase(report, "resources"):
+            try:
+                warm_resources()
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning("Warm-up failed to load resources", exc_info=True)
+                report["errors"].append({"error": "{}: {}".format(exc.__class__.__name__, exc)})
+
+    if course_ids:
+        settings_provider = settings_provider or _default_settings_provider()
+        with _phase(report, "passports"):
+            if settings_provider is None:
+                report["errors"].append({"error": "No modulestore to load course passports from"})
+            else:
+                warm_passports(course_ids, settings_provider, report)
+    report["total_ms"] = (time.time() - started) * 1000
+
+    logger.info(
+        "Dalite warm-up took %.1f ms, passports of %d courses parsed, %d errors",
+        report["total_ms"], report["courses"], len(report["errors"])
+    )
+    return report
+
+
+def post_fork(*args, **kwargs):  # pylint: disable=unused-argument
+    """
+    Warm up a freshly forked worker process; accepts and ignores arguments WSGI servers pass to post-fork hooks.
+
+    :rtype: dict
+    """
+    return warm_up()
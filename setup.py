@@ -30,11 +30,11 @@ setup(
     install_requires=[
         'XBlock>=0.4.7',
         'lazy>=1.1',
-        'lti_consumer-xblock>=1.0.5'
+        'lti_consumer-xblock==1.4.0'
     ],
     dependency_links=[
         'https://github.com/edx/XBlock/tarball/xblock-0.4.10#egg=XBlock-0.4.10',
-        'https://github.com/edx/xblock-lti-consumer/tarball/v1.0.6#egg=lti_consumer-xblock-1.0.6'
+        'https://github.com/edx/xblock-lti-consumer/tarball/v1.4.0#egg=lti_consumer-xblock-1.4.0'
     ],
     entry_points={
         'xblock.v1': 'xblock-dalite = dalite_xblock.dalite_xblock:DaliteXBlock',
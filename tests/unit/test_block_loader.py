@@ -0,0 +1,115 @@
+"""Tests for loading blocks outside of requests."""
+import unittest
+
+import mock
+
+from dalite_xblock import block_loader
+from dalite_xblock.block_loader import (
+    BlockLoaderConfigurationError, bind_blocks_from_lms, load_block_from_lms, publish_user_score
+)
+
+
+class FakeUsageKey(object):
+    """Usage key of a block of the course-v1:Org+Course+Run course."""
+
+    course_key = "course-v1:Org+Course+Run"
+
+    def __unicode__(self):
+        return u"block-1"
+
+
+class LoadBlockFromLmsTests(unittest.TestCase):
+    """Tests for load_block_from_lms."""
+
+    def test_outside_lms(self):
+        """Test that loading blocks outside of LMS is reported as a configuration error."""
+        with mock.patch.object(block_loader, "get_module_by_usage_id", None):
+            with self.assertRaisesRegexp(BlockLoaderConfigurationError, "edx-platform LMS"):
+                load_block_from_lms(u"block-v1:Org+Course+Run+type@xblock-dalite+block@q1")
+
+    def test_load_block(self):
+        """Test that blocks are loaded in a bulk operation of their course, for an unknown anonymous user."""
+        store = mock.MagicMock()
+        usage_key_class = mock.Mock(**{"from_string.return_value": FakeUsageKey()})
+        get_module_by_usage_id = mock.Mock(return_value=("block", {}))
+
+        def in_bulk_operation(*args, **kwargs):  # pylint: disable=unused-argument
+            """Check that blocks are loaded in a bulk operation."""
+            self.assertTrue(store.bulk_operations.return_value.__enter__.called)
+            self.assertFalse(store.bulk_operations.return_value.__exit__.called)
+            return get_module_by_usage_id.return_value
+
+        get_module_by_usage_id.side_effect = in_bulk_operation
+        with mock.patch.object(block_loader, "get_module_by_usage_id", get_module_by_usage_id), \
+                mock.patch.object(block_loader, "modulestore", return_value=store, create=True), \
+                mock.patch.object(block_loader, "UsageKey", usage_key_class, create=True), \
+                mock.patch.object(block_loader, "AnonymousUser", mock.Mock, create=True), \
+                mock.patch.object(block_loader, "RequestFactory", create=True):
+            self.assertEqual(load_block_from_lms(u"block-1"), "block")
+
+        store.bulk_operations.assert_called_once_with("course-v1:Org+Course+Run")
+        store.get_course.assert_called_once_with("course-v1:Org+Course+Run", depth=0)
+        request, course_id, usage_id = get_module_by_usage_id.call_args[0]
+        self.assertEqual((course_id, usage_id), (u"course-v1:Org+Course+Run", u"block-1"))
+        self.assertFalse(request.user.known)
+        self.assertEqual(get_module_by_usage_id.call_args[1], {"course": store.get_course.return_value})
+
+
+class BindBlocksFromLmsTests(unittest.TestCase):
+    """Tests for bind_blocks_from_lms."""
+
+    def test_outside_lms(self):
+        """Test that loading blocks outside of LMS is reported as a configuration error."""
+        with mock.patch.object(block_loader, "get_module_by_usage_id", None):
+            with self.assertRaises(BlockLoaderConfigurationError):
+                with bind_blocks_from_lms(u"block-1"):
+                    pass
+
+    def test_bind_blocks(self):
+        """Test that block is loaded once in a bulk operation, and bound to an anonymous user as often as needed."""
+        store = mock.MagicMock()
+        get_module_for_descriptor = mock.Mock(side_effect=lambda user, request, descriptor, *args, **kwargs: descriptor)
+        with mock.patch.object(block_loader, "get_module_for_descriptor", get_module_for_descriptor, create=True), \
+                mock.patch.object(block_loader, "get_module_by_usage_id", mock.Mock()), \
+                mock.patch.object(block_loader, "modulestore", return_value=store, create=True), \
+                mock.patch.object(block_loader, "UsageKey", create=True) as usage_key_class, \
+                mock.patch.object(block_loader, "FieldDataCache", create=True) as field_data_cache_class, \
+                mock.patch.object(block_loader, "AnonymousUser", mock.Mock, create=True), \
+                mock.patch.object(block_loader, "RequestFactory", create=True):
+            usage_key = usage_key_class.from_string.return_value
+            with bind_blocks_from_lms(u"block-1") as bind_block:
+                blocks = [bind_block(), bind_block()]
+                self.assertFalse(store.bulk_operations.return_value.__exit__.called)
+
+        self.assertEqual(blocks, [store.get_item.return_value] * 2)
+        store.bulk_operations.assert_called_once_with(usage_key.course_key)
+        store.get_item.assert_called_once_with(usage_key)
+        self.assertEqual(field_data_cache_class.call_count, 2)
+        self.assertEqual(get_module_for_descriptor.call_count, 2)
+        user, __, __, __, course_key = get_module_for_descriptor.call_args[0]
+        self.assertFalse(user.known)
+        self.assertEqual(course_key, usage_key.course_key)
+        self.assertEqual(get_module_for_descriptor.call_args[1], {"course": store.get_course.return_value})
+
+
+class PublishUserScoreTests(unittest.TestCase):
+    """Tests for publish_user_score."""
+
+    def test_publish(self):
+        """Test that score is set for the real user, and the block is saved."""
+        block = mock.Mock(**{"max_score.return_value": 2.0, "runtime.get_real_user.return_value": "user-1"})
+
+        self.assertTrue(publish_user_score(block, u"student-1", 0.5))
+
+        block.runtime.get_real_user.assert_called_once_with(u"student-1")
+        block.set_user_module_score.assert_called_once_with("user-1", 0.5, 2.0)
+        block.save.assert_called_once_with()
+
+    def test_unknown_user(self):
+        """Test that scores of unknown users are not published."""
+        block = mock.Mock(**{"runtime.get_real_user.return_value": None})
+
+        self.assertFalse(publish_user_score(block, u"student-1", 0.5, 1.0))
+
+        self.assertFalse(block.set_user_module_score.called)
+        self.assertFalse(block.save.called)
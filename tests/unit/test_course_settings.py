@@ -0,0 +1,95 @@
+"""Tests for course settings providers."""
+from unittest import TestCase
+
+import mock
+
+from dalite_xblock import course_settings
+from dalite_xblock.course_settings import (
+    COURSE_SETTINGS_SERVICE, CourseSettingsProvider, InMemoryCourseSettingsProvider,
+    ModulestoreCourseSettingsProvider, get_course_settings_provider
+)
+from tests.utils import TestWithPatchesMixin
+
+
+class CourseSettingsProviderTests(TestCase):
+    """Tests for course settings provider implementations."""
+
+    def test_base_provider_memoizes(self):
+        """Test that settings are fetched once per course."""
+        provider = CourseSettingsProvider()
+        with mock.patch.object(provider, 'fetch_lti_passports', return_value=['a:b:c']) as fetch:
+            self.assertEqual(provider.get_lti_passports('course-1'), ('a:b:c',))
+            self.assertEqual(provider.get_lti_passports('course-1'), ('a:b:c',))
+            provider.get_lti_passports('course-2')
+
+        self.assertEqual(fetch.call_args_list, [mock.call('course-1'), mock.call('course-2')])
+
+    def test_base_provider_not_implemented(self):
+        """Test that base provider does not fetch anything."""
+        with self.assertRaises(NotImplementedError):
+            CourseSettingsProvider().get_lti_passports('course-1')
+
+    def test_modulestore_provider(self):
+        """Test that modulestore provider loads course without descendants."""
+        modulestore = mock.Mock()
+        modulestore.get_course.return_value.lti_passports = ['a:b:c']
+        provider = ModulestoreCourseSettingsProvider(modulestore)
+
+        self.assertEqual(provider.get_lti_passports('course-1'), ('a:b:c',))
+        modulestore.get_course.assert_called_once_with('course-1', depth=0)
+
+    def test_modulestore_provider_missing_course(self):
+        """Test that modulestore provider handles missing course."""
+        modulestore = mock.Mock()
+        modulestore.get_course.return_value = None
+        provider = ModulestoreCourseSettingsProvider(modulestore)
+
+        self.assertEqual(provider.get_lti_passports('course-1'), ())
+
+    def test_in_memory_provider(self):
+        """Test in-memory provider."""
+        provider = InMemoryCourseSettingsProvider({'course-1': ['a:b:c']})
+        self.assertEqual(provider.get_lti_passports('course-1'), ('a:b:c',))
+        self.assertEqual(provider.get_lti_passports('course-2'), ())
+
+
+class GetCourseSettingsProviderTests(TestCase, TestWithPatchesMixin):
+    """Tests for get_course_settings_provider."""
+
+    def setUp(self):
+        """Prepare block with mock runtime."""
+        self.make_patch(course_settings, 'get_request_cache', None)
+        self.block = mock.Mock()
+        self.block.runtime.service.return_value = None
+
+    def test_runtime_service(self):
+        """Test that runtime service is preferred."""
+        service = InMemoryCourseSettingsProvider()
+        self.block.runtime.service.return_value = service
+        self.assertIs(get_course_settings_provider(self.block), service)
+        self.block.runtime.service.assert_called_once_with(self.block, COURSE_SETTINGS_SERVICE)
+
+    def test_modulestore_fallback(self):
+        """Test that modulestore provider is shared by blocks using the same runtime."""
+        provider = get_course_settings_provider(self.block)
+        self.assertIsInstance(provider, ModulestoreCourseSettingsProvider)
+
+        other_block = mock.Mock(runtime=self.block.runtime)
+        self.assertIs(get_course_settings_provider(other_block), provider)
+        self.assertIsNot(get_course_settings_provider(mock.Mock()), provider)
+
+    def test_no_modulestore(self):
+        """Test that runtimes without modulestore (i.e. workbench) get an empty in-memory provider."""
+        del self.block.runtime.modulestore
+        provider = get_course_settings_provider(self.block)
+        self.assertIsInstance(provider, InMemoryCourseSettingsProvider)
+        self.assertEqual(provider.get_lti_passports('course-1'), ())
+
+    def test_request_cache(self):
+        """Test that edx-platform request cache is used when available."""
+        request_cache = {}
+        get_request_cache = self.make_patch(course_settings, 'get_request_cache', mock.Mock(return_value=request_cache))
+
+        provider = get_course_settings_provider(self.block)
+        self.assertIs(request_cache[COURSE_SETTINGS_SERVICE], provider)
+        get_request_cache.assert_called_once_with('dalite_xblock.course_settings')
@@ -0,0 +1,128 @@
+"""Tests for fragment cache."""
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock import fragment_cache
+from dalite_xblock.fragment_cache import (
+    DjangoFragmentCacheBackend, FragmentCache, LocalFragmentCacheBackend, cache_from_url, fragment_fingerprint
+)
+
+FRAGMENT_DICT = {
+    'content': u'<div>Question</div>', 'resources': [], 'js_init_fn': 'DaliteXBlock', 'js_init_version': 1,
+    'json_init_args': None,
+}
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Tests for FragmentCache."""
+
+    def setUp(self):
+        """Prepare cache with in-process backend."""
+        self.cache = FragmentCache(LocalFragmentCacheBackend())
+
+    def test_get_set(self):
+        """Test that fragments are stored by usage id and fingerprint."""
+        self.assertIsNone(self.cache.get("block-1", "fingerprint"))
+        self.cache.set("block-1", "fingerprint", FRAGMENT_DICT)
+        self.assertEqual(self.cache.get("block-1", "fingerprint"), FRAGMENT_DICT)
+        self.assertIsNone(self.cache.get("block-1", "other-fingerprint"))
+        self.assertIsNone(self.cache.get("block-2", "fingerprint"))
+
+    def test_invalidate(self):
+        """Test that invalidation drops fragments of a single block."""
+        self.cache.set("block-1", "fingerprint", FRAGMENT_DICT)
+        self.cache.set("block-2", "fingerprint", FRAGMENT_DICT)
+
+        self.cache.invalidate("block-1")
+
+        self.assertIsNone(self.cache.get("block-1", "fingerprint"))
+        self.assertEqual(self.cache.get("block-2", "fingerprint"), FRAGMENT_DICT)
+
+    def test_evicted_version_orphans_fragments(self):
+        """Test that fragments are not served again if block version token is evicted."""
+        backend = mock.Mock(wraps=LocalFragmentCacheBackend())
+        cache = FragmentCache(backend)
+        cache.set("block-1", "fingerprint", FRAGMENT_DICT)
+        version_key = backend.set.call_args_list[0][0][0]
+
+        backend._cache.delete(version_key)  # pylint: disable=protected-access
+
+        self.assertIsNone(cache.get("block-1", "fingerprint"))
+
+    def test_keys_are_memcached_safe(self):
+        """Test that backend keys contain no whitespace and are short, regardless of usage id."""
+        backend = mock.Mock(wraps=LocalFragmentCacheBackend())
+        FragmentCache(backend).set(u"block-v1:edX+Demo+2017 type@dalite-xblock\u0105" * 10, "f" * 40, FRAGMENT_DICT)
+        for call in backend.set.call_args_list:
+            key = call[0][0]
+            self.assertLess(len(key), 250)
+            self.assertNotIn(" ", key)
+
+
+class TestFragmentFingerprint(unittest.TestCase):
+    """Tests for fragment_fingerprint."""
+
+    def test_fingerprint(self):
+        """Test that fingerprint is stable and depends on all parts."""
+        fingerprint = fragment_fingerprint((("display_name", u"Question"),), None, "student", False)
+        self.assertEqual(fingerprint, fragment_fingerprint((("display_name", u"Question"),), None, "student", False))
+        self.assertNotEqual(fingerprint, fragment_fingerprint((("display_name", u"Other"),), None, "student", False))
+        self.assertNotEqual(fingerprint, fragment_fingerprint((("display_name", u"Question"),), None, "staff", False))
+        self.assertNotEqual(fingerprint, fragment_fingerprint((("display_name", u"Question"),), None, "student", True))
+
+
+class TestDjangoFragmentCacheBackend(unittest.TestCase):
+    """Tests for DjangoFragmentCacheBackend."""
+
+    def test_get_set(self):
+        """Test that values are stored in a Django cache."""
+        django_cache = mock.Mock()
+        with mock.patch("django.core.cache.caches", new_callable=mock.MagicMock) as caches:
+            caches.__getitem__.return_value = django_cache
+            backend = DjangoFragmentCacheBackend(alias="fragments", timeout=60)
+            backend.set("key", FRAGMENT_DICT)
+            backend.get("key")
+
+        caches.__getitem__.assert_called_with("fragments")
+        django_cache.set.assert_called_once_with("key", FRAGMENT_DICT, 60)
+        django_cache.get.assert_called_once_with("key")
+
+
+@ddt.ddt
+class TestConfiguration(unittest.TestCase):
+    """Tests for fragment cache configuration."""
+
+    @ddt.data(None, "")
+    def test_cache_from_url_disabled(self, url):
+        """Test that fragment caching is disabled by default."""
+        self.assertIsNone(cache_from_url(url))
+
+    def test_cache_from_url_memory(self):
+        """Test in-process cache configuration."""
+        self.assertIsInstance(cache_from_url("memory").backend, LocalFragmentCacheBackend)
+
+    @ddt.data(("django", "default"), ("django://fragments", "fragments"))
+    @ddt.unpack
+    def test_cache_from_url_django(self, url, alias):
+        """Test Django cache configuration."""
+        backend = cache_from_url(url).backend
+        self.assertIsInstance(backend, DjangoFragmentCacheBackend)
+        self.assertEqual(backend.alias, alias)
+
+    def test_cache_from_url_unknown(self):
+        """Test that unknown cache description raises error."""
+        with self.assertRaises(ValueError):
+            cache_from_url("redis://localhost")
+
+    def test_configure(self):
+        """Test that configured cache is returned by get_fragment_cache."""
+        previous_cache = fragment_cache.get_fragment_cache()
+        self.addCleanup(fragment_cache.configure, previous_cache)
+        cache = FragmentCache(LocalFragmentCacheBackend())
+
+        fragment_cache.configure(cache)
+        self.assertIs(fragment_cache.get_fragment_cache(), cache)
+        fragment_cache.configure(None)
+        self.assertIsNone(fragment_cache.get_fragment_cache())
@@ -0,0 +1,278 @@
+"""Tests for grade buffer."""
+import threading
+import time
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock import grade_buffer
+from dalite_xblock.block_loader import BlockLoaderConfigurationError
+from dalite_xblock.grade_buffer import GradeBuffer, GradeFlusher, InMemoryGradeQueue, PendingGrade, buffer_from_url
+from tests.utils import InstrumentationTestMixin
+
+
+class FakeBlockLoader(object):
+    """Loads a fresh mock block on every call, recording published scores."""
+
+    def __init__(self):
+        self.blocks = []
+        self.published = []
+        self.lock = threading.Lock()
+
+    def __call__(self, usage_id):
+        block = mock.Mock()
+        block.runtime.get_real_user.side_effect = lambda user_id: None if user_id == "unknown" else "real-" + user_id
+
+        def set_user_module_score(real_user, score, max_score):
+            """Record published score, and check that it's published to a block that was not saved yet."""
+            assert not block.save.called
+            with self.lock:
+                self.published.append((usage_id, real_user, score, max_score))
+
+        block.set_user_module_score.side_effect = set_user_module_score
+        with self.lock:
+            self.blocks.append(block)
+        return block
+
+
+class FakeClock(object):
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class InMemoryGradeQueueTests(unittest.TestCase):
+    """Tests for InMemoryGradeQueue."""
+
+    @staticmethod
+    def _grade(key, score, received):
+        return PendingGrade(key=key, score=score, max_score=1.0, received=received, reports=1)
+
+    def test_coalescing(self):
+        """Test that repeated grades replace pending ones, keeping their position and receive time."""
+        queue = InMemoryGradeQueue()
+        self.assertFalse(queue.put(self._grade("a", 0.1, 1)))
+        self.assertFalse(queue.put(self._grade("b", 0.2, 2)))
+        self.assertTrue(queue.put(self._grade("a", 0.3, 3)))
+
+        self.assertEqual(len(queue), 2)
+        first, second = queue.take(None, 10)
+        self.assertEqual((first.key, first.score, first.received, first.reports), ("a", 0.3, 1, 2))
+        self.assertEqual(second.key, "b")
+        self.assertEqual(len(queue), 0)
+
+    def test_take(self):
+        """Test that only grades received before given time are taken, oldest first, up to given number."""
+        queue = InMemoryGradeQueue()
+        for index in range(5):
+            queue.put(self._grade(index, 0.5, index))
+
+        self.assertEqual([grade.key for grade in queue.take(3, 2)], [0, 1])
+        self.assertEqual([grade.key for grade in queue.take(3, 2)], [2])
+        self.assertEqual(queue.take(3, 2), [])
+        self.assertEqual(len(queue), 2)
+
+
+@ddt.ddt
+class GradeBufferTests(InstrumentationTestMixin, unittest.TestCase):
+    """Tests for GradeBuffer."""
+
+    def setUp(self):
+        """Create buffer with fake clock."""
+        super(GradeBufferTests, self).setUp()
+        self.clock = FakeClock()
+        self.load_block = FakeBlockLoader()
+        self.buffer = GradeBuffer(
+            InMemoryGradeQueue(), window=5, batch_size=3, load_block=self.load_block, clock=self.clock
+        )
+
+    def test_publish_after_window(self):
+        """Test that grades are coalesced and published once they are pending for longer than window."""
+        self.buffer.add(("block", "student-1"), 0.2, 2.0)
+        self.clock.now += 3
+        self.buffer.add(("block", "student-1"), 0.6, 2.0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+        self.clock.now += 3
+        self.buffer.add(("block", "student-2"), 0.1, 2.0)
+
+        # Window is counted from the first report, and only the latest score is published
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.load_block.published, [("block", "real-student-1", 0.6, 2.0)])
+        self.assertEqual(len(self.buffer.backend), 1)
+        self.assertEqual(self.sink.count("grade_buffer.buffered"), 2)
+        self.assertEqual(self.sink.count("grade_buffer.coalesced"), 1)
+
+    def test_published_to_fresh_saved_blocks(self):
+        """Test that every grade is published to a freshly loaded block, which is then saved."""
+        self.buffer.add(("block-1", "student-1"), 0.5, 1.0)
+        self.buffer.add(("block-2", "student-1"), 0.5, 1.0)
+        self.buffer.flush(force=True)
+
+        self.assertEqual(len(self.load_block.blocks), 2)
+        for block in self.load_block.blocks:
+            block.save.assert_called_once_with()
+
+    def test_add_never_publishes(self):
+        """Test that reporting grades never publishes them, even when a full batch is pending."""
+        for index in range(3):
+            self.clock.now += 10
+            self.buffer.add(("block", "student-{}".format(index)), 0.5, 1.0)
+
+        self.assertEqual(self.load_block.published, [])
+        self.assertTrue(self.buffer.batch_ready.is_set())
+        self.assertEqual(self.buffer.flush(force=True), 3)
+        self.assertFalse(self.buffer.batch_ready.is_set())
+
+    @ddt.data((False, 0), (True, 2))
+    @ddt.unpack
+    def test_flush(self, force, expected_published):
+        """Test that flush publishes due grades, or all grades when forced."""
+        self.buffer.add(("block", "student-1"), 0.5, 1.0)
+        self.buffer.add(("block", "student-2"), 0.5, 1.0)
+
+        self.assertEqual(self.buffer.flush(force=force), expected_published)
+        self.assertEqual(len(self.load_block.published), expected_published)
+
+    def test_publish_errors(self):
+        """Test that failing and unknown users' grades do not prevent publishing other grades."""
+        self.buffer.load_block = mock.Mock(side_effect=[ValueError, self.load_block("block"), self.load_block("block")])
+        self.buffer.add(("block", "student-1"), 0.5, 1.0)
+        self.buffer.add(("block", "unknown"), 0.5, 1.0)
+        self.buffer.add(("block", "student-2"), 0.5, 1.0)
+
+        self.assertEqual(self.buffer.flush(force=True), 1)
+        self.assertEqual(self.load_block.published, [("block", "real-student-2", 0.5, 1.0)])
+        self.assertEqual(len(self.buffer.backend), 0)
+
+    def test_database_connections_recycled(self):
+        """Test that stale database connections are closed before and after every batch."""
+        calls = []
+        self.buffer.load_block = lambda usage_id: calls.append("publish") or self.load_block(usage_id)
+        for index in range(4):
+            self.buffer.add(("block", "student-{}".format(index)), 0.5, 1.0)
+
+        with mock.patch.object(grade_buffer, "close_old_connections", side_effect=lambda: calls.append("close")):
+            self.assertEqual(self.buffer.flush(force=True), 4)
+
+        self.assertEqual(calls, ["close"] + ["publish"] * 3 + ["close", "close", "publish", "close"])
+
+    def test_concurrent_reports(self):
+        """Test that concurrently reported grades are all published exactly once."""
+        def report(user_id):
+            """Report increasing scores of a user."""
+            for score in range(10):
+                self.buffer.add(("block", user_id), score, 10.0)
+
+        threads = [threading.Thread(target=report, args=("student-{}".format(index),)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.buffer.flush(force=True)
+
+        self.assertEqual(len(self.buffer.backend), 0)
+        self.assertEqual(sorted(self.load_block.published), [
+            ("block", "real-student-{}".format(index), 9, 10.0) for index in range(8)
+        ])
+
+
+class GradeFlusherTests(unittest.TestCase):
+    """Tests for GradeFlusher."""
+
+    def _start_flusher(self, buffer_, interval=None):
+        flusher = GradeFlusher(buffer_, interval)
+        flusher.start()
+        self.addCleanup(flusher.join)
+        self.addCleanup(flusher.stop)
+
+    def test_flushes_periodically(self):
+        """Test that flusher publishes due grades in background."""
+        published = threading.Event()
+        load_block = mock.Mock()
+        load_block.return_value.save.side_effect = lambda: published.set()
+        buffer_ = GradeBuffer(InMemoryGradeQueue(), window=0.01, load_block=load_block)
+        buffer_.add(("block", "student-1"), 0.5, 1.0)
+        self._start_flusher(buffer_)
+
+        self.assertTrue(published.wait(5))
+
+    def test_flushes_full_batch(self):
+        """Test that flusher publishes a full batch without waiting for the window to pass."""
+        load_block = FakeBlockLoader()
+        buffer_ = GradeBuffer(InMemoryGradeQueue(), window=3600, batch_size=2, load_block=load_block)
+        self._start_flusher(buffer_)
+        buffer_.add(("block", "student-1"), 0.5, 1.0)
+        buffer_.add(("block", "student-2"), 0.5, 1.0)
+
+        for __ in range(500):
+            if len(load_block.published) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(load_block.published), 2)
+
+
+@ddt.ddt
+class BufferFromUrlTests(unittest.TestCase):
+    """Tests for buffer_from_url and configure."""
+
+    @ddt.data(None, "")
+    def test_disabled(self, url):
+        """Test that grade buffering is disabled by default."""
+        self.assertIsNone(buffer_from_url(url))
+
+    @ddt.data(
+        ("memory", 5.0, 100),
+        ("memory://?window=1.5&batch=10", 1.5, 10),
+    )
+    @ddt.unpack
+    def test_memory(self, url, window, batch_size):
+        """Test creating in-memory grade buffer."""
+        buffer_ = buffer_from_url(url)
+        self.assertIsInstance(buffer_.backend, InMemoryGradeQueue)
+        self.assertEqual((buffer_.window, buffer_.batch_size), (window, batch_size))
+
+    def test_unknown(self):
+        """Test that unknown buffers are rejected."""
+        with self.assertRaises(ValueError):
+            buffer_from_url("redis://localhost")
+
+    def test_configure_outside_lms(self):
+        """Test that publishing grades to LMS blocks outside of LMS is rejected when buffering is configured."""
+        with self.assertRaises(BlockLoaderConfigurationError):
+            grade_buffer.configure(buffer_from_url("memory"))
+        self.assertIsNone(grade_buffer.get_grade_buffer())
+
+    def test_flusher_started_on_first_grade(self):
+        """Test that background flusher is started when the first grade is buffered, and stopped with the buffer."""
+        buffer_ = GradeBuffer(InMemoryGradeQueue(), load_block=FakeBlockLoader())
+        with mock.patch.object(grade_buffer, "GradeFlusher") as flusher_class:
+            grade_buffer.configure(buffer_)
+            self.addCleanup(grade_buffer.configure, None)
+            self.assertFalse(flusher_class.called)
+
+            buffer_.add(("block", "student-1"), 0.5, 1.0)
+            buffer_.add(("block", "student-2"), 0.5, 1.0)
+            flusher_class.assert_called_once_with(buffer_)
+            flusher_class.return_value.start.assert_called_once_with()
+
+            grade_buffer.configure(None)
+            flusher_class.return_value.stop.assert_called_once_with()
+
+    def test_configure_flushes_previous_buffer(self):
+        """Test that replacing process-wide buffer publishes its pending grades."""
+        load_block = FakeBlockLoader()
+        buffer_ = GradeBuffer(InMemoryGradeQueue(), window=3600, load_block=load_block)
+        grade_buffer.configure(buffer_)
+        self.addCleanup(grade_buffer.configure, None)
+        buffer_.add(("block", "student-1"), 0.5, 1.0)
+
+        grade_buffer.configure(None)
+
+        self.assertEqual(load_block.published, [("block", "real-student-1", 0.5, 1.0)])
+        self.assertIsNone(grade_buffer.get_grade_buffer())
@@ -0,0 +1,298 @@
+"""Tests for bulk grade synchronization."""
+import contextlib
+import json
+import threading
+import unittest
+import urlparse
+from StringIO import StringIO
+
+import ddt
+import mock
+from lti_consumer.oauth import SignedRequest
+from oauthlib.oauth1.rfc5849 import signature
+
+from xblock.field_data import DictFieldData
+from xblock.fields import ScopeIds
+
+from benchmarks.fakes import BenchmarkDaliteXBlock, FakeCourse, FakeModulestore, FakeRuntime
+from dalite_xblock.grade_sync import (
+    BlockGradePublisher, GradePublisher, GradeSynchronizer, GradeSyncReport, JsonLinesGradePublisher, SyncedGrade,
+    SyncTarget, block_description, grades_url, iter_sync_targets, parse_grade_line, sync_course_grades
+)
+from dalite_xblock.http_pool import PoolManager
+from dalite_xblock.passport_utils import DaliteLtiPassport, DalitePassportIndex, prepare_passport
+from tests.utils import LocalHTTPServer
+
+GRADES = {
+    ("a1", "q1"): ['{"user_id": "student-1", "score": 0.5}', '{"user_id": "student-2", "score": 1}', 'not json',
+                   '{"user_id": "student-3", "score": 0}'],
+    ("a1", "q2"): ['{"user_id": "student-1", "score": 0.25}'],
+}
+
+
+def verify_oauth_request(handler, root_url, secret):
+    """Verify OAuth signature of a request received by local server."""
+    authorization = handler.headers.get("Authorization", "").decode('utf-8')
+    if not authorization.startswith(u"OAuth "):
+        return False
+    query = urlparse.urlsplit(handler.path).query
+    params = signature.collect_parameters(uri_query=query, headers={"Authorization": authorization})
+    all_params = signature.collect_parameters(
+        uri_query=query, headers={"Authorization": authorization}, exclude_oauth_signature=False
+    )
+    signed_request = SignedRequest(
+        uri=root_url + handler.path.decode('utf-8'), http_method=u"GET", params=params,
+        signature=dict(all_params)[u"oauth_signature"]
+    )
+    return signature.verify_hmac_sha1(signed_request, secret)
+
+
+class FakeDalite(object):
+    """Stand-in dalite-ng grade export endpoint."""
+
+    def __init__(self, secret=u"SECRET", failing_questions=()):
+        self.secret = secret
+        self.failing_questions = failing_questions
+        self.server = LocalHTTPServer(self.handle)
+        self.concurrent = self.max_concurrent = 0
+        self._lock = threading.Lock()
+
+    def handle(self, handler):
+        """Stream grades of requested question."""
+        with self._lock:
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            if not verify_oauth_request(handler, self.server.url.decode('utf-8'), self.secret):
+                return 401, {}, "Unauthorized"
+            url = urlparse.urlsplit(handler.path)
+            query = dict(urlparse.parse_qsl(url.query))
+            if url.path != "/api/grades/":
+                return 404, {}, "Not found"
+            if query["question_id"] in self.failing_questions:
+                return 500, {}, "Error"
+            lines = GRADES.get((query["assignment_id"], query["question_id"]), [])
+            # Lines are split across chunks, to check streaming parser
+            body = "\n".join(lines) + "\n"
+            return 200, {"Content-Type": "application/x-ndjson"}, [body[:10], body[10:25], body[25:]]
+        finally:
+            with self._lock:
+                self.concurrent -= 1
+
+
+def make_targets(root_url, secret=u"SECRET", questions=("q1", "q2")):
+    """Return sync targets of blocks using local dalite."""
+    passport = DaliteLtiPassport(lti_id="dalite", dalite_root_url=root_url, lti_key="KEY", lti_secret=secret)
+    return [SyncTarget(u"block-" + question, passport, "a1", question) for question in questions]
+
+
+@ddt.ddt
+class GradeSynchronizerTests(unittest.TestCase):
+    """Tests for GradeSynchronizer against local stand-in dalite-ng."""
+
+    def setUp(self):
+        """Start local dalite-ng."""
+        self.dalite = FakeDalite(failing_questions=("q3",))
+        self.server = self.dalite.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.pool_manager = PoolManager(max_size=2)
+        self.addCleanup(self.pool_manager.close)
+        self.output = StringIO()
+
+    def _sync(self, targets, publisher=None, **kwargs):
+        synchronizer = GradeSynchronizer(
+            publisher or JsonLinesGradePublisher(self.output), pool_manager=self.pool_manager, **kwargs
+        )
+        return synchronizer.sync(targets)
+
+    def _published(self):
+        return sorted(
+            (grade["usage_id"], grade["user_id"], grade["score"])
+            for grade in (json.loads(line) for line in self.output.getvalue().splitlines())
+        )
+
+    def test_sync(self):
+        """Test that grades are streamed, parsed and published in batches."""
+        report = self._sync(make_targets(self.server.url), concurrency=2, batch_size=2)
+
+        self.assertEqual(self._published(), [
+            (u"block-q1", u"student-1", 0.5), (u"block-q1", u"student-2", 1.0), (u"block-q1", u"student-3", 0.0),
+            (u"block-q2", u"student-1", 0.25),
+        ])
+        self.assertEqual(
+            (report.targets, report.grades, report.batches, report.malformed_lines, report.errors), (2, 4, 3, 1, [])
+        )
+
+    def test_connections_reused(self):
+        """Test that requests are sent over a bounded number of keep-alive connections."""
+        targets = make_targets(self.server.url, questions=["q1", "q2"] * 10)
+
+        report = self._sync(targets, concurrency=2)
+
+        self.assertEqual(report.grades, 40)
+        self.assertLessEqual(self.dalite.max_concurrent, 2)
+        self.assertLessEqual(self.server.connections, 2)
+
+    @ddt.data(
+        (u"OTHERSECRET", ("q1",), "401"),
+        (u"SECRET", ("q3",), "500"),
+    )
+    @ddt.unpack
+    def test_fetch_errors(self, secret, questions, expected_error):
+        """Test that failing requests are reported and do not stop synchronization of other blocks."""
+        targets = make_targets(self.server.url, secret=secret, questions=questions) + make_targets(self.server.url)
+
+        report = self._sync(targets)
+
+        self.assertEqual(report.grades, 4)
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report.errors[0]["usage_id"], u"block-" + questions[0])
+        self.assertIn(expected_error, report.errors[0]["error"])
+
+    def test_unreachable(self):
+        """Test that unreachable dalite-ng is reported."""
+        self.server.__exit__(None, None, None)
+        report = self._sync(make_targets(self.server.url, questions=("q1",)))
+
+        self.assertEqual(report.grades, 0)
+        self.assertEqual([error["usage_id"] for error in report.errors], [u"block-q1"])
+
+    def test_publish_errors(self):
+        """Test that failing publisher is reported and does not stop synchronization."""
+        publisher = mock.Mock(spec=GradePublisher)
+        publisher.publish.side_effect = lambda target, grades: 1 / (target.question_id == "q2")
+
+        report = self._sync(make_targets(self.server.url), publisher=publisher)
+
+        self.assertEqual(report.grades, 1)
+        self.assertEqual([error["usage_id"] for error in report.errors], [u"block-q1"])
+
+
+@ddt.ddt
+class GradeSyncHelpersTests(unittest.TestCase):
+    """Tests for grade synchronization helpers."""
+
+    def test_iter_sync_targets(self):
+        """Test that blocks without passport or question are skipped."""
+        passport = DaliteLtiPassport(lti_id="dalite", dalite_root_url="http://dalite", lti_key="K", lti_secret="S")
+        report = GradeSyncReport()
+        blocks = [
+            {"usage_id": "b1", "lti_id": "dalite", "assignment_id": "a1", "question_id": "q1"},
+            {"usage_id": "b2", "lti_id": "missing", "assignment_id": "a1", "question_id": "q1"},
+            {"usage_id": "b3", "lti_id": "dalite", "assignment_id": "a1", "question_id": ""},
+        ]
+
+        targets = list(iter_sync_targets(blocks, DalitePassportIndex([passport]), report))
+
+        self.assertEqual(targets, [SyncTarget("b1", passport, "a1", "q1")])
+        self.assertEqual([skipped["usage_id"] for skipped in report.skipped], ["b2", "b3"])
+
+    def test_grades_url(self):
+        """Test grade export URL."""
+        passport = DaliteLtiPassport(lti_id="d", dalite_root_url="https://dalite/", lti_key="K", lti_secret="S")
+        self.assertEqual(
+            grades_url(SyncTarget("b1", passport, u"a 1", u"q&1")),
+            "https://dalite/api/grades/?assignment_id=a+1&question_id=q%261"
+        )
+
+    def test_grades_url_multiple_nodes(self):
+        """Test that grades of passports listing several dalite-ng nodes are exported by the first node."""
+        passport = DaliteLtiPassport("d", "https://node-1|https://node-2", "K", "S")
+        self.assertEqual(
+            grades_url(SyncTarget("b1", passport, u"a1", u"q1")),
+            "https://node-1/api/grades/?assignment_id=a1&question_id=q1"
+        )
+
+    def test_block_description(self):
+        """Test describing a block."""
+        block = mock.Mock(lti_id="dalite", assignment_id="a1", question_id="q1", scope_ids=mock.Mock(usage_id="b1"))
+        self.assertEqual(
+            block_description(block),
+            {"usage_id": u"b1", "lti_id": "dalite", "assignment_id": "a1", "question_id": "q1"}
+        )
+
+    @ddt.data('{"user_id": "s", "score": 1.5}', '{"user_id": "s"}', '[]', '{"user_id": "s", "score": "x"}', '{')
+    def test_parse_grade_line_invalid(self, line):
+        """Test that malformed grades are rejected."""
+        with self.assertRaises((ValueError, KeyError)):
+            parse_grade_line(line)
+
+    def test_block_grade_publisher(self):
+        """Test that grades of known users are set as module scores of a block bound for each grade, and saved."""
+        block = mock.Mock(**{"max_score.return_value": 2.0})
+        block.runtime.get_real_user.side_effect = {u"student-1": "user-1"}.get
+        bind_block = mock.Mock(return_value=block)
+        bind_blocks = mock.MagicMock()
+        bind_blocks.return_value.__enter__.return_value = bind_block
+
+        published = BlockGradePublisher(bind_blocks).publish(
+            SyncTarget("b1", None, "a1", "q1"), [SyncedGrade(u"student-1", 0.5), SyncedGrade(u"student-2", 1.0)]
+        )
+
+        self.assertEqual(published, 1)
+        bind_blocks.assert_called_once_with("b1")
+        self.assertEqual(bind_block.call_count, 2)
+        block.set_user_module_score.assert_called_once_with("user-1", 0.5, 2.0)
+        block.save.assert_called_once_with()
+
+
+class LmsRuntime(FakeRuntime):
+    """Runtime knowing real users of a few students."""
+
+    def get_real_user(self, anonymous_student_id):
+        """Return real user of known students."""
+        if anonymous_student_id in (u"student-1", u"student-2"):
+            return mock.Mock(id=int(anonymous_student_id[-1]))
+        return None
+
+
+class SyncCourseGradesTests(unittest.TestCase):
+    """Tests for sync_course_grades."""
+
+    def test_sync_course_grades(self):
+        """Test that grades of all Dalite blocks of a course are published and saved."""
+        dalite = FakeDalite()
+        server = dalite.server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        passport = prepare_passport(DaliteLtiPassport("dalite", server.url, "KEY", "SECRET"))
+        store = FakeModulestore([FakeCourse(u"course-1", ["other:key:secret", passport])])
+        block_fields = {
+            u"block-q1": {"lti_id": "dalite", "assignment_id": "a1", "question_id": "q1", "has_score": True},
+            u"block-q2": {"lti_id": "dalite", "assignment_id": "a1", "question_id": "q2", "has_score": True},
+            u"block-unset": {"lti_id": "dalite", "assignment_id": "", "question_id": ""},
+        }
+        loaded = []
+        bound = []
+
+        def load_block(usage_id):
+            """Load block with a fresh runtime and field data."""
+            runtime = LmsRuntime(store, u"course-1")
+            scope_ids = ScopeIds(None, "xblock-dalite", usage_id, usage_id)
+            block = BenchmarkDaliteXBlock(runtime, DictFieldData(dict(block_fields[usage_id])), scope_ids=scope_ids)
+            loaded.append(block)
+            return block
+
+        store.get_items = lambda course_key, qualifiers: [
+            load_block(usage_id) for usage_id in sorted(block_fields) if qualifiers == {"category": "xblock-dalite"}
+        ]
+        del loaded[:]
+
+        @contextlib.contextmanager
+        def bind_blocks(usage_id):
+            """Load block once, and bind a fresh copy of it to every student."""
+            bound.append(usage_id)
+            yield lambda: load_block(usage_id)
+
+        report = sync_course_grades(u"course-1", store=store, bind_blocks=bind_blocks)
+
+        self.assertEqual((report.targets, report.grades, report.errors), (2, 3, []))
+        self.assertEqual(report.skipped, [{"usage_id": u"block-unset", "reason": u"Assignment or question is not set"}])
+        self.assertEqual(sorted(bound), [u"block-q1", u"block-q2"])
+        saved = sorted(
+            (block.scope_ids.usage_id, block._field_data.get(block, "module_score"))  # pylint: disable=protected-access
+            for block in loaded if block.runtime.published
+        )
+        self.assertEqual(saved, [(u"block-q1", 0.5), (u"block-q1", 1.0), (u"block-q2", 0.25)])
+        events = sorted((event_type, data["value"], data["user_id"]) for block in loaded
+                        for __, event_type, data in block.runtime.published)
+        self.assertEqual(events, [("grade", 0.25, 1), ("grade", 0.5, 1), ("grade", 1.0, 2)])
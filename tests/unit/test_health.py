@@ -0,0 +1,203 @@
+"""Tests for health probing of dalite-ng nodes."""
+import socket
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock import health
+from dalite_xblock.health import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HealthProber, HealthRegistry, healthy_root_urls, prober_from_url
+)
+from tests.utils import LocalHTTPServer
+
+
+class FakeClock(object):
+    """Clock advanced manually."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def unused_url():
+    """Return URL of a local port nothing listens on."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return "http://127.0.0.1:{}".format(port)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    """Tests for CircuitBreaker."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock)
+
+    def test_opens_after_threshold(self):
+        """Test that breaker opens after consecutive failures only."""
+        self.assertFalse(self.breaker.record_failure())
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.is_closed)
+
+    def test_half_open(self):
+        """Test that open breaker lets a trial through after reset timeout, and reopens if it fails."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        self.assertFalse(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now += 30
+        self.assertTrue(self.breaker.record_success())
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+
+
+class HealthRegistryTests(unittest.TestCase):
+    """Tests for HealthRegistry."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = HealthRegistry(failure_threshold=1, reset_timeout=30, clock=self.clock)
+
+    def test_healthy_urls(self):
+        """Test that nodes that are down are left out, and unknown nodes are healthy."""
+        self.registry.record("https://a.example.com/", False)
+        self.registry.record("https://b.example.com", True)
+
+        self.assertEqual(
+            self.registry.healthy_urls(["https://a.example.com", "https://b.example.com", "https://c.example.com"]),
+            ("https://b.example.com", "https://c.example.com")
+        )
+        self.assertEqual(self.registry.as_dict()["https://a.example.com"], {"state": OPEN, "failures": 1})
+
+    def test_should_probe(self):
+        """Test that nodes that are down are probed again after reset timeout."""
+        self.registry.record("https://a.example.com", False)
+        self.assertFalse(self.registry.should_probe("https://a.example.com"))
+        self.assertTrue(self.registry.should_probe("https://b.example.com"))
+        self.clock.now += 30
+        self.assertTrue(self.registry.should_probe("https://a.example.com"))
+        self.assertFalse(self.registry.is_healthy("https://a.example.com"))
+
+
+@ddt.ddt
+class HealthProberTests(unittest.TestCase):
+    """Tests for HealthProber."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = HealthRegistry(failure_threshold=1, reset_timeout=30, clock=self.clock)
+        self.statuses = {"/": 200}
+        self.server = LocalHTTPServer(lambda handler: (self.statuses.get(handler.path, 404), {}, "OK"))
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def make_prober(self, endpoints, **kwargs):
+        """Create prober of given endpoints, with fake clock and no jitter."""
+        kwargs.setdefault("rand", lambda: 0.5)
+        prober = HealthProber(
+            self.registry, endpoints=lambda: endpoints, interval=10, concurrency=2, timeout=1, clock=self.clock,
+            **kwargs
+        )
+        self.addCleanup(prober.stop)
+        return prober
+
+    @ddt.data((200, True), (302, True), (404, True), (500, False), (503, False))
+    @ddt.unpack
+    def test_probe(self, status, healthy):
+        """Test that only 5xx responses mean a node is down."""
+        self.statuses["/health/"] = status
+        self.assertEqual(self.make_prober([], path="health/").probe(self.server.url + "/"), healthy)
+
+    def test_probe_unreachable(self):
+        """Test that nodes refusing connections are down."""
+        self.assertFalse(self.make_prober([]).probe(unused_url()))
+
+    def test_probe_due(self):
+        """Test that nodes are probed once per interval, and nodes that are down only after reset timeout."""
+        down_url = unused_url()
+        prober = self.make_prober([self.server.url, down_url])
+
+        self.assertEqual(prober.probe_due(), 10)
+        self.assertEqual(self.registry.healthy_urls([self.server.url, down_url]), (self.server.url,))
+
+        with mock.patch.object(prober, "probe", return_value=True) as probe:
+            self.clock.now += 5
+            self.assertEqual(prober.probe_due(), 5)
+            self.assertFalse(probe.called)
+
+            self.clock.now += 5
+            prober.probe_due()
+            probe.assert_called_once_with(self.server.url)
+
+            self.clock.now += 20
+            prober.probe_due()
+            probed = sorted(call[0][0] for call in probe.call_args_list[1:])
+            self.assertEqual(probed, sorted([self.server.url, down_url]))
+        self.assertTrue(self.registry.is_healthy(down_url))
+
+    def test_keep_alive(self):
+        """Test that probes reuse connections."""
+        prober = self.make_prober([self.server.url])
+        for __ in range(3):
+            prober.probe_due()
+            self.clock.now += 10
+        self.assertEqual(self.server.connections, 1)
+
+    @ddt.data((0.0, 8.0), (1.0, 12.0))
+    @ddt.unpack
+    def test_jitter(self, rand, delay):
+        """Test that probes are shifted by up to jitter of the interval."""
+        prober = self.make_prober([self.server.url], jitter=0.2, rand=lambda: rand)
+        self.assertAlmostEqual(prober.probe_due(), min(delay, 10))
+        next_probe = prober._next_probes[self.server.url]  # pylint: disable=protected-access
+        self.assertAlmostEqual(next_probe - self.clock.now, delay)
+
+    def test_background_probing(self):
+        """Test probing in background thread."""
+        down_url = unused_url()
+        prober = HealthProber(self.registry, endpoints=lambda: [down_url], interval=0.01)
+        health.configure(prober)
+        self.addCleanup(health.configure, None)
+
+        prober.join(0.2)
+        self.assertFalse(self.registry.is_healthy(down_url))
+        self.assertEqual(healthy_root_urls([down_url, self.server.url]), (self.server.url,))
+
+
+@ddt.ddt
+class ConfigureTests(unittest.TestCase):
+    """Tests for process-wide health prober configuration."""
+
+    def test_prober_from_url(self):
+        """Test creating prober from URL-like description."""
+        prober = prober_from_url("probe://?interval=5&jitter=0&concurrency=8&timeout=1&threshold=2&reset=60&path=/ok")
+
+        self.assertEqual((prober.interval, prober.jitter, prober.concurrency, prober.path), (5.0, 0.0, 8, "/ok"))
+        self.assertEqual(prober.pool_manager.timeout, 1.0)
+        self.assertEqual((prober.registry.failure_threshold, prober.registry.reset_timeout), (2, 60.0))
+        self.assertEqual(prober_from_url("probe").interval, health.DEFAULT_INTERVAL)
+
+    @ddt.data(None, "")
+    def test_disabled(self, url):
+        """Test that probing is disabled by default, and every node is healthy then."""
+        self.assertIsNone(prober_from_url(url))
+        self.assertIsNone(health.get_health_registry())
+        self.assertEqual(healthy_root_urls(["https://a.example.com"]), ("https://a.example.com",))
+
+    def test_unknown(self):
+        """Test that unknown prober descriptions are rejected."""
+        with self.assertRaises(ValueError):
+            prober_from_url("redis://localhost")
@@ -0,0 +1,133 @@
+"""Tests for instrumentation."""
+import logging
+import socket
+from unittest import TestCase
+
+import ddt
+import mock
+
+from dalite_xblock import instrumentation
+from dalite_xblock.instrumentation import (
+    InMemorySink, LoggingSink, NullSink, StatsdSink, configure, get_sink, increment, sink_from_url, timed
+)
+from tests.utils import InstrumentationTestMixin
+
+
+class TimedTests(InstrumentationTestMixin, TestCase):
+    """Tests for timed and increment helpers."""
+
+    def test_timed(self):
+        """Test that timing and count of a phase is recorded."""
+        with mock.patch.object(instrumentation.time, 'time', side_effect=[10.0, 10.25]):
+            with timed("phase", {"course_id": "course-1"}):
+                pass
+
+        counters, timings = self.sink.snapshot()
+        self.assertEqual(timings, {"phase": [250.0]})
+        self.assertEqual(counters, {("phase", ("course_id", "course-1")): 1})
+
+    def test_timed_records_failures(self):
+        """Test that phase is recorded even if it raises, and exception is propagated."""
+        with self.assertRaises(ValueError):
+            with timed("phase"):
+                raise ValueError()
+        self.assertEqual(self.sink.count("phase"), 1)
+
+    def test_lazy_tags(self):
+        """Test that tags can be computed lazily."""
+        tags = mock.Mock(return_value={"lti_id": "dalite"})
+        with timed("phase", tags):
+            self.assertFalse(tags.called)
+        tags.assert_called_once_with()
+        increment("counter", tags)
+        self.assertEqual(self.sink.snapshot()[0][("counter", ("lti_id", "dalite"))], 1)
+
+    def test_disabled(self):
+        """Test that nothing is computed or recorded when instrumentation is disabled."""
+        configure(None)
+        self.assertIsInstance(get_sink(), NullSink)
+        tags = mock.Mock()
+
+        with timed("phase", tags):
+            pass
+        increment("counter", tags)
+
+        self.assertFalse(tags.called)
+        self.assertEqual(self.sink.snapshot(), ({}, {}))
+
+
+@ddt.ddt
+class SinkTests(TestCase):
+    """Tests for sink implementations."""
+
+    def test_in_memory_sink(self):
+        """Test counting in in-memory sink."""
+        sink = InMemorySink()
+        sink.timing("phase", 1.0, {"a": "1"})
+        sink.timing("phase", 2.0, {"a": "2"})
+        sink.increment("counter", {}, 5)
+        self.assertEqual(sink.count("phase"), 2)
+        self.assertEqual(sink.count("counter"), 5)
+        sink.reset()
+        self.assertEqual(sink.snapshot(), ({}, {}))
+
+    def test_in_memory_sink_bounded(self):
+        """Test that in-memory sink keeps only the most recent timings, but counts all of them."""
+        sink = InMemorySink(max_timings=3)
+        for duration in range(10):
+            sink.timing("phase", float(duration), {})
+        self.assertEqual(sink.snapshot()[1], {"phase": [7.0, 8.0, 9.0]})
+        self.assertEqual(sink.count("phase"), 10)
+
+    def test_logging_sink(self):
+        """Test logging sink."""
+        metrics_logger = mock.Mock(spec=logging.Logger)
+        sink = LoggingSink(metrics_logger, logging.DEBUG)
+        sink.timing("phase", 1.5, {"a": "1"})
+        metrics_logger.log.assert_called_once_with(logging.DEBUG, u"%s took %.3f ms %s", "phase", 1.5, {"a": "1"})
+
+    @ddt.data(
+        ("timing", ("phase", 1.5, {}), "prefix.phase:1.500|ms"),
+        (
+            "timing", ("phase", 2, {"course_id": u"course-v1:Org+C|1", "lti_id": "dalite"}),
+            "prefix.phase:2.000|ms|#course_id:course-v1_Org+C_1,lti_id:dalite"
+        ),
+        ("increment", ("counter", {"lti_id": "dalite"}), "prefix.counter:1|c|#lti_id:dalite"),
+    )
+    @ddt.unpack
+    def test_statsd_sink(self, method, args, expected_packet):
+        """Test statsd packet format."""
+        with mock.patch.object(instrumentation.socket, 'socket') as socket_class:
+            sink = StatsdSink("localhost", 1234, "prefix")
+            getattr(sink, method)(*args)
+        socket_class.return_value.sendto.assert_called_once_with(expected_packet, ("localhost", 1234))
+
+    def test_statsd_sink_ignores_errors(self):
+        """Test that network errors never propagate from statsd sink."""
+        with mock.patch.object(instrumentation.socket, 'socket') as socket_class:
+            socket_class.return_value.sendto.side_effect = socket.error()
+            StatsdSink().increment("counter", {})
+
+    @ddt.data(
+        (None, NullSink),
+        ("", NullSink),
+        ("logging", LoggingSink),
+        ("memory", InMemorySink),
+        ("statsd://", StatsdSink),
+        ("statsd://collector:9125/dalite", StatsdSink),
+    )
+    @ddt.unpack
+    def test_sink_from_url(self, url, expected_class):
+        """Test creating sinks from configuration strings."""
+        self.assertIsInstance(sink_from_url(url), expected_class)
+
+    def test_sink_from_url_statsd_options(self):
+        """Test statsd sink configuration."""
+        sink = sink_from_url("statsd://collector:9125/dalite")
+        self.assertEqual(sink.address, ("collector", 9125))
+        self.assertEqual(sink.prefix, "dalite.")
+
+    def test_sink_from_url_unknown(self):
+        """Test that unknown sinks are reported."""
+        with self.assertRaises(ValueError):
+            sink_from_url("carrier-pigeon://")
@@ -0,0 +1,212 @@
+"""Tests for Dalite block inventory."""
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import ddt
+import mock
+
+from dalite_xblock.inventory import (
+    NO_QUESTION, BlockInventory, has_problems, inventory_course, inventory_export, inventory_exports, iter_olx_blocks,
+    olx_usage_id, read_export_blocks
+)
+from dalite_xblock.passport_utils import DaliteLtiPassport, DalitePassportIndex, prepare_passport
+from tests.utils import write_course_export
+
+PASSPORTS = [
+    prepare_passport(DaliteLtiPassport("dalite-1", "https://dalite.example.com", "KEY", "SECRET")),
+    prepare_passport(DaliteLtiPassport("dalite-2", "https://other.example.com", "KEY", "SECRET")),
+]
+
+OLX_FILES = {
+    "vertical/v1.xml": '<vertical><xblock-dalite url_name="d1"/><html url_name="h1"/></vertical>',
+    "xblock-dalite/d1.xml": '<xblock-dalite xblock-family="xblock.v1" lti_id="dalite-1" assignment_id="a1" '
+                            'question_id="q1"/>',
+    "vertical/v2.xml": (
+        '<vertical>'
+        '<xblock-dalite url_name="d2" lti_id="dalite-2" assignment_id="a1" question_id="q1"/>'
+        '<xblock-dalite url_name="d3" lti_id="missing" assignment_id="a1" question_id="q2"/>'
+        '<xblock-dalite url_name="d4" assignment_id="a1" question_id="q3"/>'
+        '<xblock-dalite url_name="d5" lti_id=" dalite-2 " assignment_id="a1"/>'
+        '</vertical>'
+    ),
+    "drafts/vertical/v3.xml": '<vertical><xblock-dalite url_name="d6" lti_id="missing"/></vertical>',
+    "static/notes.xml": '<notes><xblock-dalite/></notes>',
+}
+
+
+def write_olx_export(root, name, files=None):
+    """Write course export with Dalite blocks."""
+    path = write_course_export(root, name, PASSPORTS)
+    for file_name, content in (files or OLX_FILES).items():
+        file_path = os.path.join(path, file_name)
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, "w") as olx_file:
+            olx_file.write(content)
+    return path
+
+
+def usage_id(url_name, course="course"):
+    """Return usage id of a block of a test course."""
+    return "block-v1:Org+{}+2017+type@xblock-dalite+block@{}".format(course, url_name)
+
+
+@ddt.ddt
+class BlockInventoryTests(unittest.TestCase):
+    """Tests for BlockInventory."""
+
+    def setUp(self):
+        """Build passport index with a duplicate passport."""
+        self.index = DalitePassportIndex.from_passport_strings(PASSPORTS + PASSPORTS[:1])
+
+    def test_report(self):
+        """Test that unready blocks, dangling LTI IDs and duplicate questions are reported."""
+        inventory = BlockInventory(self.index).extend([
+            {"usage_id": "b1", "lti_id": "dalite-1", "assignment_id": "a1", "question_id": "q1"},
+            {"usage_id": "b2", "lti_id": "dalite-2", "assignment_id": "a1", "question_id": "q1"},
+            {"usage_id": "b3", "lti_id": "missing", "assignment_id": "a1", "question_id": "q2"},
+            {"usage_id": "b4", "lti_id": "missing", "assignment_id": "", "question_id": "q3"},
+            {"usage_id": "b5", "lti_id": None, "assignment_id": None, "question_id": None},
+            {"usage_id": "b6", "lti_id": "dalite-1", "assignment_id": "a1", "question_id": None},
+        ])
+
+        report = inventory.as_dict()
+
+        self.assertEqual((report["blocks"], report["ready"]), (6, 2))
+        self.assertEqual(report["unready"], [
+            {"usage_id": "b3", "lti_id": "missing", "reason": u"No LTI passport for LTI ID missing"},
+            {"usage_id": "b4", "lti_id": "missing", "reason": u"No LTI passport for LTI ID missing"},
+            {"usage_id": "b5", "lti_id": "", "reason": u"LTI passport is not selected"},
+            {"usage_id": "b6", "lti_id": "dalite-1", "reason": NO_QUESTION},
+        ])
+        self.assertEqual(report["dangling_lti_ids"], [{"lti_id": "missing", "usage_ids": ["b3", "b4"]}])
+        self.assertEqual(
+            report["duplicate_questions"], [{"assignment_id": "a1", "question_id": "q1", "usage_ids": ["b1", "b2"]}]
+        )
+        self.assertEqual(report["duplicate_passports"], ["dalite-1"])
+        self.assertNotIn("block_statuses", report)
+        self.assertTrue(has_problems(report))
+
+    def test_include_blocks(self):
+        """Test listing status of every block."""
+        inventory = BlockInventory(self.index, include_blocks=True)
+        inventory.add({"usage_id": "b1", "lti_id": "dalite-2", "assignment_id": "a1", "question_id": "q1"})
+
+        self.assertEqual(inventory.as_dict()["block_statuses"], [{
+            "usage_id": "b1", "lti_id": "dalite-2", "dalite_urls": ["https://other.example.com"],
+            "assignment_id": "a1", "question_id": "q1", "is_lti_ready": True,
+        }])
+
+    def test_no_problems(self):
+        """Test report of a course without problems."""
+        report = BlockInventory(DalitePassportIndex.from_passport_strings(PASSPORTS)).as_dict()
+        self.assertFalse(has_problems(report))
+
+    def test_inventory_course(self):
+        """Test building inventory of a course in the modulestore."""
+        block = mock.Mock(lti_id="dalite-1", assignment_id="a1", question_id="q1")
+        block.scope_ids.usage_id = "block-v1:course"
+        modulestore = mock.Mock()
+        modulestore.get_course.return_value.lti_passports = PASSPORTS
+        modulestore.get_items.return_value = [block]
+
+        report = inventory_course(modulestore, "course-v1:course")
+
+        self.assertEqual((report["blocks"], report["ready"]), (1, 1))
+        modulestore.get_items.assert_called_once_with("course-v1:course", qualifiers={"category": "xblock-dalite"})
+
+    @ddt.data(
+        (u"course-v1:Org+C+Run", "d1", u"block-v1:Org+C+Run+type@xblock-dalite+block@d1"),
+        (None, "d1", "d1"),
+    )
+    @ddt.unpack
+    def test_olx_usage_id(self, course_id, url_name, expected):
+        """Test usage ids of exported blocks."""
+        self.assertEqual(olx_usage_id(course_id, url_name), expected)
+
+    def test_iter_olx_blocks(self):
+        """Test that only Dalite blocks with url_name are read."""
+        blocks = list(iter_olx_blocks(StringIO(OLX_FILES["vertical/v2.xml"])))
+        self.assertEqual([block["url_name"] for block in blocks], ["d2", "d3", "d4", "d5"])
+        self.assertEqual(list(iter_olx_blocks(StringIO('<xblock-dalite lti_id="x"/>'), "d1"))[0]["url_name"], "d1")
+
+
+class ExportInventoryTests(unittest.TestCase):
+    """Tests for inventory of course exports."""
+
+    def setUp(self):
+        """Create directory with course exports."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_read_export_blocks(self):
+        """Test that pointers and definitions are merged, and drafts are skipped."""
+        course_id, passports, blocks = read_export_blocks(write_olx_export(self.root, "course"))
+
+        self.assertEqual(course_id, u"course-v1:Org+course+2017")
+        self.assertEqual(passports, PASSPORTS)
+        self.assertEqual(
+            sorted(block["usage_id"] for block in blocks), [usage_id("d{}".format(index)) for index in range(1, 6)]
+        )
+        by_id = {block["usage_id"]: block for block in blocks}
+        self.assertEqual(
+            by_id[usage_id("d1")],
+            {"usage_id": usage_id("d1"), "lti_id": "dalite-1", "assignment_id": "a1", "question_id": "q1"}
+        )
+
+    def test_inventory_export_archive(self):
+        """Test inventory of an export archive."""
+        path = write_olx_export(self.root, "course")
+        archive_path = os.path.join(self.root, "course.tar.gz")
+        with tarfile.open(archive_path, "w:gz") as archive:
+            archive.add(path, arcname="course")
+
+        report = inventory_export(archive_path)
+
+        self.assertEqual((report["blocks"], report["ready"]), (5, 2))
+        self.assertEqual(
+            [block["usage_id"] for block in report["unready"]], [usage_id("d3"), usage_id("d4"), usage_id("d5")]
+        )
+        self.assertEqual(report["dangling_lti_ids"], [{"lti_id": "missing", "usage_ids": [usage_id("d3")]}])
+        self.assertEqual(report["duplicate_questions"][0]["usage_ids"], [usage_id("d1"), usage_id("d2")])
+
+    def test_inventory_exports(self):
+        """Test inventory of all exports, including broken ones."""
+        write_olx_export(self.root, "course")
+        write_olx_export(self.root, "other", files={"vertical/v1.xml": "<vertical><xblock-dalite"})
+
+        reports = {
+            os.path.relpath(report["export"], self.root): report
+            for report in inventory_exports(self.root, processes=2, include_blocks=True)
+        }
+
+        self.assertEqual(len(reports["course"]["block_statuses"]), 5)
+        self.assertIn("error", reports["other"])
+
+    def test_large_course(self):
+        """Test that a course with many blocks is scanned."""
+        blocks = "".join(
+            '<xblock-dalite url_name="d{0}" lti_id="dalite-1" assignment_id="a" question_id="q{0}"/>'.format(index)
+            for index in range(20000)
+        )
+        write_olx_export(self.root, "course", files={"vertical/v1.xml": "<vertical>{}</vertical>".format(blocks)})
+
+        report = list(inventory_exports(self.root, processes=1))[0]
+
+        self.assertEqual((report["blocks"], report["ready"]), (20000, 20000))
+        self.assertFalse(has_problems(report))
+
+    def test_no_xblock_imports(self):
+        """Test that exports can be scanned on vanilla python, without XBlock, lti_consumer or Django."""
+        loaded = subprocess.check_output([
+            sys.executable, "-c",
+            "import sys, dalite_xblock.inventory; "
+            "print(sorted(name for name in ('xblock', 'lti_consumer', 'django') if name in sys.modules))"
+        ], cwd=os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+        self.assertEqual(loaded.strip(), "[]")
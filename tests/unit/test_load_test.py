@@ -0,0 +1,65 @@
+"""Tests for the load test harness."""
+import urllib
+import unittest
+
+import mock
+
+from benchmarks.fake_dalite import launch_body, verify_launch
+from benchmarks.load_test import LoadReport, parse_launch_form, run_load_test
+from dalite_xblock.oauth import PassportSigner
+
+LAUNCH_URL = u"http://127.0.0.1:8000/lti/"
+
+
+class LoadTestTests(unittest.TestCase):
+    """Tests for the load test harness."""
+
+    def test_verify_launch(self):
+        """Test that launches signed with a wrong secret are rejected."""
+        params = {u"user_id": u"student", u"lis_result_sourcedid": u"course:block:student"}
+        params.update(PassportSigner(u"KEY", u"SECRET").sign_launch(LAUNCH_URL, params))
+        body = launch_body(params)
+
+        self.assertEqual(verify_launch(LAUNCH_URL, body, {u"KEY": u"SECRET"})[u"user_id"], u"student")
+        self.assertIsNone(verify_launch(LAUNCH_URL, body, {u"KEY": u"OTHER"}))
+        self.assertIsNone(verify_launch(LAUNCH_URL, body, {u"OTHER": u"SECRET"}))
+        self.assertIsNone(verify_launch(LAUNCH_URL + u"?x=1", body, {u"KEY": u"SECRET"}))
+
+    def test_parse_launch_form(self):
+        """Test extracting launch form."""
+        html = u'<form action="{}"><input name="a" value="1 &amp; 2"/><input type="submit"/></form>'.format(
+            LAUNCH_URL
+        )
+        self.assertEqual(parse_launch_form(html), (LAUNCH_URL, {u"a": u"1 & 2"}))
+        with self.assertRaises(ValueError):
+            parse_launch_form(u"<html/>")
+
+    def test_report(self):
+        """Test report statistics."""
+        report = LoadReport(clock=mock.Mock(side_effect=[0.0, 2.0]))
+        report.start()
+        for latency in (0.001, 0.002, 0.003):
+            report.record("student_view", latency)
+        report.record("student_view", 0.004, "Boom")
+        report.finish()
+
+        stats = report.as_dict()["stages"]["student_view"]
+
+        self.assertEqual((stats["requests"], stats["errors"], stats["error_rate"]), (4, 1, 0.25))
+        self.assertEqual(stats["requests_per_sec"], 2.0)
+        self.assertAlmostEqual(stats["p50_ms"], 3.0)
+        self.assertEqual(stats["error_messages"], {"Boom": 1})
+        self.assertEqual(list(report.as_dict()["stages"]), ["student_view"])
+
+    def test_run_load_test(self):
+        """Test full round trip of launches and grade passback."""
+        report = run_load_test(students=4, concurrency=2, launches=2, courses=2, dalite_passports=2, blocks=3)
+
+        self.assertEqual(report["rejected_launches"], 0)
+        self.assertEqual(report["grades_published"], 8)
+        for stage, stats in report["stages"].items():
+            self.assertEqual((stage, stats["requests"], stats["errors"]), (stage, 8, 0))
+
+    def test_launch_body(self):
+        """Test that launch parameters are form encoded as UTF-8."""
+        self.assertEqual(urllib.unquote_plus(launch_body({u"a": u"\u00e9"})), "a=\xc3\xa9")
@@ -0,0 +1,171 @@
+"""Tests for Dalite XBlock LTI launch parameters."""
+import datetime
+from unittest import TestCase
+
+import mock
+from lti_consumer.lti import LtiConsumer
+from lti_consumer.oauth import SignedRequest
+from oauthlib.oauth1.rfc5849 import signature
+from xblock.field_data import DictFieldData
+
+from dalite_xblock import instrumentation, passport_cache
+from dalite_xblock.dalite_xblock import DaliteXBlock
+from dalite_xblock.lti import DaliteLtiConsumer
+from dalite_xblock.passport_cache import LruTtlCache
+
+LTI_PASSPORTS = [
+    "dalite-ng-1:dalite-xblock:aHR0cDovL2ZpcnN0LnVybDo4MDgwO0tFWTtTRUNSRVQ=",
+    "dalite-ng-2:dalite-xblock:aHR0cDovL290aGVyLnVybDtPVEhFUktFWTtPVEhFUlNFQ1JFVA==",
+]
+# Differ on every launch
+OAUTH_VOLATILE_PARAMETERS = ('oauth_nonce', 'oauth_timestamp', 'oauth_signature')
+
+
+class LmsDaliteXBlock(DaliteXBlock):
+    """DaliteXBlock with attributes edx-platform mixins provide."""
+
+    due = datetime.datetime(2017, 1, 1, 12, 30)
+    graceperiod = datetime.timedelta(hours=1)
+    location = mock.Mock(**{"html_id.return_value": "dalite-1"})
+
+
+class DaliteLtiConsumerTests(TestCase):
+    """Tests for DaliteLtiConsumer."""
+
+    def setUp(self):
+        """Create block with mock LMS runtime."""
+        passport_cache.PASSPORT_CACHE.clear()
+        self.payload_cache = LruTtlCache()
+        self.field_data = DictFieldData({
+            'lti_id': 'dalite-ng-1', 'assignment_id': 'a1', 'question_id': '1', 'has_score': True,
+            'custom_parameters': ['assignment_id=a1', 'question_id=1'],
+        })
+        self.runtime = self._make_runtime()
+        self.block = self._make_block(self.runtime)
+
+    @staticmethod
+    def _make_runtime(anonymous_student_id="student-1", user_role="student", hostname="lms.example.com"):
+        runtime = mock.Mock(course_id="course-1", hostname=hostname, get_real_user=None)
+        runtime.service.return_value = None
+        runtime.anonymous_student_id = anonymous_student_id
+        runtime.get_user_role.return_value = user_role
+        runtime.handler_url.side_effect = lambda block, handler, **kwargs: "https://{}/{}/?".format(hostname, handler)
+        course = runtime.modulestore.get_course.return_value
+        course.lti_passports = LTI_PASSPORTS
+        course.display_name_with_default = u"Course"
+        course.display_org_with_default = u"Org"
+        return runtime
+
+    def _make_block(self, runtime):
+        return LmsDaliteXBlock(runtime, self.field_data, scope_ids=mock.Mock(usage_id="block-1"))
+
+    def _get_parameters(self, lti_consumer):
+        parameters = lti_consumer.get_signed_lti_parameters()
+        for name in OAUTH_VOLATILE_PARAMETERS:
+            self.assertTrue(parameters.pop(name))
+        return parameters
+
+    def test_same_parameters_as_lti_consumer(self):
+        """Test that launch parameters are the same as LtiConsumer sends."""
+        with self.block.add_extra_custom_params([u'action=launch-admin']):
+            expected_parameters = self._get_parameters(LtiConsumer(self.block))
+            parameters = self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+
+        self.assertEqual(parameters, expected_parameters)
+        self.assertEqual(parameters[u'custom_action'], u'launch-admin')
+        self.assertEqual(parameters[u'custom_assignment_id'], u'a1')
+        self.assertEqual(parameters[u'lis_outcome_service_url'], u'https://lms.example.com/outcome_service_handler')
+
+    def test_static_parameters_cached(self):
+        """Test that static parameters are built once and reused in launches of other users."""
+        self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+        other_user_block = self._make_block(self._make_runtime(anonymous_student_id="student-2", user_role="staff"))
+
+        parameters = self._get_parameters(DaliteLtiConsumer(other_user_block, self.payload_cache))
+
+        # Only course settings are loaded, not the whole course
+        other_user_block.runtime.modulestore.get_course.assert_called_once_with(u"course-1", depth=0)
+        self.assertEqual(len(self.payload_cache), 1)
+        self.assertEqual(parameters[u'user_id'], u'student-2')
+        self.assertEqual(parameters[u'roles'], u'Administrator')
+        self.assertTrue(parameters[u'lis_result_sourcedid'].endswith(u':student-2'))
+        self.assertEqual(parameters[u'context_title'], u'Course')
+
+    def test_site_parameters(self):
+        """Test that blocks served for different sites get their own resource link id and outcome service URL."""
+        self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+        other_site_block = self._make_block(self._make_runtime(hostname="other.example.com"))
+
+        expected_parameters = self._get_parameters(LtiConsumer(other_site_block))
+        parameters = self._get_parameters(DaliteLtiConsumer(other_site_block, self.payload_cache))
+
+        self.assertEqual(len(self.payload_cache), 1)
+        self.assertEqual(parameters, expected_parameters)
+        self.assertEqual(parameters[u'resource_link_id'], u'other.example.com-dalite-1')
+        self.assertEqual(parameters[u'lis_outcome_service_url'], u'https://other.example.com/outcome_service_handler')
+
+    def test_static_parameters_invalidated(self):
+        """Test that changing block fields or selected passport rebuilds static parameters."""
+        self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+
+        block = self._make_block(self._make_runtime())
+        block.question_id = '2'
+        block.custom_parameters = ['assignment_id=a1', 'question_id=2']
+        parameters = self._get_parameters(DaliteLtiConsumer(block, self.payload_cache))
+        self.assertEqual(parameters[u'custom_question_id'], u'2')
+
+        block = self._make_block(self._make_runtime())
+        block.lti_id = 'dalite-ng-2'
+        self._get_parameters(DaliteLtiConsumer(block, self.payload_cache))
+
+        self.assertEqual(len(self.payload_cache), 3)
+
+    def test_signature(self):
+        """Test that launch is signed with the selected passport."""
+        parameters = DaliteLtiConsumer(self.block, self.payload_cache).get_signed_lti_parameters()
+
+        oauth_signature = parameters.pop(u'oauth_signature')
+        signed_request = SignedRequest(
+            uri=u"http://first.url:8080/lti/", http_method=u"POST",
+            params=[(name, unicode(value)) for name, value in parameters.items()],
+            signature=oauth_signature
+        )
+        self.assertEqual(parameters[u'oauth_consumer_key'], u'KEY')
+        self.assertTrue(signature.verify_hmac_sha1(signed_request, u"SECRET"))
+        self.assertFalse(signature.verify_hmac_sha1(signed_request, u"OTHERSECRET"))
+
+    def test_signature_launch_url(self):
+        """Test that launch is signed for given launch URL."""
+        parameters = DaliteLtiConsumer(self.block, self.payload_cache).get_signed_lti_parameters(
+            u"http://second.url/lti/"
+        )
+
+        signed_request = SignedRequest(
+            uri=u"http://second.url/lti/", http_method=u"POST",
+            params=[(name, unicode(value)) for name, value in parameters.items() if name != u'oauth_signature'],
+            signature=parameters[u'oauth_signature']
+        )
+        self.assertTrue(signature.verify_hmac_sha1(signed_request, u"SECRET"))
+
+    def test_timed(self):
+        """Test that building launch parameters and signing them are timed separately."""
+        sink = instrumentation.InMemorySink()
+        self.addCleanup(instrumentation.configure, instrumentation.get_sink())
+        instrumentation.configure(sink)
+
+        self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+
+        counters, __ = sink.snapshot()
+        tags = (("course_id", "course-1"), ("lti_id", "dalite-ng-1"))
+        self.assertEqual(counters[("lti.launch.parameters",) + tags], 1)
+        self.assertEqual(counters[("lti.sign",) + tags], 1)
+
+    def test_parameter_processor_errors_ignored(self):
+        """Test that failing parameter processors do not break launches."""
+        def broken_processor(block):
+            """Fail."""
+            raise ValueError(block)
+
+        with mock.patch.object(LmsDaliteXBlock, "get_parameter_processors", return_value=[broken_processor]):
+            parameters = self._get_parameters(DaliteLtiConsumer(self.block, self.payload_cache))
+        self.assertEqual(parameters[u'user_id'], u'student-1')
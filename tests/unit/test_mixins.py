@@ -3,12 +3,33 @@ from unittest import TestCase
 
 import ddt
 import mock
+from xblock.core import XBlock
+from xblock.field_data import DictFieldData
+from xblock.fields import String
 from xblock.runtime import Runtime
+from xblockutils.studio_editable import StudioEditableXBlockMixin
 
-from dalite_xblock.mixins import CourseAwareXBlockMixin
+from dalite_xblock.mixins import CourseAwareXBlockMixin, StudioFieldValuesProviderMixin
 from tests.utils import TestWithPatchesMixin
 
 
+class StudioFieldValuesProviderGuineaPig(StudioFieldValuesProviderMixin, StudioEditableXBlockMixin, XBlock):
+    """Dummy XBlock to test StudioFieldValuesProviderMixin."""
+
+    field = String(values=[10, 15, 20])
+    provided_field = String()
+    other_field = String()
+
+    field_values_providers = {
+        "field": "field_values",
+        "provided_field": "field_values",
+    }
+
+    def field_values(self):
+        """Return values bound to this block instance."""
+        return self.values
+
+
 @ddt.ddt
 class TestCourseAwareXBlockMixin(TestCase, TestWithPatchesMixin):
     """Tests for CourseAwareXBlockMixin."""
@@ -43,3 +64,50 @@ class TestCourseAwareXBlockMixin(TestCase, TestWithPatchesMixin):
         """Test that course_id property returns 'all' if runtime does not have course_id attribute."""
         del self.runtime_mock.course_id
         self.assertEqual(self.block.course_id, unicode('all'))
+
+
+@ddt.ddt
+class TestStudioFieldValuesProviderMixin(TestCase):
+    """Tests for StudioFieldValuesProviderMixin."""
+
+    def make_block(self, values):
+        """Create guinea pig block returning `values` from its values provider."""
+        runtime_mock = mock.Mock()
+        runtime_mock.service.return_value = None
+        block = StudioFieldValuesProviderGuineaPig(runtime_mock, field_data=DictFieldData({}), scope_ids=mock.Mock())
+        block.values = values
+        return block
+
+    @ddt.data(
+        ([], []),
+        ([1, 2], [{"display_name": u"1", "value": 1}, {"display_name": u"2", "value": 2}]),
+        ([{"display_name": "One", "value": 1}], [{"display_name": "One", "value": 1}]),
+    )
+    @ddt.unpack
+    def test_provided_values(self, values, expected_values):
+        """Test that values are obtained from the block instance."""
+        block = self.make_block(values)
+        for field_name in ('field', 'provided_field'):
+            info = block._make_field_info(field_name, block.fields[field_name])  # pylint: disable=protected-access
+            self.assertEqual(info['values'], expected_values)
+            self.assertTrue(info['has_values'])
+
+    def test_field_without_provider(self):
+        """Test that fields without values provider are left alone."""
+        block = self.make_block([1, 2])
+        info = block._make_field_info('other_field', block.fields['other_field'])  # pylint: disable=protected-access
+        self.assertFalse(info['has_values'])
+        self.assertNotIn('values', info)
+
+    def test_blocks_do_not_share_values(self):
+        """Test that each block gets its own values, and field descriptor is not modified."""
+        block_1, block_2 = self.make_block(['a']), self.make_block(['b'])
+        field = StudioFieldValuesProviderGuineaPig.fields['provided_field']
+
+        info_1 = block_1._make_field_info('provided_field', field)  # pylint: disable=protected-access
+        info_2 = block_2._make_field_info('provided_field', field)  # pylint: disable=protected-access
+
+        self.assertEqual(info_1['values'], [{"display_name": u"a", "value": "a"}])
+        self.assertEqual(info_2['values'], [{"display_name": u"b", "value": "b"}])
+        self.assertIsNone(field.values)
+        self.assertEqual(StudioFieldValuesProviderGuineaPig.fields['field'].values, [10, 15, 20])
@@ -0,0 +1,152 @@
+"""Tests for OAuth nonce stores."""
+import threading
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock.nonce_store import DjangoNonceStore, LocalNonceStore, nonce_store_from_url
+
+
+class FakeClock(object):
+    """Manually advanced clock."""
+
+    def __init__(self, now=100000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@ddt.ddt
+class LocalNonceStoreTests(unittest.TestCase):
+    """Tests for LocalNonceStore."""
+
+    def setUp(self):
+        """Create store with fake clock."""
+        self.clock = FakeClock()
+        self.store = LocalNonceStore(window=60, bucket_seconds=10, max_entries=100, clock=self.clock)
+
+    def test_replay_rejected(self):
+        """Test that nonces are accepted once per key and timestamp."""
+        now = int(self.clock.now)
+        self.assertTrue(self.store.check_and_add(u"KEY", now, u"n1"))
+        self.assertFalse(self.store.check_and_add(u"KEY", now, u"n1"))
+        self.assertTrue(self.store.check_and_add(u"OTHER", now, u"n1"))
+        self.assertTrue(self.store.check_and_add(u"KEY", now, u"n2"))
+        self.assertEqual(len(self.store), 3)
+
+    @ddt.data(-61, 61, -1000)
+    def test_timestamp_out_of_window(self, offset):
+        """Test that requests with timestamps too far from current time are rejected."""
+        self.assertFalse(self.store.check_and_add(u"KEY", int(self.clock.now) + offset, u"n1"))
+        self.assertEqual(len(self.store), 0)
+
+    def test_expired_buckets_reused(self):
+        """Test that nonces are forgotten a bucket at a time once they fall out of the window."""
+        start = int(self.clock.now)
+        for second in range(0, 600, 5):
+            self.clock.now = start + second
+            self.assertTrue(self.store.check_and_add(u"KEY", start + second, u"n"))
+            self.assertTrue(self.store.check_and_add(u"KEY", start + second - 60, u"n2"))
+
+        # Only nonces with timestamps within the window (and at most one extra bucket each side) are kept
+        self.assertLessEqual(len(self.store), 2 * (120 / 10 + 2) * 2)
+
+    def test_max_entries(self):
+        """Test that full store drops oldest bucket and rejects timestamps that might have been dropped."""
+        now = int(self.clock.now)
+        for index in range(50):
+            self.assertTrue(self.store.check_and_add(u"KEY", now - 60, u"old-{}".format(index)))
+        for index in range(50):
+            self.assertTrue(self.store.check_and_add(u"KEY", now, u"new-{}".format(index)))
+
+        self.assertTrue(self.store.check_and_add(u"KEY", now, u"newest"))
+
+        self.assertEqual(len(self.store), 51)
+        # Evicted nonces can't be replayed
+        self.assertFalse(self.store.check_and_add(u"KEY", now - 60, u"old-1"))
+        self.assertFalse(self.store.check_and_add(u"KEY", now - 60, u"unseen"))
+        self.assertFalse(self.store.check_and_add(u"KEY", now, u"new-1"))
+
+    def test_max_entries_current_bucket(self):
+        """Test that a full bucket being written is never evicted - only requests that don't fit are rejected."""
+        store = LocalNonceStore(window=60, bucket_seconds=10, max_entries=5, clock=self.clock)
+        now = int(self.clock.now) // 10 * 10
+        self.clock.now = now
+        for index in range(5):
+            self.assertTrue(store.check_and_add(u"KEY", now, u"n{}".format(index)))
+
+        self.assertFalse(store.check_and_add(u"KEY", now, u"n5"))
+        self.assertFalse(store.check_and_add(u"KEY", now, u"n0"))
+
+        # Next buckets evict the full one, and callbacks are accepted again
+        self.clock.now = now + 10
+        for index in range(3):
+            self.assertTrue(store.check_and_add(u"KEY", now + 10, u"later-{}".format(index)))
+        self.assertFalse(store.check_and_add(u"KEY", now + 5, u"evicted"))
+        self.assertEqual(len(store), 3)
+
+    def test_concurrent_replays(self):
+        """Test that only one of concurrent requests with the same nonce is accepted."""
+        now = int(self.clock.now)
+        accepted = []
+
+        def check():
+            """Try to use the same nonce."""
+            if self.store.check_and_add(u"KEY", now, u"n1"):
+                accepted.append(True)
+
+        threads = [threading.Thread(target=check) for __ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(accepted, [True])
+
+
+class DjangoNonceStoreTests(unittest.TestCase):
+    """Tests for DjangoNonceStore."""
+
+    def test_check_and_add(self):
+        """Test that nonces are added to Django cache atomically, with timeout covering the window."""
+        clock = FakeClock()
+        store = DjangoNonceStore(alias="nonces", window=60, clock=clock)
+        cache = mock.Mock()
+        cache.add.side_effect = [True, False]
+        with mock.patch("django.core.cache.caches", {"nonces": cache}):
+            self.assertTrue(store.check_and_add(u"KEY", int(clock.now), u"n1"))
+            self.assertFalse(store.check_and_add(u"KEY", int(clock.now), u"n1"))
+            self.assertFalse(store.check_and_add(u"KEY", int(clock.now) - 100, u"n2"))
+
+        self.assertEqual(cache.add.call_count, 2)
+        first_key, second_key = [call[0][0] for call in cache.add.call_args_list]
+        self.assertEqual(first_key, second_key)
+        self.assertEqual(cache.add.call_args[0][1:], (1, 120))
+
+
+@ddt.ddt
+class NonceStoreFromUrlTests(unittest.TestCase):
+    """Tests for nonce_store_from_url."""
+
+    @ddt.data(
+        ("memory", LocalNonceStore, None),
+        ("django", DjangoNonceStore, "default"),
+        ("django://nonces", DjangoNonceStore, "nonces"),
+    )
+    @ddt.unpack
+    def test_stores(self, url, store_class, alias):
+        """Test creating nonce stores."""
+        store = nonce_store_from_url(url)
+        self.assertIsInstance(store, store_class)
+        self.assertEqual(getattr(store, "alias", None), alias)
+
+    @ddt.data(None, "", "none")
+    def test_disabled(self, url):
+        """Test that replay protection is disabled by default."""
+        self.assertIsNone(nonce_store_from_url(url))
+
+    def test_unknown(self):
+        """Test that unknown stores are rejected."""
+        with self.assertRaises(ValueError):
+            nonce_store_from_url("redis://localhost")
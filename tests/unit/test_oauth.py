@@ -0,0 +1,102 @@
+"""Tests for passport signers."""
+import threading
+import unittest
+
+import ddt
+from lti_consumer.exceptions import LtiError
+from lti_consumer.oauth import SignedRequest
+from oauthlib.oauth1.rfc5849 import signature
+
+from dalite_xblock.oauth import PassportSigner, SignerRegistry, get_oauth_parameters
+from tests.utils import make_body_signed_request
+
+SERVICE_URL = u"https://lms.example.com/courses/course-1/xblock/block-1/handler_noauth/outcome_service_handler"
+LAUNCH_URL = u"https://dalite.example.com/lti/"
+GRADE_BODY = b"<?xml version='1.0' encoding='UTF-8'?><imsx_POXEnvelopeRequest/>"
+
+
+def verify_launch(lti_parameters, secret):
+    """Verify launch signature with oauthlib."""
+    lti_parameters = dict(lti_parameters)
+    signed_request = SignedRequest(
+        uri=LAUNCH_URL, http_method=u"POST", signature=lti_parameters.pop(u"oauth_signature"),
+        params=[(name, unicode(value)) for name, value in lti_parameters.items()],
+    )
+    return signature.verify_hmac_sha1(signed_request, secret)
+
+
+@ddt.ddt
+class TestPassportSigner(unittest.TestCase):
+    """Tests for PassportSigner."""
+
+    @ddt.data(u"SECRET", u"", u"s&cr=t ~%", u"s\u00e9cr\u00e8t")
+    def test_sign_launch(self, secret):
+        """Test that launch parameters are signed with passport key and secret."""
+        lti_parameters = {u"user_id": u"student-1", u"custom_action": u"launch-admin"}
+        oauth_parameters = PassportSigner(u"KEY", secret).sign_launch(LAUNCH_URL, lti_parameters)
+        lti_parameters.update(oauth_parameters)
+
+        self.assertEqual(oauth_parameters[u"oauth_consumer_key"], u"KEY")
+        self.assertTrue(verify_launch(lti_parameters, secret))
+        self.assertFalse(verify_launch(lti_parameters, u"OTHER"))
+
+    def test_sign_launch_invalid_url(self):
+        """Test that signing launch to URL without scheme fails."""
+        with self.assertRaises(LtiError):
+            PassportSigner(u"KEY", u"SECRET").sign_launch(u"dalite.example.com/lti/", {})
+
+    def test_sign_request(self):
+        """Test that API requests are signed, including query string parameters."""
+        url = u"https://dalite.example.com/api/grades/?question_id=1"
+        authorization = PassportSigner(u"KEY", u"SECRET").sign_request(url)
+
+        params = signature.collect_parameters(uri_query=u"question_id=1", headers={u"Authorization": authorization})
+        oauth_signature = dict(signature.collect_parameters(
+            headers={u"Authorization": authorization}, exclude_oauth_signature=False
+        ))[u"oauth_signature"]
+        signed_request = SignedRequest(uri=url, http_method=u"GET", params=params, signature=oauth_signature)
+        self.assertTrue(signature.verify_hmac_sha1(signed_request, u"SECRET"))
+        self.assertIn((u"question_id", u"1"), params)
+
+    def test_get_oauth_parameters(self):
+        """Test that OAuth parameters are read from Authorization header, without signature."""
+        oauth_params = get_oauth_parameters(make_body_signed_request(SERVICE_URL, GRADE_BODY, u"KEY", u"SECRET"))
+        self.assertEqual(oauth_params[u"oauth_consumer_key"], u"KEY")
+        self.assertNotIn(u"oauth_signature", oauth_params)
+        self.assertTrue(oauth_params[u"oauth_nonce"])
+
+    def test_concurrent_use(self):
+        """Test that a single signer can be used by many threads at once."""
+        signer = PassportSigner(u"KEY", u"SECRET")
+        failures = []
+
+        def sign_and_verify(thread_index):
+            """Sign launches and verify their signatures."""
+            for index in range(20):
+                lti_parameters = {u"user_id": u"student-{}-{}".format(thread_index, index)}
+                lti_parameters.update(signer.sign_launch(LAUNCH_URL, lti_parameters))
+                if not verify_launch(lti_parameters, u"SECRET"):
+                    failures.append(lti_parameters)
+
+        threads = [threading.Thread(target=sign_and_verify, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+
+
+class TestSignerRegistry(unittest.TestCase):
+    """Tests for SignerRegistry."""
+
+    def test_get_signer(self):
+        """Test that one signer is created per key and secret."""
+        registry = SignerRegistry()
+        signer = registry.get_signer(u"KEY", u"SECRET")
+
+        self.assertIs(registry.get_signer(u"KEY", u"SECRET"), signer)
+        self.assertIsNot(registry.get_signer(u"KEY", u"OTHER"), signer)
+        self.assertEqual(signer.key, u"KEY")
+
+        registry.clear()
+        self.assertIsNot(registry.get_signer(u"KEY", u"SECRET"), signer)
@@ -0,0 +1,153 @@
+"""Tests for Dalite XBlock outcome service."""
+from unittest import TestCase
+
+import ddt
+import mock
+from xblock.field_data import DictFieldData
+
+from dalite_xblock import grade_buffer, nonce_store, passport_cache
+from dalite_xblock.dalite_xblock import DaliteXBlock
+from dalite_xblock.outcomes import DaliteOutcomeService
+from tests.utils import make_body_signed_request
+
+LTI_PASSPORTS = ["dalite-ng-1:dalite-xblock:aHR0cDovL2ZpcnN0LnVybDo4MDgwO0tFWTtTRUNSRVQ="]
+SERVICE_URL = u"https://lms.example.com/outcome_service_handler"
+
+GRADE_BODY_TEMPLATE = u"""<?xml version="1.0" encoding="UTF-8"?>
+<imsx_POXEnvelopeRequest xmlns="http://www.imsglobal.org/services/ltiv1p1/xsd/imsoms_v1p0">
+  <imsx_POXHeader>
+    <imsx_POXRequestHeaderInfo>
+      <imsx_version>V1.0</imsx_version>
+      <imsx_messageIdentifier>message-1</imsx_messageIdentifier>
+    </imsx_POXRequestHeaderInfo>
+  </imsx_POXHeader>
+  <imsx_POXBody>
+    <{action}>
+      <resultRecord>
+        <sourcedGUID><sourcedId>course-1:lms.example.com-block-1:student-1</sourcedId></sourcedGUID>
+        <result><resultScore><language>en-us</language><textString>{score}</textString></resultScore></result>
+      </resultRecord>
+    </{action}>
+  </imsx_POXBody>
+</imsx_POXEnvelopeRequest>
+"""
+
+
+def make_grade_body(score=0.5, action="replaceResultRequest"):
+    """Return grade callback body."""
+    return GRADE_BODY_TEMPLATE.format(score=score, action=action).encode('utf-8')
+
+
+@ddt.ddt
+class DaliteOutcomeServiceTests(TestCase):
+    """Tests for DaliteOutcomeService."""
+
+    def setUp(self):
+        """Create block with mock LMS runtime."""
+        passport_cache.PASSPORT_CACHE.clear()
+        self.runtime = mock.Mock(course_id="course-1")
+        self.runtime.service.return_value = None
+        self.runtime.modulestore.get_course.return_value.lti_passports = LTI_PASSPORTS
+        self.runtime.handler_url.return_value = SERVICE_URL + u"/?"
+        self.user = mock.Mock()
+        self.runtime.get_real_user.return_value = self.user
+        self.block = DaliteXBlock(
+            self.runtime, DictFieldData({'lti_id': 'dalite-ng-1', 'has_score': True, 'weight': 2.0}),
+            scope_ids=mock.Mock(usage_id="block-1")
+        )
+        patcher = mock.patch.object(DaliteXBlock, "set_user_module_score")
+        self.set_user_module_score = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = DaliteOutcomeService(self.block)
+        self.addCleanup(nonce_store.configure, nonce_store.get_nonce_store())
+        nonce_store.configure(nonce_store.LocalNonceStore())
+
+    def _handle(self, body, secret=u"SECRET"):
+        return self.service.handle_request(make_body_signed_request(SERVICE_URL, body, u"KEY", secret))
+
+    def test_score_stored(self):
+        """Test that correctly signed scores are stored for the reported user."""
+        response = self._handle(make_grade_body(score=0.5))
+
+        self.assertIn(u"<imsx_codeMajor>success</imsx_codeMajor>", response)
+        self.assertIn(u"<imsx_messageIdentifier>message-1</imsx_messageIdentifier>", response)
+        self.runtime.get_real_user.assert_called_once_with(u"student-1")
+        self.set_user_module_score.assert_called_once_with(self.user, 0.5, 2.0)
+
+    def test_scores_buffered(self):
+        """Test that with grade buffering enabled, repeated scores are acknowledged and published once."""
+        fresh_block = mock.Mock()
+        fresh_block.runtime.get_real_user.return_value = self.user
+        load_block = mock.Mock(return_value=fresh_block)
+        buffer_ = grade_buffer.GradeBuffer(grade_buffer.InMemoryGradeQueue(), load_block=load_block)
+        grade_buffer.configure(buffer_, background_flusher=False)
+        self.addCleanup(grade_buffer.configure, None)
+
+        for score in (0.2, 0.5, 0.7):
+            self.assertIn(u"<imsx_codeMajor>success</imsx_codeMajor>", self._handle(make_grade_body(score=score)))
+        self.assertFalse(self.set_user_module_score.called)
+        self.assertEqual(len(buffer_.backend), 1)
+
+        buffer_.flush(force=True)
+        self.assertFalse(self.set_user_module_score.called)
+        load_block.assert_called_once_with(u"block-1")
+        fresh_block.runtime.get_real_user.assert_called_once_with(u"student-1")
+        fresh_block.set_user_module_score.assert_called_once_with(self.user, 0.7, 2.0)
+        fresh_block.save.assert_called_once_with()
+
+    @ddt.data(
+        (u"OTHERSECRET", make_grade_body(), u"OAuth verification error"),
+        (u"SECRET", b"<not-xml", u"Request body XML parsing error"),
+        (u"SECRET", make_grade_body(score=1.5), u"Request body XML parsing error"),
+    )
+    @ddt.unpack
+    def test_failure(self, secret, body, description):
+        """Test that incorrectly signed or malformed callbacks are rejected."""
+        response = self._handle(body, secret=secret)
+
+        self.assertIn(u"<imsx_codeMajor>failure</imsx_codeMajor>", response)
+        self.assertIn(description, response)
+        self.assertFalse(self.set_user_module_score.called)
+
+    def test_replay_rejected(self):
+        """Test that correctly signed request is handled only once."""
+        request = make_body_signed_request(SERVICE_URL, make_grade_body(), u"KEY", u"SECRET")
+        self.assertIn(u"<imsx_codeMajor>success</imsx_codeMajor>", self.service.handle_request(request))
+
+        response = self.service.handle_request(request)
+
+        self.assertIn(u"OAuth verification error: OAuth nonce was already used", response)
+        self.assertEqual(self.set_user_module_score.call_count, 1)
+
+    def test_replay_protection_disabled(self):
+        """Test that requests can be handled repeatedly if replay protection is disabled."""
+        nonce_store.configure(None)
+        request = make_body_signed_request(SERVICE_URL, make_grade_body(), u"KEY", u"SECRET")
+
+        for __ in range(2):
+            self.assertIn(u"<imsx_codeMajor>success</imsx_codeMajor>", self.service.handle_request(request))
+
+    def test_unknown_user(self):
+        """Test that scores of unknown users are rejected."""
+        self.runtime.get_real_user.return_value = None
+
+        response = self._handle(make_grade_body())
+
+        self.assertIn(u"User not found.", response)
+        self.assertFalse(self.set_user_module_score.called)
+
+    def test_past_due(self):
+        """Test that past due scores are rejected when block does not accept them."""
+        self.block.accept_grades_past_due = False
+        with mock.patch.object(DaliteXBlock, "is_past_due", True):
+            response = self._handle(make_grade_body())
+
+        self.assertIn(u"Grade is past due", response)
+        self.assertFalse(self.set_user_module_score.called)
+
+    def test_unsupported_action(self):
+        """Test that actions other than replaceResultRequest are not supported."""
+        response = self._handle(make_grade_body(action="deleteResultRequest"))
+
+        self.assertIn(u"<imsx_codeMajor>unsupported</imsx_codeMajor>", response)
+        self.assertFalse(self.set_user_module_score.called)
@@ -0,0 +1,145 @@
+"""Tests for Dalite passport audit."""
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import ddt
+
+from dalite_xblock.passport_audit import (
+    audit_export, audit_exports, audit_passports, has_problems, iter_course_exports, iter_json_values,
+    unreachable_reason
+)
+from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+from tests.utils import write_course_export
+
+
+def make_passport(lti_id, url="https://dalite.example.com", key="KEY", secret="SECRET"):
+    """Return encoded passport."""
+    return prepare_passport(DaliteLtiPassport(lti_id=lti_id, dalite_root_url=url, lti_key=key, lti_secret=secret))
+
+
+GOOD = make_passport("dalite-1")
+OTHER_LTI_PASSPORT = "other-tool:KEY:SECRET"
+
+
+@ddt.ddt
+class IterJsonValuesTests(unittest.TestCase):
+    """Tests for iter_json_values."""
+
+    @ddt.data(1, 3, 7, 64, 4096)
+    def test_values_across_chunks(self, chunk_size):
+        """Test that values split across chunks are decoded, and names in string values are ignored."""
+        document = json.dumps({
+            "a": {"lti_passports": ["x:y:z", u"\u00e9"]},
+            "b": ["lti_passports", {"lti_passports": []}],
+            "c": {"name": "lti_passports"},
+        }, indent=2)
+
+        values = list(iter_json_values(StringIO(document.encode('utf-8')), "lti_passports", chunk_size=chunk_size))
+
+        self.assertEqual(sorted(values), [[], ["x:y:z", u"\u00e9"]])
+
+    def test_malformed_value_skipped(self):
+        """Test that malformed values are skipped."""
+        document = '{"lti_passports": [1, 2, , "lti_passports": ["a"]}'
+        self.assertEqual(list(iter_json_values(StringIO(document), "lti_passports", chunk_size=8)), [["a"]])
+
+
+@ddt.ddt
+class AuditPassportsTests(unittest.TestCase):
+    """Tests for audit_passports."""
+
+    def test_audit_passports(self):
+        """Test that malformed, duplicate and unreachable-looking passports are reported."""
+        result = audit_passports([
+            GOOD, OTHER_LTI_PASSPORT, make_passport("dalite-1", url="https://other.example.com"),
+            "broken:dalite-xblock:not-base64!", make_passport("no-secret", secret=""),
+            make_passport("local", url="http://localhost:8000"),
+            make_passport("nodes", url="https://node-1.example.com|http://node-2"),
+        ])
+
+        self.assertEqual(result["passports"], 6)
+        self.assertEqual(
+            result["malformed"],
+            [{"lti_id": "broken", "reason": "Passport can't be decoded"},
+             {"lti_id": "no-secret", "reason": "LTI key or secret is empty"}]
+        )
+        self.assertEqual(result["duplicates"], ["dalite-1"])
+        self.assertEqual(
+            [(entry["lti_id"], entry["url"]) for entry in result["unreachable"]],
+            [("local", "http://localhost:8000"), ("nodes", "http://node-2")]
+        )
+        self.assertNotIn("SECRET", json.dumps(result))
+
+    @ddt.data(
+        ("https://dalite.example.com/", None),
+        ("http://dalite.example.com:8080", None),
+        ("dalite.example.com", "URL scheme is not http or https"),
+        ("ftp://dalite.example.com", "URL scheme is not http or https"),
+        ("http://", "URL has no host"),
+        ("http://localhost:10100", "URL points at a local host"),
+        ("http://dalite.local", "URL points at a local host"),
+        ("http://192.168.33.1:10100", "URL points at a private or loopback address"),
+        ("http://10.0.0.5", "URL points at a private or loopback address"),
+        ("http://172.20.1.1", "URL points at a private or loopback address"),
+        ("http://172.32.1.1", None),
+        ("http://dalite", "URL host name is not fully qualified"),
+    )
+    @ddt.unpack
+    def test_unreachable_reason(self, url, reason):
+        """Test detecting URLs students can't reach."""
+        self.assertEqual(unreachable_reason(url), reason)
+
+
+class AuditExportsTests(unittest.TestCase):
+    """Tests for auditing course exports."""
+
+    def setUp(self):
+        """Create directory with course exports."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_course_export(self.root, "good", [GOOD, OTHER_LTI_PASSPORT])
+        write_course_export(os.path.join(self.root, "nested"), "duplicate", [GOOD, GOOD])
+        archived = write_course_export(self.root, "archived", [make_passport("dev", url="http://127.0.0.1:8000")])
+        with tarfile.open(os.path.join(self.root, "nested", "archived.tar.gz"), "w:gz") as archive:
+            archive.add(archived, arcname="course")
+        shutil.rmtree(archived)
+        with open(os.path.join(self.root, "broken.tar.gz"), "w") as broken:
+            broken.write("not an archive")
+
+    def test_iter_course_exports(self):
+        """Test that export directories and archives are found."""
+        self.assertEqual(
+            sorted(os.path.relpath(path, self.root) for path in iter_course_exports(self.root)),
+            ["broken.tar.gz", "good", "nested/archived.tar.gz", "nested/duplicate"]
+        )
+
+    def test_audit_export(self):
+        """Test auditing export directory."""
+        result = audit_export(os.path.join(self.root, "good"))
+
+        self.assertEqual(result["course_id"], u"course-v1:Org+good+2017")
+        self.assertEqual(result["passports"], 1)
+        self.assertFalse(has_problems(result))
+
+    def test_audit_exports(self):
+        """Test auditing all exports in parallel, including archives and broken exports."""
+        results = {
+            os.path.relpath(result["export"], self.root): result for result in audit_exports(self.root, processes=2)
+        }
+
+        self.assertEqual(len(results), 4)
+        self.assertFalse(has_problems(results["good"]))
+        self.assertEqual(results["nested/duplicate"]["duplicates"], ["dalite-1"])
+        self.assertEqual(results["nested/archived.tar.gz"]["course_id"], u"course-v1:Org+archived+2017")
+        self.assertEqual(results["nested/archived.tar.gz"]["unreachable"][0]["lti_id"], "dev")
+        self.assertIn("error", results["broken.tar.gz"])
+        self.assertTrue(has_problems(results["broken.tar.gz"]))
+
+    def test_audit_exports_in_process(self):
+        """Test auditing exports without process pool."""
+        self.assertEqual(len(list(audit_exports(self.root, processes=1))), 4)
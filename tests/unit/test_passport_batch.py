@@ -0,0 +1,109 @@
+"""Tests for batch passport generation."""
+import csv
+import json
+import unittest
+from StringIO import StringIO
+
+import ddt
+
+from dalite_xblock.passport_batch import encode_row, encode_rows, generate_passports, read_rows
+from dalite_xblock.passport_utils import DaliteLtiPassport, parse_passport
+
+CSV_INPUT = """passport_id,dalite_url,lti_key,lti_secret
+dalite-1,http://first.url:8080,KEY,SECRET
+dalite-2,http://other.url,,SECRET
+dalite:3,http://other.url,KEY,SECRET
+"""
+
+JSONL_INPUT = """{"passport_id": "dalite-1", "dalite_url": "http://first.url:8080", "lti_key": "K", "lti_secret": "S"}
+
+not json
+{"passport_id": "dalite-2", "dalite_url": "http://other.url", "lti_key": "K;EY", "lti_secret": "SECRET"}
+[]
+"""
+
+
+@ddt.ddt
+class PassportBatchTests(unittest.TestCase):
+    """Tests for batch passport generation."""
+
+    def test_csv(self):
+        """Test that rows of CSV input are encoded, with errors reported per row."""
+        output = StringIO()
+
+        self.assertEqual(generate_passports(StringIO(CSV_INPUT), output, input_format="csv"), (1, 2))
+
+        rows = list(csv.DictReader(StringIO(output.getvalue())))
+        self.assertEqual([row["line"] for row in rows], ["2", "3", "4"])
+        self.assertEqual(
+            parse_passport(rows[0]["passport"]),
+            DaliteLtiPassport("dalite-1", "http://first.url:8080", "KEY", "SECRET")
+        )
+        self.assertEqual(rows[0]["error"], "")
+        self.assertEqual(rows[1]["error"], "Missing fields: lti_key")
+        self.assertEqual(rows[2]["error"], "Passport id must not contain ':'")
+
+    def test_jsonl(self):
+        """Test that rows of JSONL input are encoded, with errors reported per row."""
+        output = StringIO()
+
+        self.assertEqual(generate_passports(StringIO(JSONL_INPUT), output, input_format="jsonl"), (1, 3))
+
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([row["line"] for row in rows], [1, 3, 4, 5])
+        self.assertEqual(parse_passport(rows[0]["passport"].encode('utf-8')).lti_id, "dalite-1")
+        self.assertNotIn("error", rows[0])
+        self.assertIn("error", rows[1])
+        self.assertEqual(rows[2]["passport_id"], "dalite-2")
+        self.assertIn("must not contain ';'", rows[2]["error"])
+        self.assertEqual(rows[3]["error"], "Row is not a JSON object")
+
+    def test_multiple_dalite_urls(self):
+        """Test that JSONL rows may list several dalite-ng nodes."""
+        result = encode_row((1, {
+            "passport_id": "dalite", "dalite_url": ["https://node-1.url", "https://node-2.url"], "lti_key": "k",
+            "lti_secret": "s"
+        }))
+        self.assertEqual(
+            parse_passport(result["passport"]).dalite_root_urls, ("https://node-1.url", "https://node-2.url")
+        )
+
+    def test_output_format(self):
+        """Test writing output in other format than input."""
+        output = StringIO()
+        generate_passports(StringIO(CSV_INPUT), output, input_format="csv", output_format="jsonl")
+        self.assertEqual(len(output.getvalue().splitlines()), 3)
+
+    def test_unicode(self):
+        """Test that non-ASCII values are encoded as UTF-8."""
+        result = encode_row((1, {
+            "passport_id": u"dalite", "dalite_url": u"http://d\u00e9.url", "lti_key": u"k", "lti_secret": u"s\u00e9"
+        }))
+        self.assertEqual(parse_passport(result["passport"]).lti_secret, u"s\u00e9".encode('utf-8'))
+
+    @ddt.data(None, 1, 3)
+    def test_encode_rows_in_order(self, processes):
+        """Test that rows are encoded in input order, with or without process pool."""
+        rows = read_rows(StringIO("passport_id,dalite_url,lti_key,lti_secret\n" + "".join(
+            "dalite-{0},http://d{0}.url,KEY,SECRET\n".format(index) for index in range(50)
+        )), "csv")
+
+        results = list(encode_rows(rows, processes=processes, chunk_size=4))
+
+        self.assertEqual([result["passport_id"] for result in results], ["dalite-{}".format(i) for i in range(50)])
+        self.assertTrue(all(result["passport"] for result in results))
+
+    def test_encode_rows_lazily(self):
+        """Test that rows are read as they are encoded, not all at once."""
+        consumed = []
+
+        def rows():
+            """Yield rows, recording progress."""
+            for index in range(10000):
+                consumed.append(index)
+                yield index, {"passport_id": "d", "dalite_url": "u", "lti_key": "k", "lti_secret": "s"}
+
+        results = encode_rows(rows(), processes=2, chunk_size=5)
+        next(results)
+        self.assertLess(len(consumed), 100)
+        results.close()
@@ -0,0 +1,134 @@
+"""Tests for passport cache."""
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock.passport_cache import LruTtlCache, PassportCache, passport_fingerprint
+from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+
+PASSPORTS = [
+    'another-lti:edx:aHR0cHM6Ly9kYWxpdGUuY29tO2JldGE7Z2FtbWE=',
+    'test-dalite:dalite-xblock:aHR0cHM6Ly9kYWxpdGUuY29tO2JldGE7Z2FtbWE=',
+]
+PARSED_PASSPORT = DaliteLtiPassport(
+    lti_id="test-dalite", lti_key="beta", lti_secret="gamma", dalite_root_url="https://dalite.com"
+)
+
+
+class FakeClock(object):
+    """Manually advanced time source."""
+
+    def __init__(self):
+        """Initialize clock at zero."""
+        self.now = 0
+
+    def __call__(self):
+        """Return current fake time."""
+        return self.now
+
+
+@ddt.ddt
+class TestLruTtlCache(unittest.TestCase):
+    """Tests for LruTtlCache."""
+
+    def setUp(self):
+        """Prepare cache with fake clock."""
+        self.clock = FakeClock()
+        self.cache = LruTtlCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_get_set(self):
+        """Test that stored values are returned."""
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_lru_eviction(self):
+        """Test that least recently used entry is evicted when cache is full."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+        self.assertEqual(len(self.cache), 2)
+
+    @ddt.data((9, 'value'), (10, None), (11, None))
+    @ddt.unpack
+    def test_ttl(self, elapsed, expected_value):
+        """Test that entries expire after ttl."""
+        self.cache.set('key', 'value')
+        self.clock.now += elapsed
+        self.assertEqual(self.cache.get('key'), expected_value)
+
+    def test_get_or_create(self):
+        """Test that factory is called only on cache miss."""
+        factory = mock.Mock(return_value='value')
+        self.assertEqual(self.cache.get_or_create('key', factory), 'value')
+        self.assertEqual(self.cache.get_or_create('key', factory), 'value')
+        factory.assert_called_once_with()
+
+    def test_values(self):
+        """Test that values of entries that have not expired are listed."""
+        self.cache.set('a', 1)
+        self.clock.now += 5
+        self.cache.set('b', 2)
+        self.clock.now += 5
+        self.assertEqual(self.cache.values(), [2])
+
+    def test_delete_and_clear(self):
+        """Test explicit invalidation."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+@ddt.ddt
+class TestPassportCache(unittest.TestCase):
+    """Tests for PassportCache."""
+
+    def setUp(self):
+        """Prepare empty passport cache."""
+        self.cache = PassportCache()
+
+    @ddt.data(
+        ([], ['']),
+        (['a'], ['b']),
+        (['a', 'b'], ['b', 'a']),
+        (['ab'], ['a', 'b']),
+    )
+    @ddt.unpack
+    def test_fingerprint_differs(self, passports_1, passports_2):
+        """Test that different passport lists have different fingerprints."""
+        self.assertNotEqual(passport_fingerprint(passports_1), passport_fingerprint(passports_2))
+
+    def test_fingerprint_stable(self):
+        """Test that fingerprint does not depend on string type or container."""
+        self.assertEqual(passport_fingerprint(PASSPORTS), passport_fingerprint(tuple(unicode(p) for p in PASSPORTS)))
+
+    def test_get_passports(self):
+        """Test that passports are parsed and filtered."""
+        self.assertEqual(list(self.cache.get_passports('course', PASSPORTS)), [PARSED_PASSPORT])
+
+    def test_get_passports_cached(self):
+        """Test that passports are parsed once per course and passport list."""
+        with mock.patch('dalite_xblock.passport_utils.filter_and_parse_passports', return_value=[]) as parse:
+            first = self.cache.get_passports('course', PASSPORTS)
+            second = self.cache.get_passports('course', list(PASSPORTS))
+            self.assertIs(first, second)
+            parse.assert_called_once_with(tuple(PASSPORTS))
+
+            self.cache.get_passports('other-course', PASSPORTS)
+            self.cache.get_passports('course', PASSPORTS[1:])
+            self.assertEqual(parse.call_count, 3)
+
+    def test_dalite_root_urls(self):
+        """Test listing distinct dalite-ng nodes of cached passports."""
+        other = prepare_passport(DaliteLtiPassport("other", "https://dalite.com/|https://node-2.dalite.com", "k", "s"))
+        self.cache.get_passports('course', PASSPORTS)
+        self.cache.get_passports('other-course', PASSPORTS + [other])
+        self.assertEqual(self.cache.dalite_root_urls(), ["https://dalite.com", "https://node-2.dalite.com"])
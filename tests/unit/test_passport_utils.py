@@ -4,7 +4,8 @@ import unittest
 import mock
 import ddt
 from dalite_xblock.passport_utils import (
-    DaliteLtiPassport, prepare_passport, parse_passport, filter_and_parse_passports, MALFORMED_LTI_PASSPORT_MESSAGE
+    DaliteLtiPassport, DalitePassportIndex, prepare_passport, parse_passport, filter_and_parse_passports,
+    join_root_urls, select_root_url, split_root_urls, MALFORMED_LTI_PASSPORT_MESSAGE, DUPLICATE_LTI_PASSPORT_MESSAGE
 )
 
 
@@ -93,3 +94,127 @@ class TestPassportUtils(unittest.TestCase):
         """Test for function that filters dalite passports."""
         actual_output = filter_and_parse_passports(passports)
         self.assertEqual(actual_output, expected_output)
+
+
+@ddt.ddt
+class TestMultipleRootUrls(unittest.TestCase):
+    """Test passports spreading students over several dalite-ng nodes."""
+
+    NODES = ("https://node-1.example.com", "https://node-2.example.com", "https://node-3.example.com")
+    USERS = [u"student-{}".format(index) for index in range(300)]
+
+    def test_round_trip(self):
+        """Test that passports with several root URLs survive encoding, and single URL passports are unchanged."""
+        passport = DaliteLtiPassport("dalite-1", join_root_urls(self.NODES), "KEY", "SECRET")
+        parsed = parse_passport(prepare_passport(passport))
+
+        self.assertEqual(parsed, passport)
+        self.assertEqual(parsed.dalite_root_urls, self.NODES)
+        single = DaliteLtiPassport("dalite-1", "https://d.com/", "K", "S")
+        self.assertEqual(single.dalite_root_urls, ("https://d.com/",))
+        self.assertEqual(single.get_root_url(u"student"), "https://d.com/")
+
+    @ddt.data(
+        ("https://a.com", ("https://a.com",)),
+        (" https://a.com | https://b.com/ ||", ("https://a.com", "https://b.com/")),
+        ("", ()),
+    )
+    @ddt.unpack
+    def test_split_root_urls(self, dalite_root_url, expected):
+        """Test splitting root URLs."""
+        self.assertEqual(split_root_urls(dalite_root_url), expected)
+
+    @ddt.data(None, "", mock.Mock())
+    def test_users_without_id(self, user_id):
+        """Test that users without anonymous id are routed to the first node."""
+        self.assertEqual(select_root_url(self.NODES, user_id), self.NODES[0])
+
+    def test_single_node(self):
+        """Test that every user is routed to the only node."""
+        self.assertEqual(select_root_url(self.NODES[:1], u"student"), self.NODES[0])
+        self.assertEqual(select_root_url((), u"student"), '')
+
+    def test_sticky_and_balanced(self):
+        """Test that users are routed consistently and spread over all nodes."""
+        routes = {user: select_root_url(self.NODES, user) for user in self.USERS}
+
+        self.assertEqual(routes, {user: select_root_url(self.NODES, user.encode('utf-8')) for user in self.USERS})
+        for node in self.NODES:
+            self.assertGreater(routes.values().count(node), len(self.USERS) // 6)
+
+    def test_removing_node_moves_only_its_users(self):
+        """Test that removing a node reroutes only users of the removed node."""
+        before = {user: select_root_url(self.NODES, user) for user in self.USERS}
+        after = {user: select_root_url(self.NODES[:2], user) for user in self.USERS}
+
+        moved = [user for user in self.USERS if before[user] != after[user]]
+        self.assertEqual(moved, [user for user in self.USERS if before[user] == self.NODES[2]])
+
+
+@ddt.ddt
+class TestDalitePassportIndex(unittest.TestCase):
+    """Test class for DalitePassportIndex."""
+
+    PASSPORT_1 = DaliteLtiPassport(lti_id="dalite-1", lti_key="k1", lti_secret="s1", dalite_root_url="http://d1")
+    PASSPORT_2 = DaliteLtiPassport(lti_id="dalite-2", lti_key="k2", lti_secret="s2", dalite_root_url="http://d2")
+    PASSPORT_1_DUPLICATE = DaliteLtiPassport(
+        lti_id=" dalite-1", lti_key="k3", lti_secret="s3", dalite_root_url="http://d3"
+    )
+
+    def test_empty(self):
+        """Test index without passports."""
+        index = DalitePassportIndex([])
+        self.assertFalse(index)
+        self.assertEqual(list(index), [])
+        self.assertEqual(index.lti_id_options, [])
+        self.assertIsNone(index.get('dalite-1'))
+
+    @ddt.data('dalite-1', ' dalite-1', 'dalite-1 \n')
+    def test_get(self, lti_id):
+        """Test lookup by LTI ID ignores surrounding whitespace."""
+        index = DalitePassportIndex([self.PASSPORT_1, self.PASSPORT_2])
+        self.assertEqual(index.get(lti_id), self.PASSPORT_1)
+        self.assertIn(lti_id, index)
+
+    @ddt.data(None, '', 'missing')
+    def test_get_missing(self, lti_id):
+        """Test lookup of missing passport."""
+        index = DalitePassportIndex([self.PASSPORT_1])
+        self.assertIsNone(index.get(lti_id))
+        self.assertNotIn(lti_id, index)
+
+    def test_order_and_options(self):
+        """Test that index preserves passport order."""
+        index = DalitePassportIndex([self.PASSPORT_2, self.PASSPORT_1])
+        self.assertEqual(list(index), [self.PASSPORT_2, self.PASSPORT_1])
+        self.assertEqual(index.lti_ids, ['dalite-2', 'dalite-1'])
+        self.assertEqual(
+            index.lti_id_options,
+            [{"display_name": "dalite-2", "value": "dalite-2"}, {"display_name": "dalite-1", "value": "dalite-1"}]
+        )
+
+    def test_options_not_shared(self):
+        """Test that modifying returned options does not change options returned later."""
+        index = DalitePassportIndex([self.PASSPORT_1])
+        index.lti_id_options[0]["display_name"] = "changed"
+        index.lti_id_options.append({})
+
+        self.assertEqual(index.lti_id_options, [{"display_name": "dalite-1", "value": "dalite-1"}])
+
+    def test_duplicates(self):
+        """Test that first passport wins if LTI IDs are duplicated, and duplicates are reported."""
+        with mock.patch('dalite_xblock.passport_utils.logger.warn') as patched_warn:
+            index = DalitePassportIndex([self.PASSPORT_1, self.PASSPORT_2, self.PASSPORT_1_DUPLICATE])
+            patched_warn.assert_called_once_with(DUPLICATE_LTI_PASSPORT_MESSAGE, 'dalite-1')
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get('dalite-1'), self.PASSPORT_1)
+        self.assertEqual(index.duplicate_lti_ids, ('dalite-1',))
+
+    def test_from_passport_strings(self):
+        """Test building index from raw passport strings."""
+        index = DalitePassportIndex.from_passport_strings([
+            'another-lti:edx:aHR0cHM6Ly9kYWxpdGUuY29tO2JldGE7Z2FtbWE=',
+            'test-dalite:dalite-xblock:aHR0cHM6Ly9kYWxpdGUuY29tO2JldGE7Z2FtbWE=',
+        ])
+        self.assertEqual(index.lti_ids, ['test-dalite'])
@@ -0,0 +1,78 @@
+"""Tests for cached resource loader."""
+from unittest import TestCase
+
+import mock
+
+import pkg_resources
+
+from dalite_xblock import resources
+from dalite_xblock.resources import CachedResourceLoader
+from tests.utils import TestWithPatchesMixin
+
+
+class CachedResourceLoaderTests(TestCase, TestWithPatchesMixin):
+    """Tests for CachedResourceLoader."""
+
+    def setUp(self):
+        """Prepare loader reading fake resources."""
+        self.resource_contents = {
+            'public/js/code.js': 'function Code() {}',
+            '/templates/template.html': '<p>{{ message }}</p>',
+            '/templates/template.mako': '<p>${message}</p>',
+        }
+        self.resource_string = self.make_patch(
+            pkg_resources, 'resource_string',
+            mock.Mock(side_effect=lambda module, path: self.resource_contents[path])
+        )
+        self.mtime = self.make_patch(resources.os.path, 'getmtime', mock.Mock(return_value=1))
+        self.loader = CachedResourceLoader('dalite_xblock.dalite_xblock', dev_mode=False)
+
+    def test_load_unicode(self):
+        """Test that resources are read once."""
+        self.assertEqual(self.loader.load_unicode('public/js/code.js'), u'function Code() {}')
+        self.assertEqual(self.loader.load_unicode('public/js/code.js'), u'function Code() {}')
+        self.resource_string.assert_called_once_with('dalite_xblock.dalite_xblock', 'public/js/code.js')
+        self.assertFalse(self.mtime.called)
+
+    def test_render_django_template(self):
+        """Test that django templates are compiled once and rendered with provided context."""
+        with mock.patch('django.template.Template') as template_class:
+            template_class.return_value.render.side_effect = lambda context: context['message']
+            self.assertEqual(self.loader.render_django_template('/templates/template.html', {'message': 'a'}), 'a')
+            self.assertEqual(self.loader.render_django_template('/templates/template.html', {'message': 'b'}), 'b')
+
+        template_class.assert_called_once_with(u'<p>{{ message }}</p>')
+
+    def test_render_django_template_real(self):
+        """Test rendering actual django template."""
+        self.assertEqual(self.loader.render_django_template('/templates/template.html', {'message': 'a'}), u'<p>a</p>')
+        self.assertEqual(self.loader.render_django_template('/templates/template.html'), u'<p></p>')
+
+    def test_render_mako_template(self):
+        """Test that mako templates are compiled once."""
+        self.assertEqual(self.loader.render_mako_template('/templates/template.mako', {'message': 'a'}), u'<p>a</p>')
+        self.assertEqual(self.loader.render_mako_template('/templates/template.mako', {'message': 'b'}), u'<p>b</p>')
+        self.assertIs(
+            self.loader.get_mako_template('/templates/template.mako'),
+            self.loader.get_mako_template('/templates/template.mako')
+        )
+        self.assertEqual(self.resource_string.call_count, 1)
+
+    def test_dev_mode(self):
+        """Test that in dev mode resources are reloaded when file changes."""
+        self.loader.dev_mode = True
+        self.assertEqual(self.loader.load_unicode('public/js/code.js'), u'function Code() {}')
+
+        self.resource_contents['public/js/code.js'] = 'function NewCode() {}'
+        self.assertEqual(self.loader.load_unicode('public/js/code.js'), u'function Code() {}')
+
+        self.mtime.return_value = 2
+        self.assertEqual(self.loader.load_unicode('public/js/code.js'), u'function NewCode() {}')
+        self.assertEqual(self.resource_string.call_count, 2)
+
+    def test_clear(self):
+        """Test that clear drops cached resources."""
+        self.loader.load_unicode('public/js/code.js')
+        self.loader.clear()
+        self.loader.load_unicode('public/js/code.js')
+        self.assertEqual(self.resource_string.call_count, 2)
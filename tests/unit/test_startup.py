@@ -0,0 +1,25 @@
+"""Tests for the startup benchmark."""
+import os
+import unittest
+
+from benchmarks.startup import ENTRY_POINT, format_report, run_startup_benchmark
+
+
+class StartupBenchmarkTests(unittest.TestCase):
+    """Tests for the startup benchmark."""
+
+    def test_entry_point(self):
+        """Test that the benchmarked entry point is the one XBlock discovery loads."""
+        setup_py_path = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "setup.py")
+        with open(setup_py_path) as setup_py:
+            self.assertIn("'xblock-dalite = {}'".format(ENTRY_POINT), setup_py.read())
+
+    def test_run_startup_benchmark(self):
+        """Test that loading the entry point doesn't import modules only needed to render and launch blocks."""
+        report = run_startup_benchmark(repeat=1)
+
+        summary = report[ENTRY_POINT]
+        self.assertEqual(summary["lazy_modules"], [])
+        self.assertGreater(summary["import_ms"]["p50"], 0)
+        self.assertGreater(summary["modules"]["p50"], 0)
+        self.assertIn("difference", format_report(report))
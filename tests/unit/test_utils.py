@@ -3,17 +3,8 @@ from unittest import TestCase
 
 import ddt
 import mock
-from xblock.core import XBlock
-from xblock.field_data import DictFieldData
-from xblock.fields import String
 
-from dalite_xblock.utils import _, FieldValuesContextManager
-
-
-class DummyXBlock(XBlock):
-    """Dummy XBlock."""
-
-    field = String(values=[10, 15, 20])
+from dalite_xblock.utils import _, env_flag
 
 
 @ddt.ddt
@@ -27,29 +18,21 @@ class GetTextTests(TestCase):
 
 
 @ddt.ddt
-class FieldValuesContextManagerTests(TestCase):
-    """Tests for FieldValuesContextManager."""
-
-    def setUp(self):
-        """Obviously, setUp method prepares test environment for each test to run."""
-        self.runtime_mock = mock.Mock()
-        self.block = DummyXBlock(self.runtime_mock, field_data=DictFieldData({}), scope_ids=mock.Mock())
-
-    @ddt.data([], [1, 2, 3], range(5))
-    def test_context_manager(self, values):
-        """
-        Test that FieldValuesContextManager works correctly.
-
-        Correctly means that it replaces field's values with value arising from values_generator for a duration of
-        context scope, and restores them to initial value after exiting the scope.
-        """
-        values_generator = mock.Mock(return_value=values)
-        initial_values = self.block.fields['field'].values
-
-        with FieldValuesContextManager(self.block, 'field', values_generator):
-            available_values = self.block.fields['field'].values
-
-            self.assertTrue(values_generator.called)
-            self.assertEqual(available_values, values)
-
-        self.assertEqual(self.block.fields['field'].values, initial_values)
+class EnvFlagTests(TestCase):
+    """Tests for env_flag method."""
+
+    @ddt.data(
+        ("1", True), ("true", True), ("on", True), ("yes", True),
+        ("", False), ("0", False), ("False", False), (" off ", False), ("no", False),
+    )
+    @ddt.unpack
+    def test_env_flag(self, value, expected_result):
+        """Test that environment variable values are interpreted as booleans."""
+        with mock.patch.dict("os.environ", {"DALITE_XBLOCK_TEST_FLAG": value}):
+            self.assertEqual(env_flag("DALITE_XBLOCK_TEST_FLAG"), expected_result)
+
+    @ddt.data(True, False)
+    def test_env_flag_default(self, default):
+        """Test that default is used if environment variable is not set."""
+        with mock.patch.dict("os.environ", {}, clear=True):
+            self.assertEqual(env_flag("DALITE_XBLOCK_TEST_FLAG", default), default)
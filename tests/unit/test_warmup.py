@@ -0,0 +1,96 @@
+"""Tests for worker process warm-up."""
+import os
+import unittest
+
+import ddt
+import mock
+
+from dalite_xblock import dalite_xblock, passport_utils, warmup
+from dalite_xblock.course_settings import InMemoryCourseSettingsProvider
+from dalite_xblock.passport_cache import PASSPORT_CACHE
+from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+
+PASSPORTS = {
+    u"course-1": [prepare_passport(DaliteLtiPassport("dalite-1", "https://dalite.example.com", "KEY", "SECRET"))],
+    u"course-2": [prepare_passport(DaliteLtiPassport("dalite-2", "https://other.example.com", "KEY", "SECRET"))],
+}
+
+
+class FailingSettingsProvider(InMemoryCourseSettingsProvider):
+    """Course settings provider failing to load one of the courses."""
+
+    def fetch_lti_passports(self, course_id):
+        """Fail for a missing course."""
+        if course_id == u"missing":
+            raise ValueError("No such course")
+        return super(FailingSettingsProvider, self).fetch_lti_passports(course_id)
+
+
+@ddt.ddt
+class WarmUpTests(unittest.TestCase):
+    """Tests for warm_up."""
+
+    def setUp(self):
+        """Start with empty passport cache."""
+        PASSPORT_CACHE.clear()
+        self.addCleanup(PASSPORT_CACHE.clear)
+
+    @ddt.data(
+        ("", []),
+        ("course-v1:Org+C+1", [u"course-v1:Org+C+1"]),
+        (" course-1, course-2\ncourse-3 ", [u"course-1", u"course-2", u"course-3"]),
+    )
+    @ddt.unpack
+    def test_courses_from_env(self, value, expected):
+        """Test parsing list of active courses."""
+        self.assertEqual(warmup.courses_from_env(value), expected)
+
+    def test_warm_up(self):
+        """Test that passports of active courses are parsed and phase durations are reported."""
+        report = warmup.warm_up([u"course-1", u"course-2"], InMemoryCourseSettingsProvider(PASSPORTS))
+
+        self.assertEqual((report["courses"], report["errors"]), (2, []))
+        for phase in ("imports_ms", "resources_ms", "passports_ms", "total_ms"):
+            self.assertGreaterEqual(report[phase], 0)
+        self.assertEqual(PASSPORT_CACHE.dalite_root_urls(), ["https://dalite.example.com", "https://other.example.com"])
+        with mock.patch.object(passport_utils, "filter_and_parse_passports") as parse:
+            PASSPORT_CACHE.get_passports(u"course-1", PASSPORTS[u"course-1"])
+        self.assertFalse(parse.called)
+
+    def test_resources_loaded(self):
+        """Test that templates and JS are served from resource caches after warm-up."""
+        dalite_xblock.loader.clear()
+        warmup.warm_up([])
+
+        with mock.patch("xblockutils.resources.ResourceLoader.load_unicode", side_effect=AssertionError):
+            dalite_xblock.loader.load_unicode('public/js/dalite_xblock.js')
+            dalite_xblock.loader.get_django_template('/templates/dalite_xblock_lti_iframe.html')
+
+    def test_course_errors(self):
+        """Test that courses that fail to load are reported, and don't stop warm-up of the others."""
+        report = warmup.warm_up([u"missing", u"course-1"], FailingSettingsProvider(PASSPORTS), resources=False)
+
+        self.assertEqual(report["courses"], 1)
+        self.assertEqual(report["errors"], [{"course_id": u"missing", "error": "ValueError: No such course"}])
+        self.assertNotIn("imports_ms", report)
+
+    def test_no_modulestore(self):
+        """Test that courses can't be warmed outside of edx-platform without a settings provider."""
+        report = warmup.warm_up([u"course-1"], resources=False)
+        self.assertEqual(report["courses"], 0)
+        self.assertEqual(len(report["errors"]), 1)
+
+    def test_post_fork(self):
+        """Test that post-fork hook warms courses listed in the environment."""
+        with mock.patch.dict(os.environ, {warmup.WARMUP_COURSES_ENV_VARIABLE: "course-1,course-2"}), \
+                mock.patch.object(warmup, "warm_up") as warm_up:
+            warmup.post_fork(mock.Mock(), mock.Mock())
+        warm_up.assert_called_once_with()
+
+        with mock.patch.object(warmup, "modulestore") as modulestore, \
+                mock.patch.dict(os.environ, {warmup.WARMUP_COURSES_ENV_VARIABLE: "course-1,course-2"}):
+            modulestore.return_value.get_course.side_effect = lambda course_id, depth: mock.Mock(
+                lti_passports=PASSPORTS[course_id]
+            )
+            report = warmup.post_fork()
+        self.assertEqual(report["courses"], 2)
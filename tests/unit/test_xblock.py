@@ -1,17 +1,29 @@
 """Tests for Dalite XBLock."""
+import itertools
+import json
+import threading
 from unittest import TestCase
 
 import ddt
 import mock
 
+from webob import Request
 from xblock.core import XBlock
+from xblock.exceptions import NoSuchUsage
 from xblock.field_data import DictFieldData
 from xblock.fragment import Fragment
 
-from dalite_xblock import dalite_xblock
+from dalite_xblock import fragment_cache, health, passport_cache, passport_utils
+from dalite_xblock.course_settings import COURSE_SETTINGS_SERVICE, InMemoryCourseSettingsProvider
 from dalite_xblock.dalite_xblock import DaliteXBlock
-from dalite_xblock.passport_utils import DaliteLtiPassport
-from tests.utils import TestWithPatchesMixin
+from dalite_xblock.fragment_cache import FragmentCache, LocalFragmentCacheBackend
+from dalite_xblock.health import HealthProber, HealthRegistry
+from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+from tests.utils import InstrumentationTestMixin, TestWithPatchesMixin
+
+MULTI_NODE_PASSPORT = prepare_passport(DaliteLtiPassport(
+    "dalite-ng-5", "https://node-1.example.com|https://node-2.example.com/", "KEY", "SECRET"
+))
 
 DEFAULT_LTI_PASSPORTS = [
     "dalite-ng-1:dalite-xblock:aHR0cDovL2ZpcnN0LnVybDo4MDgwO0tFWTtTRUNSRVQ=",
@@ -42,6 +54,7 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
         """Obviously, setUP method sets up test environment for each individual test to run."""
         self.runtime_mock = mock.Mock()
         self.runtime_mock.course_id = self.DEFAULT_COURSE_ID
+        self.runtime_mock.service.return_value = None
         self.block = DaliteXBlock(
             self.runtime_mock, DictFieldData({}), scope_ids=mock.Mock()
         )
@@ -49,32 +62,64 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
         self.mock_course = mock.Mock(spec=XBlock)
         self.mock_course.lti_passports = DEFAULT_LTI_PASSPORTS
         self.runtime_mock.modulestore.get_course = mock.Mock(return_value=self.mock_course)
+        passport_cache.PASSPORT_CACHE.clear()
 
     def test_course(self):
         """Test course property."""
         mock_course = mock.Mock(spec=XBlock)
         self.runtime_mock.modulestore.get_course = mock.Mock(return_value=mock_course)
 
+        self.assertEqual(self.block.course, mock_course)
         self.assertEqual(self.block.course, mock_course)
         self.runtime_mock.modulestore.get_course.assert_called_once_with(self.DEFAULT_COURSE_ID)
 
+    def test_course_settings_service(self):
+        """Test that course settings service provided by the runtime is used to get passports."""
+        service = InMemoryCourseSettingsProvider({self.DEFAULT_COURSE_ID: DEFAULT_LTI_PASSPORTS[:1]})
+        self.runtime_mock.service.side_effect = lambda block, name: service if name == COURSE_SETTINGS_SERVICE else None
+
+        self.assertEqual(list(self.block.dalite_xblock_lti_passports), [PARSED_LTI_PASSPORTS['dalite-ng-1']])
+        self.assertFalse(self.runtime_mock.modulestore.get_course.called)
+
+    def test_course_settings_memoized_between_blocks(self):
+        """Test that blocks served by the same runtime load course settings once."""
+        other_block = DaliteXBlock(self.runtime_mock, DictFieldData({}), scope_ids=mock.Mock())
+        self.assertIsNotNone(self.block.dalite_xblock_lti_passports)
+        self.assertIsNotNone(other_block.dalite_xblock_lti_passports)
+        self.runtime_mock.modulestore.get_course.assert_called_once_with(self.DEFAULT_COURSE_ID, depth=0)
+
     def test_dalite_xblock_lti_passports(self):
         """Test dalite_xblock_lti_passports property."""
-        with mock.patch.object(dalite_xblock, "filter_and_parse_passports") as filter_passwords:
+        with mock.patch.object(passport_utils, "filter_and_parse_passports", return_value=[]) as filter_passwords:
             passports = ['some:mock:passport']
             self.mock_course.lti_passports = passports
             unused_variable_1 = self.block.dalite_xblock_lti_passports
             unused_variable_2 = self.block.dalite_xblock_lti_passports
             self.assertIs(unused_variable_1, unused_variable_2)
             # Calling property twice to check caching behaviour.
-            filter_passwords.assert_called_once_with(passports)
+            filter_passwords.assert_called_once_with(tuple(passports))
+
+    def test_dalite_xblock_lti_passports_shared_between_blocks(self):
+        """Test that blocks in the same course share parsed passports."""
+        other_block = DaliteXBlock(self.runtime_mock, DictFieldData({}), scope_ids=mock.Mock())
+        self.assertIs(self.block.dalite_xblock_lti_passports, other_block.dalite_xblock_lti_passports)
+
+    def test_dalite_xblock_lti_passports_invalidated_on_change(self):
+        """Test that changing course passports is picked up by blocks in subsequent requests."""
+        self.assertEqual(len(self.block.dalite_xblock_lti_passports), len(DEFAULT_LTI_PASSPORTS))
+        self.mock_course.lti_passports = DEFAULT_LTI_PASSPORTS[:1]
+        next_request_runtime = mock.Mock(course_id=self.DEFAULT_COURSE_ID, modulestore=self.runtime_mock.modulestore)
+        next_request_runtime.service.return_value = None
+        other_block = DaliteXBlock(next_request_runtime, DictFieldData({}), scope_ids=mock.Mock())
+        self.assertEqual(list(other_block.dalite_xblock_lti_passports), [PARSED_LTI_PASSPORTS['dalite-ng-1']])
 
     @ddt.data(
         ('', None),
         ('missing', None),
         ('dalite-ng-1', PARSED_LTI_PASSPORTS['dalite-ng-1']),
         ('dalite-ng-2', PARSED_LTI_PASSPORTS['dalite-ng-2']),
-        ('dalite-ng-3', PARSED_LTI_PASSPORTS['dalite-ng-3'])
+        ('dalite-ng-3', PARSED_LTI_PASSPORTS['dalite-ng-3']),
+        (' dalite-ng-1 ', PARSED_LTI_PASSPORTS['dalite-ng-1']),
     )
     @ddt.unpack
     def test_lti_passport(self, lti_id, expected_result):
@@ -96,6 +141,79 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
         self.block.lti_id = lti_id
         self.assertEqual(self.block.launch_url, launch_url)
 
+    def test_launch_url_multiple_nodes(self):
+        """Test that students are spread over dalite-ng nodes, and every student always launches the same node."""
+        self.mock_course.lti_passports = DEFAULT_LTI_PASSPORTS + [MULTI_NODE_PASSPORT]
+        self.block.lti_id = "dalite-ng-5"
+        launch_urls = {}
+        for index in range(50):
+            self.runtime_mock.anonymous_student_id = u"student-{}".format(index)
+            launch_urls[index] = self.block.launch_url
+            self.assertEqual(self.block.launch_url, launch_urls[index])
+
+        self.assertEqual(
+            set(launch_urls.values()), {"https://node-1.example.com/lti/", "https://node-2.example.com/lti/"}
+        )
+
+    def test_launch_url_imports_health_once(self):
+        """Test that health module is imported on first read of launch URL only."""
+        self.block.lti_id = "dalite-ng-1"
+        self.assertEqual(self.block.launch_url, "http://first.url:8080/lti/")
+        with mock.patch("__builtin__.__import__") as import_:
+            self.assertEqual(self.block.launch_url, "http://first.url:8080/lti/")
+            self.assertTrue(self.block.is_dalite_available)
+
+        self.assertFalse(import_.called)
+
+    def _configure_health(self):
+        """Configure process-wide health registry taking nodes out of rotation after one failed probe."""
+        registry = HealthRegistry(failure_threshold=1)
+        health.configure(HealthProber(registry, endpoints=lambda: []), start=False)
+        self.addCleanup(health.configure, None)
+        return registry
+
+    def test_launch_url_failover(self):
+        """Test that students are routed to nodes that are up, and keep their node while it is up."""
+        self.mock_course.lti_passports = DEFAULT_LTI_PASSPORTS + [MULTI_NODE_PASSPORT]
+        self.block.lti_id = "dalite-ng-5"
+        self.block.question_id, self.block.assignment_id = "q1", "a1"
+        registry = self._configure_health()
+        usual_urls = {}
+        for index in range(20):
+            self.runtime_mock.anonymous_student_id = u"student-{}".format(index)
+            usual_urls[index] = self.block.launch_url
+
+        registry.record("https://node-1.example.com", False)
+        for index in range(20):
+            self.runtime_mock.anonymous_student_id = u"student-{}".format(index)
+            self.assertEqual(self.block.launch_url, "https://node-2.example.com/lti/")
+            self.assertTrue(self.block.is_dalite_available)
+
+        registry.record("https://node-2.example.com", False)
+        for index in range(20):
+            self.runtime_mock.anonymous_student_id = u"student-{}".format(index)
+            self.assertEqual(self.block.launch_url, usual_urls[index])
+        self.assertFalse(self.block.is_dalite_available)
+        self.assertEqual(
+            self.block.get_status(in_studio=False),
+            {"is_lti_ready": True, "message": DaliteXBlock.DALITE_UNAVAILABLE_MESSAGE}
+        )
+
+    def test_lti_launch_handler_unavailable(self):
+        """Test that launches fail fast when all dalite-ng nodes are down."""
+        self.block.lti_id = "dalite-ng-1"
+        self.block.question_id, self.block.assignment_id = "q1", "a1"
+        self._configure_health().record("http://first.url:8080", False)
+
+        with mock.patch(
+            'dalite_xblock.dalite_xblock.DaliteXBlock._get_context_for_template', return_value={'element_id': 'el'}
+        ), mock.patch("dalite_xblock.lti.DaliteLtiConsumer") as consumer:
+            response = self.block.lti_launch_handler(mock.Mock(), u'')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(DaliteXBlock.DALITE_UNAVAILABLE_MESSAGE, response.body.decode('utf-8'))
+        self.assertFalse(consumer.called)
+
     @ddt.data(
         ('', '', ''),
         ('missing', '', ''),
@@ -130,6 +248,25 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
         self.mock_course.lti_passports = lti_passports
         self.assertEqual(self.block.lti_id_values_provider(), expected_result)
 
+    @ddt.data([], DEFAULT_LTI_PASSPORTS)
+    def test_lti_id_values_not_shared(self, lti_passports):
+        """Test that modifying LTI ID values of a block does not change values of other blocks."""
+        self.mock_course.lti_passports = lti_passports
+        expected_values = self.block.lti_id_values_provider()
+        for option in self.block.lti_id_values_provider():
+            option["display_name"] = "changed"
+
+        self.assertEqual(self.block.lti_id_values_provider(), expected_values)
+        self.assertNotEqual(DaliteXBlock.NO_LTI_PASSPORTS_OPTION["display_name"], "changed")
+
+    def test_lti_id_field_values(self):
+        """Test that Studio editor gets LTI ID values from this block's passports."""
+        with mock.patch.object(DaliteXBlock, 'ugettext', create=True, side_effect=lambda text: text):
+            # pylint: disable=protected-access
+            info = self.block._make_field_info('lti_id', self.block.fields['lti_id'])
+        self.assertEqual(info['values'], self.block.lti_id_values_provider())
+        self.assertTrue(info['has_values'])
+
     @ddt.data(
         ('', 1), ('asgn#1', 1), ('assignment-2', 3), ('almost-irrelevant', 'almost-irrelevenat-too')
     )
@@ -183,43 +320,85 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
     def test_add_custom_parameters(self):
         """Test for add_extra_custom_params contextmanager."""
         canary = ['param1=value1']
-        additional_params = ["param2=value2", "param3=value3"]
+        additional_params = ["param2=value2", "param3 = value3"]
         self.block.custom_parameters = canary
 
         with self.block.add_extra_custom_params(additional_params):
-            self.assertEqual(len(self.block.custom_parameters), len(additional_params + canary))
-            self.assertEqual(set(self.block.custom_parameters), set(additional_params + canary))
+            self.assertEqual(self.block.extra_custom_parameters, additional_params)
+            self.assertEqual(
+                self.block.prefixed_custom_parameters,
+                {u'custom_param1': u'value1', u'custom_param2': u'value2', u'custom_param3': u'value3'}
+            )
+            with self.block.add_extra_custom_params(['param4=value4']):
+                self.assertEqual(self.block.extra_custom_parameters, additional_params + ['param4=value4'])
+            self.assertEqual(self.block.extra_custom_parameters, additional_params)
+            # Field values are never modified
+            self.assertIs(self.block.custom_parameters, canary)
 
+        self.assertEqual(self.block.extra_custom_parameters, [])
         self.assertIs(self.block.custom_parameters, canary)
-        self.assertEqual(self.block.custom_parameters, ['param1=value1'])
+        self.assertEqual(self.block.prefixed_custom_parameters, {u'custom_param1': u'value1'})
+
+    def test_add_custom_parameters_is_thread_local(self):
+        """Test that extra custom parameters are not visible to other threads or other blocks."""
+        other_block = DaliteXBlock(self.runtime_mock, DictFieldData({}), scope_ids=mock.Mock())
+        seen_in_thread = {}
+
+        def read_params():
+            """Read extra parameters from another thread."""
+            seen_in_thread['params'] = self.block.extra_custom_parameters
+
+        with self.block.add_extra_custom_params(['action=launch-admin']):
+            thread = threading.Thread(target=read_params)
+            thread.start()
+            thread.join()
+            self.assertEqual(other_block.extra_custom_parameters, [])
+
+        self.assertEqual(seen_in_thread['params'], [])
 
     @ddt.data(
         # For requests without suffix there is no extra parameters
-        ('', []),
-        (DaliteXBlock.ADMIN_URL_SUFFIX, [u'action=launch-admin']),
-        (DaliteXBlock.EDIT_QUESTION_SUFFIX, [u'action=edit-question'])
+        ('', {}),
+        (DaliteXBlock.ADMIN_URL_SUFFIX, {u'custom_action': u'launch-admin'}),
+        (DaliteXBlock.EDIT_QUESTION_SUFFIX, {u'custom_action': u'edit-question'})
 
     )
     @ddt.unpack
     def test_lti_launch_handler(self, suffix, expected_params):
         """Test for lti_launch_handler method."""
-        request_canary = object()
-
         # Workaround around lack of nonlocal in python 2
         actual_values = {}
 
-        def super_handler_mock(self, request, suffix=''):
-            """A mock version of lti_launch_handler that will be attached to super call."""
-            actual_values['actual_params'] = self.custom_parameters
-            actual_values['actual_request'] = request
-            actual_values['actual_suffix'] = suffix
-
-        with mock.patch("dalite_xblock.dalite_xblock.LtiConsumerXBlock.lti_launch_handler", super_handler_mock):
-            self.block.lti_launch_handler(request_canary, suffix)
+        def get_signed_lti_parameters(lti_consumer, launch_url):
+            """A mock version of get_signed_lti_parameters recording custom parameters during launch."""
+            actual_values['actual_params'] = lti_consumer.xblock.extra_prefixed_custom_parameters
+            actual_values['signed_url'] = launch_url
+            return {u'custom_canary': u'value'}
 
-        self.assertIs(request_canary, actual_values['actual_request'])
-        self.assertEqual('', actual_values['actual_suffix'])
+        with mock.patch(
+            "dalite_xblock.lti.DaliteLtiConsumer.get_signed_lti_parameters",
+            side_effect=get_signed_lti_parameters, autospec=True
+        ), mock.patch(
+            'dalite_xblock.dalite_xblock.DaliteXBlock._get_context_for_template', return_value={'element_id': 'el'}
+        ), mock.patch(
+            "dalite_xblock.dalite_xblock.lti_consumer_loader.render_mako_template", return_value=u"<form/>"
+        ) as render, mock.patch(
+            # Node selected for the launch changes between reads, i.e. when a node goes down
+            'dalite_xblock.dalite_xblock.DaliteXBlock.launch_url', new_callable=mock.PropertyMock,
+            side_effect=itertools.cycle([u"https://node-1.example.com/lti/", u"https://node-2.example.com/lti/"])
+        ):
+            response = self.block.lti_launch_handler(mock.Mock(), suffix)
+
+        self.assertEqual(response.body, "<form/>")
+        self.assertEqual(response.content_type, 'text/html')
+        # Form is posted to the URL that was signed
+        render.assert_called_once_with('/templates/html/lti_launch.html', {
+            'element_id': 'el', 'launch_url': actual_values['signed_url'],
+            'lti_parameters': {u'custom_canary': u'value'}
+        })
         self.assertEqual(expected_params, actual_values['actual_params'])
+        self.assertEqual(self.block.custom_parameters, [])
+        self.assertEqual(self.block.extra_custom_parameters, [])
 
     def test_render_admin_button(self):
         """Test for the render_button_launching_admin method."""
@@ -242,10 +421,23 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
             '/templates/dalite_xblock_lti_iframe.html',
             {
                 'element_id_specifier': 'launch-admin', 'dalite_admin_label': 'Press Me', 'has_score': False,
-                'form_url_suffix': '/test'
+                'form_url_suffix': '/test', 'lazy_iframe': True,
             }
         )
 
+    @ddt.data(True, False)
+    def test_render_admin_button_lazy_iframe(self, lazy_admin_iframes):
+        """Test that admin overlay iframe is not rendered when admin iframes are lazy."""
+        self.block.lazy_admin_iframes = lazy_admin_iframes
+        with mock.patch('dalite_xblock.dalite_xblock.DaliteXBlock._get_context_for_template', return_value={
+            "element_id": "dalite-1", "form_url": "deadbeef/lti_launch_handler", "display_name": "Question",
+        }):
+            result = self.block.render_button_launching_admin({}, "admin", "Press Me", "admin-main")
+
+        self.assertIn('data-launch-url="deadbeef/lti_launch_handler/admin"', result)
+        self.assertEqual("<iframe" in result, not lazy_admin_iframes)
+        self.assertEqual("dalite-admin-iframe-container" in result, lazy_admin_iframes)
+
     # TODO: should be an integration test - figure out how to do this
     # AS is, this test is extremely fragile - it'll likely break on every code change
     def test_student_view(self):
@@ -267,7 +459,45 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
 
             self.assertEqual(result, mock_fragment)
             mock_fragment.add_javascript.assert_called_once_with(load_js_result)
-            mock_fragment.initialize_js.assert_called_once_with('DaliteXBlock')
+            mock_fragment.initialize_js.assert_called_once_with(
+                'DaliteXBlock', {"in_studio": False, "is_lti_ready": True, "deferred_launch_url": None}
+            )
+
+    @ddt.data(
+        # defer_inline_launch, launch_target, expected deferral
+        (True, 'iframe', True),
+        (True, 'modal', False),
+        (True, 'new_window', False),
+        (False, 'iframe', False),
+    )
+    @ddt.unpack
+    def test_student_view_deferred_launch(self, defer_inline_launch, launch_target, is_deferred):
+        """Test that inline iframe is rendered without launch URL, passed to JS instead, if launch is deferred."""
+        self.block.defer_inline_launch = defer_inline_launch
+        self.block.launch_target = launch_target
+        self.runtime_mock.handler_url.return_value = "/handler/lti_launch_handler/?"
+        rendered_form_urls = []
+
+        def parent_student_view(context):
+            """Record form URL LtiConsumerXBlock template would be rendered with."""
+            rendered_form_urls.append(self.block._get_context_for_template()['form_url'])
+            return Fragment()
+
+        parent_class = "dalite_xblock.dalite_xblock.LtiConsumerXBlock"
+        with mock.patch(parent_class + ".student_view", side_effect=parent_student_view), \
+                mock.patch(
+                    parent_class + "._get_context_for_template",
+                    side_effect=lambda: {"form_url": "/handler/lti_launch_handler"}), \
+                mock.patch('dalite_xblock.dalite_xblock.DaliteXBlock.is_lti_ready', new_callable=mock.PropertyMock,
+                           return_value=True):
+            fragment = self.block.student_view({})
+            # Launch URL is omitted only while rendering student view
+            self.assertEqual(self.block._get_context_for_template()['form_url'], "/handler/lti_launch_handler")
+
+        self.assertEqual(rendered_form_urls, ["" if is_deferred else "/handler/lti_launch_handler"])
+        self.assertEqual(
+            fragment.json_init_args["deferred_launch_url"], "/handler/lti_launch_handler" if is_deferred else None
+        )
 
     def _do_error_page_test(self, view_to_test, is_in_studio):
         with mock.patch("dalite_xblock.dalite_xblock.LtiConsumerXBlock.student_view") as patched_super, \
@@ -344,6 +574,61 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
         """Test student view calls get_status_message."""
         self._do_error_page_test(self.block.student_view, False)
 
+    def _make_status_request(self, block, data):
+        request = Request.blank("/", method="POST", body=json.dumps(data))
+        response = block.block_status(request)
+        return response.status_code, json.loads(response.body)
+
+    def test_block_status_own(self):
+        """Test that block status handler reports status of the block itself by default."""
+        self.block.scope_ids.usage_id = u"block-1"
+        self.block.lti_id = "dalite-ng-1"
+        status_code, response = self._make_status_request(self.block, {"in_studio": True})
+        self.assertEqual(status_code, 200)
+        self.assertEqual(response, {"statuses": {
+            u"block-1": {u"is_lti_ready": False, u"message": DaliteXBlock.CMS_NO_QUESTION_ERROR},
+        }})
+        self.assertFalse(self.runtime_mock.get_block.called)
+
+    def test_block_status_many(self):
+        """Test that block status handler reports status of many blocks of the course in a single request."""
+        self.block.scope_ids.usage_id = u"block-1"
+        ready_block = DaliteXBlock(
+            self.runtime_mock, DictFieldData({'lti_id': 'dalite-ng-1', 'assignment_id': 'a1', 'question_id': '1'}),
+            scope_ids=mock.Mock()
+        )
+        other_course_runtime = mock.Mock(course_id="other-course")
+        other_course_block = DaliteXBlock(other_course_runtime, DictFieldData({}), scope_ids=mock.Mock())
+        blocks = {u"block-2": ready_block, u"block-3": other_course_block, u"block-4": mock.Mock(spec=XBlock)}
+
+        def get_block(usage_id):
+            """Return block by id, raising runtime-specific error for unknown ones."""
+            try:
+                return blocks[usage_id]
+            except KeyError:
+                raise NoSuchUsage(usage_id)
+
+        self.runtime_mock.get_block.side_effect = get_block
+
+        status_code, response = self._make_status_request(self.block, {
+            "block_ids": [u"block-1", u"block-2", u"block-3", u"block-4", u"missing"]
+        })
+        self.assertEqual(status_code, 200)
+        self.assertEqual(response, {"statuses": {
+            u"block-1": {u"is_lti_ready": False, u"message": DaliteXBlock.LMS_ERROR_MESSAGE},
+            u"block-2": {u"is_lti_ready": True, u"message": None},
+        }})
+
+    @ddt.data(
+        {"block_ids": "block-1"},
+        {"block_ids": ["block-{}".format(index) for index in range(DaliteXBlock.MAX_STATUS_BLOCK_IDS + 1)]},
+    )
+    def test_block_status_invalid(self, data):
+        """Test that block status handler rejects invalid and too large requests."""
+        status_code, __ = self._make_status_request(self.block, data)
+        self.assertEqual(status_code, 400)
+        self.assertFalse(self.runtime_mock.get_block.called)
+
     # TODO: should be an integration test - figure out how to do this.
     # As is, this test is extremely fragile - it'll likely break on every code change
     def test_studio_view(self):
@@ -363,3 +648,140 @@ class DaliteXBlockTests(TestCase, TestWithPatchesMixin):
             self.assertEqual(result, mock_fragment)
             mock_fragment.add_javascript.assert_called_once_with(load_js_result)
             mock_fragment.initialize_js.assert_called_once_with('DaliteXBlockEdit')
+
+
+class DaliteXBlockInstrumentationTests(InstrumentationTestMixin, TestCase):
+    """Tests for Dalite XBlock instrumentation."""
+
+    def setUp(self):
+        """Create block with mock runtime and in-memory metrics sink."""
+        super(DaliteXBlockInstrumentationTests, self).setUp()
+        passport_cache.PASSPORT_CACHE.clear()
+        self.runtime_mock = mock.Mock(course_id="course-1")
+        self.runtime_mock.service.return_value = None
+        self.runtime_mock.modulestore.get_course.return_value.lti_passports = DEFAULT_LTI_PASSPORTS
+        self.block = DaliteXBlock(self.runtime_mock, DictFieldData({'lti_id': 'dalite-ng-1'}), scope_ids=mock.Mock())
+
+    def test_passport_loading(self):
+        """Test that course settings fetch and passport parsing are timed."""
+        self.assertIsNotNone(self.block.lti_passport)
+        counters, __ = self.sink.snapshot()
+        self.assertEqual(counters, {
+            ("course_settings.fetch", ("course_id", "course-1")): 1,
+            ("passports.parse", ("course_id", "course-1")): 1,
+        })
+
+    def test_render_and_launch(self):
+        """Test that rendering and launching are timed and tagged by course and passport."""
+        with mock.patch("dalite_xblock.dalite_xblock.LtiConsumerXBlock.student_view", return_value=Fragment()), \
+                mock.patch("dalite_xblock.lti.DaliteLtiConsumer.get_signed_lti_parameters"), \
+                mock.patch("dalite_xblock.dalite_xblock.lti_consumer_loader.render_mako_template", return_value=u""), \
+                mock.patch('dalite_xblock.dalite_xblock.DaliteXBlock._get_context_for_template', return_value={}), \
+                mock.patch("dalite_xblock.dalite_xblock.loader.render_django_template", return_value=u""):
+            self.block.student_view({})
+            self.block.lti_launch_handler(mock.Mock(), u'')
+
+        counters, __ = self.sink.snapshot()
+        tags = (("course_id", "course-1"), ("lti_id", "dalite-ng-1"))
+        self.assertEqual(counters[("render.student_view",) + tags], 1)
+        self.assertEqual(counters[("render.template.data_not_filled",) + tags], 1)
+        self.assertEqual(counters[("lti.launch",) + tags], 1)
+
+
+class DaliteXBlockFragmentCacheTests(TestCase):
+    """Tests for Dalite XBlock fragment caching."""
+
+    def setUp(self):
+        """Configure in-process fragment cache and create block with mock runtime."""
+        passport_cache.PASSPORT_CACHE.clear()
+        previous_cache = fragment_cache.get_fragment_cache()
+        fragment_cache.configure(FragmentCache(LocalFragmentCacheBackend()))
+        self.addCleanup(fragment_cache.configure, previous_cache)
+
+        self.runtime_mock = self._make_runtime(DEFAULT_LTI_PASSPORTS)
+        self.field_data = DictFieldData({'lti_id': 'dalite-ng-1', 'assignment_id': 'a1', 'question_id': '1'})
+        self.scope_ids = mock.Mock(usage_id="block-1")
+        self.block = DaliteXBlock(self.runtime_mock, self.field_data, scope_ids=self.scope_ids)
+
+        patcher = mock.patch(
+            "dalite_xblock.dalite_xblock.LtiConsumerXBlock.student_view",
+            side_effect=lambda context: Fragment(u"<div>Question</div>")
+        )
+        self.parent_student_view = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _make_runtime(lti_passports, user_role="student"):
+        runtime_mock = mock.Mock(course_id="course-1")
+        runtime_mock.service.return_value = None
+        runtime_mock.get_user_role.return_value = user_role
+        runtime_mock.modulestore.get_course.return_value.lti_passports = lti_passports
+        return runtime_mock
+
+    def _make_block(self, runtime=None):
+        """Create another instance of the block, i.e. for the next request."""
+        return DaliteXBlock(runtime or self._make_runtime(DEFAULT_LTI_PASSPORTS), self.field_data, self.scope_ids)
+
+    def test_cache_hit(self):
+        """Test that fragment is rendered once and then served from the cache."""
+        first = self.block.student_view({})
+        second = self._make_block().student_view({})
+
+        self.assertEqual(self.parent_student_view.call_count, 1)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertIn(u"Question", second.body_html())
+
+    def test_field_change(self):
+        """Test that changing a field renders fragment again."""
+        self.block.student_view({})
+        block = self._make_block()
+        block.display_name = u"Other question"
+        block.student_view({})
+        self.assertEqual(self.parent_student_view.call_count, 2)
+
+    def test_viewer_role(self):
+        """Test that fragments are cached separately for each viewer role and for Studio."""
+        self.block.student_view({})
+        self._make_block(self._make_runtime(DEFAULT_LTI_PASSPORTS, user_role="staff")).student_view({})
+        with mock.patch.object(DaliteXBlock, "render_button_launching_admin", return_value=u""):
+            self._make_block().author_view({})
+        self.assertEqual(self.parent_student_view.call_count, 3)
+
+    def test_passport_change(self):
+        """Test that changing selected passport renders fragment again."""
+        self.block.student_view({})
+        changed_passports = [
+            "dalite-ng-1:dalite-xblock:aHR0cDovL290aGVyLnVybDtPVEhFUktFWTtPVEhFUlNFQ1JFVA==",
+        ]
+        self._make_block(self._make_runtime(changed_passports)).student_view({})
+        self.assertEqual(self.parent_student_view.call_count, 2)
+
+    def test_clean_studio_edits_invalidates(self):
+        """Test that editing the block in Studio drops its cached fragments."""
+        self.block.student_view({})
+        self._make_block().clean_studio_edits({'assignment_id': 'a1', 'question_id': '1'})
+        self._make_block().student_view({})
+        self.assertEqual(self.parent_student_view.call_count, 2)
+
+    def test_dalite_availability(self):
+        """Test that fragment is rendered again when dalite-ng goes down, showing a status message instead."""
+        registry = HealthRegistry(failure_threshold=1)
+        health.configure(HealthProber(registry, endpoints=lambda: []), start=False)
+        self.addCleanup(health.configure, None)
+        self.block.student_view({})
+
+        registry.record("http://first.url:8080", False)
+        with mock.patch("dalite_xblock.dalite_xblock.LtiConsumerXBlock._get_context_for_template", return_value={}):
+            fragment = self._make_block().student_view({})
+
+        self.assertEqual(self.parent_student_view.call_count, 2)
+        self.assertIn(DaliteXBlock.DALITE_UNAVAILABLE_MESSAGE, fragment.body_html())
+        self.assertNotIn(u"Question", fragment.body_html())
+
+    def test_disabled(self):
+        """Test that fragments are rendered on every view if fragment cache is not configured."""
+        fragment_cache.configure(None)
+        self.block.student_view({})
+        self._make_block().student_view({})
+        self.assertEqual(self.parent_student_view.call_count, 2)
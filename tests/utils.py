@@ -1,5 +1,18 @@
 """Test utilities."""
+import base64
+import hashlib
+import json
+import os
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
 import mock
+from oauthlib.common import generate_nonce, generate_timestamp
+from oauthlib.oauth1.rfc5849 import signature, utils
+from webob import Request
+
+from dalite_xblock.instrumentation import InMemorySink, configure, get_sink
 
 
 class TestWithPatchesMixin(object):
@@ -11,3 +24,134 @@ class TestWithPatchesMixin(object):
         patch_instance = patcher.start()
         self.addCleanup(patcher.stop)
         return patch_instance
+
+
+class InstrumentationTestMixin(object):
+    """Installs in-memory sink for a duration of a test."""
+
+    def setUp(self):
+        """Install in-memory sink."""
+        super(InstrumentationTestMixin, self).setUp()
+        previous_sink = get_sink()
+        self.sink = InMemorySink()
+        configure(self.sink)
+        self.addCleanup(configure, previous_sink)
+
+
+def make_body_signed_request(url, body, key, secret, content_type="application/xml"):
+    """
+    Create request signed with OAuth body signing, as LTI providers send grades.
+
+    :param unicode url: Request URL
+    :param str body: Request body
+    :param unicode key: LTI key
+    :param unicode secret: LTI secret
+    :rtype: webob.Request
+    """
+    oauth_params = [
+        (u"oauth_consumer_key", key),
+        (u"oauth_nonce", generate_nonce()),
+        (u"oauth_timestamp", generate_timestamp()),
+        (u"oauth_version", u"1.0"),
+        (u"oauth_signature_method", u"HMAC-SHA1"),
+        (u"oauth_body_hash", base64.b64encode(hashlib.sha1(body).digest()).decode('utf-8')),
+    ]
+    base_string = signature.signature_base_string(
+        u"POST", signature.base_string_uri(url), signature.normalize_parameters(oauth_params)
+    )
+    oauth_params.append((u"oauth_signature", signature.sign_hmac_sha1(base_string, secret, None)))
+    authorization = u"OAuth " + u", ".join(
+        u'{}="{}"'.format(name, utils.escape(value)) for name, value in oauth_params
+    )
+    return Request.blank(
+        url, method="POST", body=body, headers={"Authorization": authorization, "Content-Type": content_type}
+    )
+
+
+class _LocalRequestHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler passing requests to the `handle` callable of the server."""
+
+    protocol_version = "HTTP/1.1"
+    # Responses are written in one go on flush, instead of a packet per header delayed by Nagle's algorithm
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _respond(self):
+        status, headers, body = self.server.handle(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(body, str):
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        # Iterable of chunks is sent with chunked transfer encoding
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in body:
+            self.wfile.write("{:x}\r\n{}\r\n".format(len(chunk), chunk))
+        self.wfile.write("0\r\n\r\n")
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Do not log requests to stderr."""
+
+
+class _LocalHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalHTTPServer(object):
+    """
+    HTTP/1.1 server listening on a random local port, used as a stand-in for dalite-ng.
+
+    `handle` is called with `BaseHTTPRequestHandler` of every request, and returns status, headers and body - either
+    a string, or an iterable of strings sent as chunks.
+    """
+
+    def __init__(self, handle):
+        self._server = _LocalHTTPServer(("127.0.0.1", 0), _LocalRequestHandler)
+        self._server.handle = handle
+        self._server.lock = threading.Lock()
+        self._server.connections = 0
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.01})
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        """Return root URL of the server."""
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    @property
+    def connections(self):
+        """Return number of accepted connections."""
+        return self._server.connections
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def write_course_export(root, name, passports, run="2017"):
+    """Write minimal OLX course export with a policy holding LTI passports and settings of other blocks."""
+    path = os.path.join(root, name)
+    os.makedirs(os.path.join(path, "policies", run))
+    with open(os.path.join(path, "course.xml"), "w") as course_xml:
+        course_xml.write('<course url_name="{}" org="Org" course="{}"/>'.format(run, name))
+    policy = {"problem/{}".format(index): {"display_name": "lti_passports"} for index in range(50)}
+    policy["course/{}".format(run)] = {"display_name": "Course", "lti_passports": passports}
+    with open(os.path.join(path, "policies", run, "policy.json"), "w") as policy_json:
+        json.dump(policy, policy_json, indent=4)
+    return path
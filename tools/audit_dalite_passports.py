@@ -0,0 +1,44 @@
+"""
+Utility that audits Dalite passports in OLX course exports.
+
+Finds course export directories and ``.tar.gz`` archives under given directory, and reports malformed, duplicate and
+unreachable-looking Dalite passports of every course as newline-delimited JSON; summary is printed to stderr.
+
+    $ export PYTHONPATH=$(pwd)
+    $ python tools/audit_dalite_passports.py /data/course-exports --only-problems > audit.jsonl
+"""
+import argparse
+import json
+import sys
+
+from dalite_xblock.passport_audit import audit_exports, has_problems
+
+
+def main(argv=None):
+    """Entrypoint for this script."""
+    parser = argparse.ArgumentParser(description='Audit Dalite passports in OLX course exports')
+    parser.add_argument('root', help='Directory with course exports')
+    parser.add_argument(
+        '--processes', type=int, default=None, help='Number of processes auditing courses (default: number of CPUs)'
+    )
+    parser.add_argument('--only-problems', action='store_true', help='Report only courses with problems')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    courses, with_problems, dalite_passports = 0, 0, 0
+    for result in audit_exports(args.root, processes=args.processes):
+        courses += 1
+        dalite_passports += result.get("passports", 0)
+        problems = has_problems(result)
+        with_problems += problems
+        if problems or not args.only_problems:
+            sys.stdout.write(json.dumps(result, sort_keys=True) + "\n")
+            sys.stdout.flush()
+
+    sys.stderr.write("Audited {} courses with {} Dalite passports, {} courses with problems\n".format(
+        courses, dalite_passports, with_problems
+    ))
+    return 1 if with_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
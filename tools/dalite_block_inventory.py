@@ -0,0 +1,47 @@
+"""
+Utility that lists Dalite blocks of OLX course exports and reports blocks that are not ready.
+
+Finds course export directories and ``.tar.gz`` export archives under given directory, and reports unready blocks,
+dangling LTI IDs and duplicate question references of every course as newline-delimited JSON; summary is printed to
+stderr.
+
+    $ export PYTHONPATH=$(pwd)
+    $ python tools/dalite_block_inventory.py /data/course-exports --only-problems > inventory.jsonl
+"""
+import argparse
+import json
+import sys
+
+from dalite_xblock.inventory import has_problems, inventory_exports
+
+
+def main(argv=None):
+    """Entrypoint for this script."""
+    parser = argparse.ArgumentParser(description='List Dalite blocks of OLX course exports and their readiness')
+    parser.add_argument('root', help='Directory with course exports')
+    parser.add_argument(
+        '--processes', type=int, default=None, help='Number of processes scanning courses (default: number of CPUs)'
+    )
+    parser.add_argument('--include-blocks', action='store_true', help='List every block, not only unready ones')
+    parser.add_argument('--only-problems', action='store_true', help='Report only courses with problems')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    courses, with_problems, blocks, unready = 0, 0, 0, 0
+    for result in inventory_exports(args.root, processes=args.processes, include_blocks=args.include_blocks):
+        courses += 1
+        blocks += result.get("blocks", 0)
+        unready += len(result.get("unready", ()))
+        problems = has_problems(result)
+        with_problems += problems
+        if problems or not args.only_problems:
+            sys.stdout.write(json.dumps(result, sort_keys=True) + "\n")
+            sys.stdout.flush()
+
+    sys.stderr.write("Scanned {} courses with {} Dalite blocks, {} blocks not ready, {} courses with problems\n".format(
+        courses, blocks, unready, with_problems
+    ))
+    return 1 if with_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
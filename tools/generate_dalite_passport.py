@@ -1,26 +1,85 @@
-"""Utility that allows to generate passports encoded for this xblock."""
+"""
+Utility that allows to generate passports encoded for this xblock.
+
+Generates a single passport from command line arguments, or, with ``--batch``, passports of all rows of a CSV or
+newline-delimited JSON file (``-`` reads from stdin), with `passport_id`, `dalite_url`, `lti_key` and `lti_secret`
+columns:
+
+    $ python tools/generate_dalite_passport.py --batch courses.csv --output passports.csv --processes 4
+"""
 import argparse
-from dalite_xblock.passport_utils import DaliteLtiPassport, prepare_passport
+import os
+import sys
+
+from dalite_xblock.passport_batch import DEFAULT_CHUNK_SIZE, FORMATS, generate_passports
+from dalite_xblock.passport_utils import DaliteLtiPassport, join_root_urls, prepare_passport
+
+
+def guess_format(path):
+    """Return input format based on file extension, CSV by default."""
+    return "jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".json", ".ndjson") else "csv"
+
+
+def run_batch(args):
+    """Generate passports of all rows of batch input."""
+    input_format = args.format or guess_format(args.batch)
+    input_stream = sys.stdin if args.batch == '-' else open(args.batch, 'rb')
+    output_stream = sys.stdout if args.output == '-' else open(args.output, 'wb')
+    try:
+        encoded, failed = generate_passports(
+            input_stream, output_stream, input_format=input_format, output_format=args.output_format,
+            processes=args.processes, chunk_size=args.chunk_size
+        )
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    sys.stderr.write("Encoded {} passports, {} rows failed\n".format(encoded, failed))
+    return 1 if failed else 0
 
 
 def main():
     """Entrypoint for this script."""
     parser = argparse.ArgumentParser(description='Create dalite passport')
-    parser.add_argument('--passport-id', help='Passports are identified in studio using this value', required=True)
-    parser.add_argument('--dalite-url', help='Base url for dalite, eg. http://localhost:1234', required=True)
-    parser.add_argument('--lti-key', help='Value for LTI_CLITEN_KEY', required=True)
-    parser.add_argument('--lti-secret', help='Value for LTI_CLIENT_SECRET', required=True)
+    parser.add_argument('--passport-id', help='Passports are identified in studio using this value')
+    parser.add_argument(
+        '--dalite-url', action='append',
+        help='Base url for dalite, eg. http://localhost:1234; repeat to spread students over several dalite-ng nodes'
+    )
+    parser.add_argument('--lti-key', help='Value for LTI_CLITEN_KEY')
+    parser.add_argument('--lti-secret', help='Value for LTI_CLIENT_SECRET')
+
+    batch = parser.add_argument_group('batch mode')
+    batch.add_argument('--batch', help='CSV or JSONL file with passports to generate, "-" for stdin')
+    batch.add_argument('--format', choices=FORMATS, help='Batch input format (default: guessed from file extension)')
+    batch.add_argument('--output', default='-', help='Batch output file (default: stdout)')
+    batch.add_argument('--output-format', choices=FORMATS, help='Batch output format (default: input format)')
+    batch.add_argument('--processes', type=int, default=1, help='Number of processes encoding passports')
+    batch.add_argument(
+        '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows sent to an encoding process at once'
+    )
 
     args = parser.parse_args()
 
+    if args.batch:
+        return run_batch(args)
+
+    missing = [
+        name for name in ('passport_id', 'dalite_url', 'lti_key', 'lti_secret') if getattr(args, name) is None
+    ]
+    if missing:
+        parser.error('arguments required: {}'.format(', '.join('--' + name.replace('_', '-') for name in missing)))
+
     passport = DaliteLtiPassport(
-        dalite_root_url=args.dalite_url,
+        dalite_root_url=join_root_urls(args.dalite_url),
         lti_key=args.lti_key,
         lti_secret=args.lti_secret,
         lti_id=args.passport_id
     )
 
     print '"{}"'.format(prepare_passport(passport))
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Utility that pulls grades of Dalite blocks from dalite-ng in bulk.
+
+Blocks are read as newline-delimited JSON objects with `usage_id`, `lti_id`, `assignment_id` and `question_id` keys
+(see `dalite_xblock.grade_sync.block_description`); grades are written as newline-delimited JSON objects with
+`usage_id`, `user_id` and `score` keys, and synchronization report is printed to stderr. Grades are not published to
+the LMS - use `dalite_xblock.grade_sync.sync_course_grades` from an LMS shell for that.
+
+    $ export PYTHONPATH=$(pwd)
+    $ python tools/sync_dalite_grades.py --blocks blocks.jsonl --output grades.jsonl \
+        --passport "dalite-ng:dalite-xblock:aHR0cDovL2xvY2FsaG9zdDoxMDEwMDthbHBoYTtiZXRh"
+"""
+import argparse
+import json
+import sys
+
+from dalite_xblock.grade_sync import (
+    DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, GRADES_ENDPOINT_PATH, GradeSynchronizer, GradeSyncReport,
+    JsonLinesGradePublisher, iter_sync_targets
+)
+from dalite_xblock.http_pool import DEFAULT_TIMEOUT, PoolManager
+from dalite_xblock.passport_utils import DalitePassportIndex
+
+
+def read_blocks(stream):
+    """Yield block descriptions from newline-delimited JSON stream."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_args(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Pull grades of Dalite blocks from dalite-ng')
+    parser.add_argument(
+        '--passport', action='append', required=True, help='Course LTI passport, can be given many times'
+    )
+    parser.add_argument('--blocks', default='-', help='Block descriptions file (default: stdin)')
+    parser.add_argument('--output', default='-', help='Grades output file (default: stdout)')
+    parser.add_argument(
+        '--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Maximum number of concurrent requests'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Maximum number of grades published at once'
+    )
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Socket timeout, in seconds')
+    parser.add_argument(
+        '--endpoint-path', default=GRADES_ENDPOINT_PATH, help='Grade export path, relative to dalite-ng URL'
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """Entrypoint for this script."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    stdin, stdout, stderr = stdin or sys.stdin, stdout or sys.stdout, stderr or sys.stderr
+
+    blocks_stream = stdin if args.blocks == '-' else open(args.blocks)
+    output_stream = stdout if args.output == '-' else open(args.output, 'w')
+    pool_manager = PoolManager(max_size=args.concurrency, timeout=args.timeout)
+    try:
+        report = GradeSyncReport()
+        targets = iter_sync_targets(
+            read_blocks(blocks_stream), DalitePassportIndex.from_passport_strings(args.passport), report
+        )
+        synchronizer = GradeSynchronizer(
+            JsonLinesGradePublisher(output_stream), pool_manager=pool_manager, concurrency=args.concurrency,
+            batch_size=args.batch_size, endpoint_path=args.endpoint_path
+        )
+        synchronizer.sync(targets, report)
+    finally:
+        pool_manager.close()
+        if blocks_stream is not stdin:
+            blocks_stream.close()
+        if output_stream is not stdout:
+            output_stream.close()
+
+    stderr.write(json.dumps(report.as_dict(), indent=2, sort_keys=True) + "\n")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())